@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+import json
+import os
+from pathlib import Path
+import sys
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, TypeVar
+
+from .config import Settings
+
+T = TypeVar("T")
+
+DEFAULT_USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+)
+LAUNCH_ARGS = ["--disable-blink-features=AutomationControlled"]
+CONTEXT_OPTIONS: dict[str, Any] = {
+    "user_agent": DEFAULT_USER_AGENT,
+    "locale": "fr-FR",
+    "timezone_id": "Europe/Paris",
+    "viewport": {"width": 1366, "height": 2000},
+    "extra_http_headers": {"Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8"},
+}
+
+
+def _debug(enabled: bool, message: str) -> None:
+    if enabled:
+        print(f"[browser-pool] {message}", file=sys.stderr)
+
+
+async def launch_browser(playwright, settings: Settings):
+    return await playwright.chromium.launch(headless=settings.headless, args=LAUNCH_ARGS)
+
+
+def usable_storage_state(settings: Settings) -> str | None:
+    """Path of the saved cookies/localStorage if it is present, parseable and fresh enough."""
+    path = settings.storage_state_path
+    if not path:
+        return None
+    state_file = Path(path)
+    try:
+        age_s = time.time() - state_file.stat().st_mtime
+    except OSError:
+        return None
+    try:
+        state = json.loads(state_file.read_text(encoding="utf-8"))
+        valid = isinstance(state.get("cookies"), list) and isinstance(state.get("origins", []), list)
+    except (OSError, ValueError, AttributeError):
+        valid = False
+    if not valid or (settings.storage_state_max_age_h and age_s > settings.storage_state_max_age_h * 3600):
+        state_file.unlink(missing_ok=True)
+        return None
+    return path
+
+
+async def save_storage_state(context, path: str) -> None:
+    state = await context.storage_state()
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f"{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, target)
+
+
+def _child_rss_kb() -> int | None:
+    """Sum the resident memory of every process descending from this one (Linux only)."""
+    proc = Path("/proc")
+    if not proc.is_dir():
+        return None
+    parents: dict[int, int] = {}
+    rss: dict[int, int] = {}
+    for entry in proc.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            status = (entry / "status").read_text()
+        except OSError:
+            continue
+        pid = int(entry.name)
+        for line in status.splitlines():
+            if line.startswith("PPid:"):
+                parents[pid] = int(line.split()[1])
+            elif line.startswith("VmRSS:"):
+                rss[pid] = int(line.split()[1])
+
+    root = os.getpid()
+    total = 0
+    for pid, kb in rss.items():
+        parent = parents.get(pid)
+        seen = 0
+        while parent and parent != root and seen < 64:
+            parent = parents.get(parent)
+            seen += 1
+        if parent == root:
+            total += kb
+    return total
+
+
+class BrowserPool:
+    """Long-lived Chromium shared by every scrape of the process.
+
+    Playwright objects are bound to the event loop that created them, so the pool owns a
+    dedicated loop running in a background thread. Sync callers submit coroutines with
+    `run()`; each scrape gets its own isolated browser context through `page()`.
+    The browser is replaced after `browser_max_pages` pages or when the Chromium process
+    tree grows past `browser_max_rss_mb`.
+    """
+
+    def __init__(self, settings: Settings, debug: bool = False) -> None:
+        self.settings = settings
+        self.debug = debug
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._launch_lock: asyncio.Lock | None = None
+        self._playwright = None
+        self._browser = None
+        self._in_flight: dict[Any, int] = {}
+        self._retiring: set[Any] = set()
+        self._pages_on_browser = 0
+        self.pages_served = 0
+        self.launches = 0
+        self.recycles = 0
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.running:
+                return
+            loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=loop.run_forever, name="browser-pool", daemon=True)
+            thread.start()
+            self._loop = loop
+            self._thread = thread
+        # Warm the browser without blocking the caller; a failure is retried on first use.
+        asyncio.run_coroutine_threadsafe(self._warm_up(), loop)
+
+    def run(self, coro: Awaitable[T], timeout: float | None = None) -> T:
+        if not self.running:
+            self.start()
+        assert self._loop is not None
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result(timeout=timeout)
+
+    def close(self, timeout: float = 30.0) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), loop).result(timeout=timeout)
+        except Exception as exc:
+            _debug(self.debug, f"Shutdown error: {exc}")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=timeout)
+        loop.close()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "browser_connected": bool(self._browser and self._browser.is_connected()),
+            "pages_served": self.pages_served,
+            "pages_on_browser": self._pages_on_browser,
+            "launches": self.launches,
+            "recycles": self.recycles,
+            "in_flight": sum(self._in_flight.values()),
+        }
+
+    @asynccontextmanager
+    async def page(self, storage_state: str | None = None) -> AsyncIterator[Any]:
+        browser = await self._acquire_browser()
+        self._in_flight[browser] = self._in_flight.get(browser, 0) + 1
+        self._pages_on_browser += 1
+        self.pages_served += 1
+        context = None
+        try:
+            context = await browser.new_context(**CONTEXT_OPTIONS, storage_state=storage_state)
+            yield await context.new_page()
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            # _shutdown() may already have cleared the counts while this page was open.
+            if browser in self._in_flight:
+                self._in_flight[browser] -= 1
+            await self._close_if_retired(browser)
+
+    async def _warm_up(self) -> None:
+        try:
+            await self._acquire_browser()
+        except Exception as exc:
+            _debug(self.debug, f"Warm-up failed, will retry on first scrape: {exc}")
+
+    async def _acquire_browser(self):
+        if self._launch_lock is None:
+            self._launch_lock = asyncio.Lock()
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected() and not self._should_recycle():
+                return self._browser
+            if self._browser is not None:
+                self.recycles += 1
+                retired = self._browser
+                self._browser = None
+                self._retiring.add(retired)
+                await self._close_if_retired(retired)
+            if self._playwright is None:
+                from playwright.async_api import async_playwright
+
+                self._playwright = await async_playwright().start()
+            _debug(self.debug, "Launching Chromium")
+            self._browser = await launch_browser(self._playwright, self.settings)
+            self._in_flight[self._browser] = 0
+            self._pages_on_browser = 0
+            self.launches += 1
+            return self._browser
+
+    def _should_recycle(self) -> bool:
+        if self._pages_on_browser >= self.settings.browser_max_pages:
+            _debug(self.debug, f"Recycling browser after {self._pages_on_browser} pages")
+            return True
+        # The RSS sum includes retiring browsers that still have pages open; recycling again
+        # before they close would only launch more Chromiums.
+        if self.settings.browser_max_rss_mb > 0 and not self._retiring:
+            rss_kb = _child_rss_kb()
+            if rss_kb is not None and rss_kb > self.settings.browser_max_rss_mb * 1024:
+                _debug(self.debug, f"Recycling browser at {rss_kb // 1024} MB RSS")
+                return True
+        return False
+
+    async def _close_if_retired(self, browser) -> None:
+        if browser not in self._retiring or self._in_flight.get(browser, 0) > 0:
+            return
+        self._retiring.discard(browser)
+        self._in_flight.pop(browser, None)
+        try:
+            await browser.close()
+        except Exception:
+            pass
+
+    async def _shutdown(self) -> None:
+        if self._launch_lock is not None:
+            # Let an in-progress launch (e.g. the warm-up) finish so its driver is stopped too.
+            await self._launch_lock.acquire()
+        for browser in [self._browser, *self._retiring]:
+            if browser is None:
+                continue
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        self._browser = None
+        self._retiring.clear()
+        self._in_flight.clear()
+        if self._playwright is not None:
+            try:
+                await self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+        self._launch_lock = None
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import json
+import threading
+from typing import Any
+
+REPLAY_SIZE = 256
+QUEUE_SIZE = 64
+
+
+@dataclass(slots=True)
+class Message:
+    id: int
+    kind: str
+    data: dict[str, Any]
+
+    def encode(self) -> bytes:
+        return f"id: {self.id}\nevent: {self.kind}\ndata: {json.dumps(self.data, ensure_ascii=False)}\n\n".encode()
+
+
+class EventBus:
+    """In-process fan-out of dashboard events to Server-Sent Events subscribers.
+
+    `publish()` may be called from any thread (scrape loop, threadpool, scheduler); each
+    subscriber is an asyncio.Queue fed on its own loop, so an idle connection costs one
+    parked coroutine. A subscriber that falls behind gets a single `resync` instead of
+    an unbounded backlog.
+    """
+
+    def __init__(self, replay_size: int = REPLAY_SIZE, queue_size: int = QUEUE_SIZE) -> None:
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._recent: deque[Message] = deque(maxlen=replay_size)
+        self._subscribers: dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, kind: str, data: dict[str, Any] | None = None) -> Message:
+        with self._lock:
+            message = Message(self._next_id, kind, data or {})
+            self._next_id += 1
+            self._recent.append(message)
+            targets = list(self._subscribers.items())
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, message)
+            except RuntimeError:
+                self._subscribers.pop(queue, None)
+        return message
+
+    def subscribe(self, last_event_id: int | None = None) -> asyncio.Queue:
+        """Register a queue on the running loop, pre-filled with what a reconnecting client missed."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                missed = [message for message in self._recent if message.id > last_event_id]
+                # Ids restart with the process, so an id from the future means the client missed a restart.
+                lost = last_event_id >= self._next_id or (self._recent and self._recent[0].id > last_event_id + 1)
+                if lost or len(missed) > self.queue_size:
+                    missed = [Message(self._next_id - 1, "resync", {})]
+                for message in missed:
+                    queue.put_nowait(message)
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, message: Message) -> None:
+        if queue.full():
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(Message(message.id, "resync", {}))
+            return
+        queue.put_nowait(message)
+
+
+bus = EventBus()
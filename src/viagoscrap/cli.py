@@ -3,6 +3,7 @@ from __future__ import annotations
 import argparse
 import asyncio
 import json
+import os
 import sys
 
 try:
@@ -17,15 +18,133 @@ from .scraper import as_dicts, scrape_listings
 
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Scrape Viagogo listings")
-    parser.add_argument("--url", required=True, help="Page URL to scrape")
+    parser.add_argument("--url", help="Page URL to scrape")
     parser.add_argument("--pretty", action="store_true", help="Pretty JSON output")
     parser.add_argument("--debug", action="store_true", help="Print debug logs to stderr")
+    subparsers = parser.add_subparsers(dest="command")
+
+    repair = subparsers.add_parser("repair-stats", help="Recompute tracked event stats from run_summaries (see --rebuild-summaries)")
+    repair.add_argument("--db", help="SQLite database path (defaults to DB_PATH)")
+    repair.add_argument("--event-id", type=int, action="append", help="Only repair this event (repeatable)")
+    repair.add_argument(
+        "--rebuild-summaries",
+        action="store_true",
+        help="Also rebuild run_summaries from the raw price history first",
+    )
+
+    compact = subparsers.add_parser("compact", help="Roll old price history into rollups and delete raw rows")
+    compact.add_argument("--db", help="SQLite database path (defaults to DB_PATH)")
+    compact.add_argument(
+        "--days",
+        type=int,
+        default=None,
+        help="Raw rows to keep, in days (defaults to HISTORY_RETENTION_DAYS; 0 keeps everything)",
+    )
+    compact.add_argument("--batch-size", type=int, default=500, help="Raw rows deleted per transaction")
+    compact.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="Switch the file to incremental auto-vacuum first (one full VACUUM)",
+    )
+
+    migrate = subparsers.add_parser("migrate", help="Upgrade the database schema and print a size/query-time report")
+    migrate.add_argument("--db", help="SQLite database path (defaults to DB_PATH)")
+    migrate.add_argument("--batch-size", type=int, default=5000, help="Rows copied per transaction")
+
+    export = subparsers.add_parser("export", help="Export price history or scrape runs (gzip CSV or Parquet)")
+    export.add_argument("table", choices=["history", "runs"])
+    export.add_argument("--db", help="SQLite database path (defaults to DB_PATH)")
+    export.add_argument("--format", dest="fmt", choices=["csv", "parquet"], default="csv")
+    export.add_argument("--event-id", type=int, help="Only export this event")
+    export.add_argument("--from", dest="start", help="Start date/time (ISO 8601, UTC if no offset)")
+    export.add_argument("--to", dest="end", help="End date/time (ISO 8601, UTC if no offset)")
+    export.add_argument("-o", "--output", help="Output file (defaults to a generated name, '-' for stdout)")
     return parser
 
 
+def _db_path(args: argparse.Namespace) -> str:
+    return args.db or os.getenv("DB_PATH", "data/viagoscrap.db")
+
+
+def repair_stats(args: argparse.Namespace) -> None:
+    from .storage import backfill_run_summaries, init_db, list_events, refresh_event_stats
+
+    db_path = _db_path(args)
+    init_db(db_path)
+    event_ids = args.event_id or [int(event["id"]) for event in list_events(db_path)]
+    summaries = 0
+    for event_id in event_ids:
+        if args.rebuild_summaries:
+            summaries += backfill_run_summaries(db_path, event_id)
+        refresh_event_stats(db_path, event_id)
+    print(json.dumps({"db_path": db_path, "events_repaired": len(event_ids), "summaries_rebuilt": summaries}))
+
+
+def compact(args: argparse.Namespace) -> None:
+    from .storage import compact_history, enable_incremental_vacuum, init_db
+
+    db_path = _db_path(args)
+    init_db(db_path)
+    if args.vacuum:
+        enable_incremental_vacuum(db_path)
+    days = args.days if args.days is not None else int(os.getenv("HISTORY_RETENTION_DAYS", "0"))
+    result = compact_history(db_path, days, batch_size=max(1, args.batch_size))
+    print(json.dumps({"db_path": db_path, "retention_days": days, **result}))
+
+
+def migrate(args: argparse.Namespace) -> None:
+    from .storage import init_db
+
+    db_path = _db_path(args)
+    print(json.dumps({"db_path": db_path, **init_db(db_path, migration_batch_size=max(1, args.batch_size))}))
+
+
+def export(args: argparse.Namespace) -> None:
+    from .export import export_filename, stream_export
+    from .storage import init_db, to_utc_iso
+
+    db_path = _db_path(args)
+    init_db(db_path)
+    start = to_utc_iso(args.start) if args.start else None
+    end = to_utc_iso(args.end) if args.end else None
+    output = args.output or export_filename(args.table, args.fmt, args.event_id)
+    chunks = stream_export(db_path, args.table, args.fmt, event_id=args.event_id, start=start, end=end)
+    written = 0
+    if output == "-":
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+            written += len(chunk)
+        sys.stdout.buffer.flush()
+    else:
+        with open(output, "wb") as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+                written += len(chunk)
+    print(json.dumps({"output": output, "bytes": written}), file=sys.stderr)
+
+
 def main() -> None:
     load_dotenv()
-    args = build_parser().parse_args()
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.command == "repair-stats":
+        repair_stats(args)
+        return
+    if args.command == "compact":
+        compact(args)
+        return
+    if args.command == "migrate":
+        migrate(args)
+        return
+    if args.command == "export":
+        try:
+            export(args)
+        except (RuntimeError, ValueError) as exc:
+            parser.error(str(exc))
+        return
+    if not args.url:
+        parser.error("--url is required")
+
     settings = Settings.from_env()
     if args.debug:
         print(f"[debug] headless={settings.headless} timeout_ms={settings.timeout_ms}", file=sys.stderr)
@@ -13,10 +13,76 @@ def _as_bool(raw: str, default: bool) -> bool:
 class Settings:
     headless: bool = False
     timeout_ms: int = 30_000
+    browser_max_pages: int = 100
+    browser_max_rss_mb: int = 1_024
+    scrape_concurrency: int = 3
+    scrape_freshness_s: int = 0
+    settle_window_ms: int = 750
+    settle_deadline_ms: int = 10_000
+    block_profile: str = "default"
+    blocked_domains: tuple[str, ...] = ()
+    extraction_mode: str = "auto"
+    storage_state_path: str = "data/browser_state.json"
+    storage_state_max_age_h: int = 168
+    history_mode: str = "full"
+    alert_mode: str = "instant"
+    alert_digest_window_min: int = 30
+    alert_throttle_min: int = 60
+    alert_min_delta_pct: float = 0.0
+    schedule_mode: str = "adaptive"
+    schedule_min_interval_min: int = 5
+    schedule_max_interval_min: int = 360
+    worker_mode: str = "embedded"
 
 
     @classmethod
     def from_env(cls) -> "Settings":
         headless = _as_bool(os.getenv("HEADLESS"), default=False)
         timeout_ms = int(os.getenv("TIMEOUT_MS", "30000"))
-        return cls(headless=headless, timeout_ms=timeout_ms)
+        browser_max_pages = int(os.getenv("BROWSER_MAX_PAGES", "100"))
+        browser_max_rss_mb = int(os.getenv("BROWSER_MAX_RSS_MB", "1024"))
+        scrape_concurrency = int(os.getenv("SCRAPE_CONCURRENCY", "3"))
+        scrape_freshness_s = int(os.getenv("SCRAPE_FRESHNESS_S", "0"))
+        settle_window_ms = int(os.getenv("SETTLE_WINDOW_MS", "750"))
+        settle_deadline_ms = int(os.getenv("SETTLE_DEADLINE_MS", "10000"))
+        block_profile = os.getenv("BLOCK_PROFILE", "default").strip().lower()
+        extraction_mode = os.getenv("EXTRACTION_MODE", "auto").strip().lower()
+        default_state_path = os.path.join(os.path.dirname(os.getenv("DB_PATH", "data/viagoscrap.db")), "browser_state.json")
+        storage_state_path = os.getenv("BROWSER_STATE_PATH", default_state_path).strip()
+        storage_state_max_age_h = int(os.getenv("BROWSER_STATE_MAX_AGE_H", "168"))
+        history_mode = os.getenv("HISTORY_MODE", "full").strip().lower()
+        alert_mode = os.getenv("ALERT_MODE", "instant").strip().lower()
+        alert_digest_window_min = int(os.getenv("ALERT_DIGEST_WINDOW_MIN", "30"))
+        alert_throttle_min = int(os.getenv("ALERT_THROTTLE_MIN", "60"))
+        alert_min_delta_pct = float(os.getenv("ALERT_MIN_DELTA_PCT", "0"))
+        schedule_mode = os.getenv("SCHEDULE_MODE", "adaptive").strip().lower()
+        schedule_min_interval_min = max(1, int(os.getenv("SCHEDULE_MIN_INTERVAL_MIN", "5")))
+        schedule_max_interval_min = int(os.getenv("SCHEDULE_MAX_INTERVAL_MIN", "360"))
+        worker_mode = os.getenv("WORKER_MODE", "embedded").strip().lower()
+        blocked_domains = tuple(
+            domain.strip().lower() for domain in os.getenv("BLOCKED_DOMAINS", "").split(",") if domain.strip()
+        )
+        return cls(
+            headless=headless,
+            timeout_ms=timeout_ms,
+            browser_max_pages=max(1, browser_max_pages),
+            browser_max_rss_mb=max(0, browser_max_rss_mb),
+            scrape_concurrency=max(1, scrape_concurrency),
+            scrape_freshness_s=max(0, scrape_freshness_s),
+            settle_window_ms=max(0, settle_window_ms),
+            settle_deadline_ms=max(0, settle_deadline_ms),
+            block_profile=block_profile,
+            blocked_domains=blocked_domains,
+            extraction_mode=extraction_mode,
+            storage_state_path=storage_state_path,
+            storage_state_max_age_h=max(0, storage_state_max_age_h),
+            history_mode=history_mode if history_mode in {"full", "delta"} else "full",
+            alert_mode=alert_mode if alert_mode in {"instant", "digest"} else "instant",
+            alert_digest_window_min=max(0, alert_digest_window_min),
+            alert_throttle_min=max(0, alert_throttle_min),
+            alert_min_delta_pct=max(0.0, alert_min_delta_pct),
+            schedule_mode=schedule_mode if schedule_mode in {"adaptive", "fixed"} else "adaptive",
+            schedule_min_interval_min=schedule_min_interval_min,
+            schedule_max_interval_min=max(schedule_min_interval_min, schedule_max_interval_min),
+            worker_mode=worker_mode if worker_mode in {"embedded", "external"} else "embedded",
+        )
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import csv
+import io
+from itertools import islice
+from typing import Any, Iterator
+import zlib
+
+from .storage import EXPORT_COLUMNS, export_rows
+
+EXPORT_FORMATS = {
+    "csv": ("application/gzip", "csv.gz"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+CSV_BATCH_ROWS = 5_000
+CSV_GZIP_LEVEL = 1
+PARQUET_ROW_GROUP_ROWS = 50_000
+
+
+def export_filename(table: str, fmt: str, event_id: int | None = None) -> str:
+    scope = f"event-{event_id}" if event_id is not None else "all"
+    return f"viagoscrap-{table}-{scope}.{EXPORT_FORMATS[fmt][1]}"
+
+
+def stream_export(
+    db_path: str,
+    table: str,
+    fmt: str,
+    event_id: int | None = None,
+    start: str | None = None,
+    end: str | None = None,
+) -> Iterator[bytes]:
+    """Yield the export as compressed chunks; memory stays bounded by one batch of rows."""
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"unknown export table: {table}")
+    if fmt == "csv":
+        return _csv_gzip(export_rows(db_path, table, event_id, start, end), EXPORT_COLUMNS[table])
+    if fmt == "parquet":
+        rows = export_rows(db_path, table, event_id, start, end, epoch_ms=True)
+        return _parquet(rows, table)
+    raise ValueError(f"unknown export format: {fmt}")
+
+
+def _csv_gzip(rows: Iterator[tuple[Any, ...]], columns: tuple[str, ...]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(CSV_GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    while True:
+        batch = list(islice(rows, CSV_BATCH_ROWS))
+        writer.writerows(batch)
+        chunk = compressor.compress(buffer.getvalue().encode("utf-8"))
+        buffer.seek(0)
+        buffer.truncate()
+        if chunk:
+            yield chunk
+        if len(batch) < CSV_BATCH_ROWS:
+            break
+    yield compressor.flush()
+
+
+class _Drain(io.RawIOBase):
+    """Write-only sink whose bytes are handed out after every Parquet row group."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self.chunks.append(chunk)
+        self.position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _parquet_schema(table: str):
+    import pyarrow as pa
+
+    if table == "history":
+        return pa.schema(
+            [
+                ("id", pa.int64()),
+                ("event_id", pa.int64()),
+                ("scraped_at", pa.timestamp("ms", tz="UTC")),
+                ("title", pa.string()),
+                ("date_label", pa.string()),
+                ("price_raw", pa.string()),
+                ("price_value", pa.float64()),
+                ("currency", pa.string()),
+                ("listing_url", pa.string()),
+                ("listing_key", pa.string()),
+                ("change", pa.string()),
+            ]
+        )
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("event_id", pa.int64()),
+            ("started_at", pa.string()),
+            ("finished_at", pa.string()),
+            ("status", pa.string()),
+            ("error", pa.string()),
+            ("items_found", pa.int64()),
+            ("items_saved", pa.int64()),
+            ("min_price_found", pa.float64()),
+            ("metrics", pa.string()),
+        ]
+    )
+
+
+def _parquet(rows: Iterator[tuple[Any, ...]], table: str) -> Iterator[bytes]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ModuleNotFoundError as exc:
+        raise RuntimeError("Parquet export needs pyarrow (pip install 'viagoscrap[export]')") from exc
+
+    schema = _parquet_schema(table)
+    return _parquet_chunks(rows, schema, pa, pq)
+
+
+def _parquet_chunks(rows: Iterator[tuple[Any, ...]], schema, pa, pq) -> Iterator[bytes]:
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        while True:
+            batch = list(islice(rows, PARQUET_ROW_GROUP_ROWS))
+            if batch:
+                columns = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+                chunk = sink.take()
+                if chunk:
+                    yield chunk
+            if len(batch) < PARQUET_ROW_GROUP_ROWS:
+                break
+    finally:
+        writer.close()
+    yield sink.take()
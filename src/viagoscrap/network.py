@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import re
+import time
+from typing import Any
+from urllib.parse import urljoin, urlsplit
+
+from .config import Settings
+
+
+BLOCK_PROFILES: dict[str, frozenset[str]] = {
+    "off": frozenset(),
+    "default": frozenset({"image", "media", "font"}),
+    "strict": frozenset({"image", "media", "font", "stylesheet"}),
+}
+DEFAULT_BLOCKED_DOMAINS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googleadservices.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "connect.facebook.com",
+    "bat.bing.com",
+    "clarity.ms",
+    "hotjar.com",
+    "criteo.com",
+    "criteo.net",
+    "adnxs.com",
+    "taboola.com",
+    "outbrain.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "tiktok.com",
+    "snapchat.com",
+    "pinterest.com",
+    "nr-data.net",
+)
+
+
+@dataclass(slots=True)
+class RequestFilter:
+    profile: str = "default"
+    blocked_types: frozenset[str] = BLOCK_PROFILES["default"]
+    blocked_domains: tuple[str, ...] = DEFAULT_BLOCKED_DOMAINS
+    requests: int = 0
+    bytes_loaded: int = 0
+    blocked_requests: int = 0
+    blocked_by_reason: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "RequestFilter":
+        profile = settings.block_profile if settings.block_profile in BLOCK_PROFILES else "default"
+        if profile == "off":
+            return cls(profile="off", blocked_types=frozenset(), blocked_domains=())
+        return cls(
+            profile=profile,
+            blocked_types=BLOCK_PROFILES[profile],
+            blocked_domains=DEFAULT_BLOCKED_DOMAINS + tuple(settings.blocked_domains),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.blocked_types or self.blocked_domains)
+
+    def block_reason(self, resource_type: str, url: str) -> str | None:
+        if resource_type in self.blocked_types:
+            return resource_type
+        host = (urlsplit(url).hostname or "").lower()
+        for domain in self.blocked_domains:
+            if host == domain or host.endswith("." + domain):
+                return domain
+        return None
+
+    async def handle(self, route) -> None:
+        request = route.request
+        reason = self.block_reason(request.resource_type, request.url)
+        if reason is None:
+            await route.continue_()
+            return
+        self.blocked_requests += 1
+        self.blocked_by_reason[reason] = self.blocked_by_reason.get(reason, 0) + 1
+        await route.abort("blockedbyclient")
+
+    def on_response(self, response) -> None:
+        self.requests += 1
+        try:
+            self.bytes_loaded += int(response.headers.get("content-length", 0))
+        except (TypeError, ValueError):
+            pass
+
+    async def attach(self, page) -> None:
+        page.on("response", self.on_response)
+        if self.enabled:
+            await page.route("**/*", self.handle)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "profile": self.profile,
+            "requests": self.requests,
+            "bytes_loaded": self.bytes_loaded,
+            "blocked_requests": self.blocked_requests,
+            "blocked_by_reason": dict(self.blocked_by_reason),
+        }
+
+
+class XhrActivity:
+    """Counts the page's XHR/fetch requests in flight, so an empty listing grid can be told
+    apart from one whose data has not arrived yet."""
+
+    def __init__(self) -> None:
+        self.pending = 0
+        self.last_change = time.monotonic()
+
+    def attach(self, page) -> None:
+        page.on("request", self.on_started)
+        page.on("requestfinished", self.on_ended)
+        page.on("requestfailed", self.on_ended)
+
+    def on_started(self, request) -> None:
+        if request.resource_type in {"xhr", "fetch"}:
+            self.pending += 1
+            self.last_change = time.monotonic()
+
+    def on_ended(self, request) -> None:
+        if request.resource_type in {"xhr", "fetch"}:
+            self.pending = max(0, self.pending - 1)
+            self.last_change = time.monotonic()
+
+    def idle_for(self, now: float) -> float:
+        return 0.0 if self.pending else max(0.0, now - self.last_change)
+
+
+PRICE_KEYS = (
+    "RawPrice",
+    "rawPrice",
+    "PriceWithFees",
+    "priceWithFees",
+    "TotalPrice",
+    "totalPrice",
+    "Price",
+    "price",
+    "FormattedPrice",
+    "formattedPrice",
+)
+SECTION_KEYS = ("SectionName", "sectionName", "Section", "section", "ZoneName", "zoneName", "TicketClassName", "ticketClassName")
+ROW_KEYS = ("Row", "row", "RowName", "rowName")
+LISTING_ID_KEYS = ("ListingId", "listingId", "listing_id")
+LISTING_URL_KEYS = ("ListingUrl", "listingUrl", "BuyUrl", "buyUrl", "Url", "url")
+DATE_KEYS = ("FormattedEventDate", "formattedEventDate", "EventDate", "eventDate")
+CURRENCY_KEYS = ("CurrencyCode", "currencyCode", "Currency", "currency")
+AMOUNT_KEYS = ("Amount", "amount", "Value", "value", "Raw", "raw")
+MAX_PAYLOAD_DEPTH = 12
+
+
+def _first(data: dict[str, Any], keys: tuple[str, ...]) -> Any:
+    for key in keys:
+        value = data.get(key)
+        if value not in (None, "", [], {}):
+            return value
+    return None
+
+
+def _format_price(value: Any, currency: Any) -> str | None:
+    if isinstance(value, dict):
+        currency = _first(value, CURRENCY_KEYS) or currency
+        value = _first(value, AMOUNT_KEYS)
+    if isinstance(currency, str) and currency.strip().upper() not in {"EUR", "€"}:
+        return None
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return f"{value:.2f} €".replace(".", ",")
+    text = " ".join(str(value).split())
+    match = re.search(r"\d[\d\s.,]*", text)
+    if not match:
+        return None
+    remainder = text.replace(match.group(0), "").replace("€", "").strip()
+    if remainder and remainder.upper() != "EUR":
+        return None
+    return f"{match.group(0).strip()} €"
+
+
+def _listing_from_dict(data: dict[str, Any], page_url: str) -> tuple[str, str, str, str] | None:
+    price_value = _first(data, PRICE_KEYS)
+    if price_value is None:
+        return None
+    section = _first(data, SECTION_KEYS)
+    if section is None and _first(data, LISTING_ID_KEYS) is None:
+        return None
+    price = _format_price(price_value, _first(data, CURRENCY_KEYS))
+    if not price:
+        return None
+    if isinstance(section, dict):
+        section = _first(section, ("Name", "name"))
+    row = _first(data, ROW_KEYS)
+    title = str(section).strip() if section is not None else "Listing"
+    if row is not None and not isinstance(row, (dict, list)):
+        title = f"{title} - Rang {row}"
+    date = _first(data, DATE_KEYS)
+    href = _first(data, LISTING_URL_KEYS)
+    url = urljoin(page_url, href) if isinstance(href, str) else page_url
+    return title, str(date) if isinstance(date, str) else "", price, url
+
+
+def listings_from_payload(payload: Any, page_url: str) -> list[tuple[str, str, str, str]]:
+    """Walk a JSON payload and return (title, date, price, url) for every listing-shaped object."""
+    out: list[tuple[str, str, str, str]] = []
+    stack: list[tuple[Any, int]] = [(payload, 0)]
+    while stack:
+        node, depth = stack.pop()
+        if depth > MAX_PAYLOAD_DEPTH:
+            continue
+        if isinstance(node, list):
+            stack.extend((item, depth + 1) for item in reversed(node))
+        elif isinstance(node, dict):
+            listing = _listing_from_dict(node, page_url)
+            if listing is not None:
+                out.append(listing)
+                continue
+            stack.extend((value, depth + 1) for value in reversed(list(node.values())))
+    return out
+
+
+class ListingCapture:
+    """Collects listings from the JSON responses that feed the page's listing grid."""
+
+    def __init__(self, page_url: str, quiet_s: float) -> None:
+        self.page_url = page_url
+        self.quiet_s = quiet_s
+        self.listings: list[tuple[str, str, str, str]] = []
+        self.payloads = 0
+        self.last_listing_at: float | None = None
+        self._seen: set[tuple[str, str, str]] = set()
+        self._tasks: set[asyncio.Task] = set()
+
+    def attach(self, page) -> None:
+        page.on("response", self.on_response)
+
+    def on_response(self, response) -> None:
+        if response.request.resource_type not in {"xhr", "fetch"} or response.status != 200:
+            return
+        if "json" not in response.headers.get("content-type", ""):
+            return
+        task = asyncio.ensure_future(self._read(response))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _read(self, response) -> None:
+        try:
+            payload = await response.json()
+        except Exception:
+            return
+        self.feed(payload)
+
+    def feed(self, payload: Any) -> None:
+        found = listings_from_payload(payload, self.page_url)
+        if not found:
+            return
+        self.payloads += 1
+        for title, date, price, url in found:
+            key = (title, price, url)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self.listings.append((title, date, price, url))
+        self.last_listing_at = time.monotonic()
+
+    def ready(self) -> bool:
+        return self.last_listing_at is not None and time.monotonic() - self.last_listing_at >= self.quiet_s
+
+    def close(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
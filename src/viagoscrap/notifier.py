@@ -9,12 +9,32 @@ import httpx
 
 
 RESEND_API_URL = "https://api.resend.com/emails"
+RESEND_BATCH_URL = "https://api.resend.com/emails/batch"
+RESEND_BATCH_MAX = 100
 
 
 def _default_provider() -> str:
     return os.getenv("EMAIL_PROVIDER", "resend").strip().lower()
 
 
+def resolve_recipients(recipients: list[str] | None) -> list[str]:
+    to_list = [mail.strip().lower() for mail in (recipients or []) if mail and mail.strip()]
+    default_to = os.getenv("ALERT_TO_EMAIL")
+    if default_to:
+        to_list.append(default_to.strip().lower())
+    return sorted(set(to_list))
+
+
+def is_retryable(result: dict[str, Any]) -> bool:
+    """Whether a failed send may succeed later (network error, rate limit, provider outage)."""
+    if result.get("sent"):
+        return False
+    if result.get("reason") == "exception":
+        return True
+    status_code = result.get("status_code") or 0
+    return result.get("reason") == "provider_error" and (status_code in {408, 429} or status_code >= 500)
+
+
 def send_min_drop_email(
     *,
     event_name: str,
@@ -24,32 +44,15 @@ def send_min_drop_email(
     currency: str = "EUR",
     recipients: list[str] | None = None,
 ) -> dict[str, Any]:
-    to_list = [mail.strip().lower() for mail in (recipients or []) if mail and mail.strip()]
-    default_to = os.getenv("ALERT_TO_EMAIL")
-    if default_to:
-        to_list.append(default_to.strip().lower())
-    to_list = sorted(set(to_list))
-    if not to_list:
-        return {"sent": False, "reason": "no_recipients"}
-
-    provider = _default_provider()
-    if provider == "smtp":
-        return _send_via_smtp(
+    with Mailer() as mailer:
+        return mailer.send_min_drop(
             event_name=event_name,
             event_url=event_url,
             old_price=old_price,
             new_price=new_price,
             currency=currency,
-            recipients=to_list,
+            recipients=recipients,
         )
-    return _send_via_resend(
-        event_name=event_name,
-        event_url=event_url,
-        old_price=old_price,
-        new_price=new_price,
-        currency=currency,
-        recipients=to_list,
-    )
 
 
 def _build_email_content(event_name: str, event_url: str, old_price: float, new_price: float, currency: str) -> tuple[str, str]:
@@ -66,61 +69,184 @@ def _build_email_content(event_name: str, event_url: str, old_price: float, new_
     return subject, html
 
 
-def _send_via_resend(
-    *,
-    event_name: str,
-    event_url: str,
-    old_price: float,
-    new_price: float,
-    currency: str,
-    recipients: list[str],
-) -> dict[str, Any]:
-    api_key = os.getenv("RESEND_API_KEY", "")
-    sender = os.getenv("ALERT_FROM_EMAIL", "")
-    if not (api_key and sender):
-        return {"sent": False, "reason": "resend_not_configured"}
-    subject, html = _build_email_content(event_name, event_url, old_price, new_price, currency)
-
-    with httpx.Client(timeout=15.0) as client:
-        response = client.post(
+def _build_digest_content(drops: list[dict[str, Any]]) -> tuple[str, str]:
+    best = drops[0]
+    if len(drops) == 1:
+        subject = f"[ViagoScrap] Nouveau prix minimum: {best['new_price']:.2f} {best['currency']}"
+    else:
+        subject = f"[ViagoScrap] {len(drops)} baisses de prix, jusqu'a {best['new_price']:.2f} {best['currency']}"
+    dashboard_url = os.getenv("DASHBOARD_URL", "http://127.0.0.1:8000")
+    lines = "".join(
+        f"""
+        <tr>
+          <td><a href="{drop['event_url']}">{drop['event_name']}</a></td>
+          <td>{drop['old_price']:.2f} {drop['currency']}</td>
+          <td><strong>{drop['new_price']:.2f} {drop['currency']}</strong></td>
+        </tr>"""
+        for drop in drops
+    )
+    html = f"""
+    <h2>Nouveaux prix minimum detectes</h2>
+    <table>
+      <tr><th>Event</th><th>Ancien min</th><th>Nouveau min</th></tr>{lines}
+    </table>
+    <p><a href="{dashboard_url}">Ouvrir le dashboard</a></p>
+    """
+    return subject, html
+
+
+class Mailer:
+    """Sends alert emails over connections kept open between sends.
+
+    The Resend client keeps its HTTP connection alive and the SMTP session stays logged in;
+    it is checked with NOOP before reuse and reopened if the server dropped it. Not
+    thread-safe: the outbox dispatcher owns one instance.
+    """
+
+    def __init__(self) -> None:
+        self._http: httpx.Client | None = None
+        self._smtp: smtplib.SMTP | None = None
+        self._smtp_key: tuple[Any, ...] | None = None
+
+    def __enter__(self) -> "Mailer":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def send_min_drop(
+        self,
+        *,
+        event_name: str,
+        event_url: str,
+        old_price: float,
+        new_price: float,
+        currency: str = "EUR",
+        recipients: list[str] | None = None,
+    ) -> dict[str, Any]:
+        to_list = resolve_recipients(recipients)
+        if not to_list:
+            return {"sent": False, "reason": "no_recipients"}
+        subject, html = _build_email_content(event_name, event_url, old_price, new_price, currency)
+        if _default_provider() == "smtp":
+            return self._send_via_smtp(subject, html, to_list)
+        return self._send_via_resend(subject, html, to_list)
+
+    def send_digests(self, digests: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Send one digest per recipient, as a single batch call when the provider supports it."""
+        messages = []
+        for digest in digests:
+            subject, html = _build_digest_content(digest["drops"])
+            messages.append((subject, html, [digest["recipient"]]))
+        if _default_provider() == "smtp":
+            results = []
+            for subject, html, recipients in messages:
+                try:
+                    results.append(self._send_via_smtp(subject, html, recipients))
+                except (smtplib.SMTPException, OSError) as exc:
+                    results.append({"sent": False, "reason": "exception", "error": f"{type(exc).__name__}: {exc}"})
+            return results
+        results = []
+        for start in range(0, len(messages), RESEND_BATCH_MAX):
+            results.extend(self._send_batch_via_resend(messages[start:start + RESEND_BATCH_MAX]))
+        return results
+
+    def close(self) -> None:
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+        self._close_smtp()
+
+    def _send_via_resend(self, subject: str, html: str, recipients: list[str]) -> dict[str, Any]:
+        api_key = os.getenv("RESEND_API_KEY", "")
+        sender = os.getenv("ALERT_FROM_EMAIL", "")
+        if not (api_key and sender):
+            return {"sent": False, "reason": "resend_not_configured"}
+        response = self._client().post(
             RESEND_API_URL,
             headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
             json={"from": sender, "to": recipients, "subject": subject, "html": html},
         )
 
-    if response.status_code >= 400:
-        return {"sent": False, "reason": "provider_error", "status_code": response.status_code, "body": response.text}
-
-    return {"sent": True, "provider": "resend", "recipients": recipients}
+        if response.status_code >= 400:
+            return {"sent": False, "reason": "provider_error", "status_code": response.status_code, "body": response.text}
 
+        return {"sent": True, "provider": "resend", "recipients": recipients}
 
-def _send_via_smtp(
-    *,
-    event_name: str,
-    event_url: str,
-    old_price: float,
-    new_price: float,
-    currency: str,
-    recipients: list[str],
-) -> dict[str, Any]:
-    host = os.getenv("SMTP_HOST", "")
-    port = int(os.getenv("SMTP_PORT", "587"))
-    username = os.getenv("SMTP_USERNAME", "")
-    password = os.getenv("SMTP_PASSWORD", "")
-    sender = os.getenv("ALERT_FROM_EMAIL", "")
-    use_tls = os.getenv("SMTP_USE_TLS", "true").lower() in {"1", "true", "yes", "y"}
-    if not (host and username and password and sender):
-        return {"sent": False, "reason": "smtp_not_configured"}
-
-    subject, html = _build_email_content(event_name, event_url, old_price, new_price, currency)
-    msg = MIMEText(html, "html", "utf-8")
-    msg["Subject"] = subject
-    msg["From"] = sender
-    msg["To"] = ", ".join(recipients)
-
-    with smtplib.SMTP(host, port, timeout=20) as server:
-        if use_tls:
-            server.starttls()
-        server.login(username, password)
-        server.sendmail(sender, recipients, msg.as_string())
-    return {"sent": True, "provider": "smtp", "recipients": recipients}
+    def _send_batch_via_resend(self, messages: list[tuple[str, str, list[str]]]) -> list[dict[str, Any]]:
+        api_key = os.getenv("RESEND_API_KEY", "")
+        sender = os.getenv("ALERT_FROM_EMAIL", "")
+        if not (api_key and sender):
+            return [{"sent": False, "reason": "resend_not_configured"}] * len(messages)
+        response = self._client().post(
+            RESEND_BATCH_URL,
+            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
+            json=[{"from": sender, "to": to, "subject": subject, "html": html} for subject, html, to in messages],
+        )
+        if response.status_code >= 400:
+            failure = {"sent": False, "reason": "provider_error", "status_code": response.status_code, "body": response.text}
+            return [failure] * len(messages)
+        return [{"sent": True, "provider": "resend", "recipients": to, "batch": len(messages)} for _, _, to in messages]
+
+    def _send_via_smtp(self, subject: str, html: str, recipients: list[str]) -> dict[str, Any]:
+        host = os.getenv("SMTP_HOST", "")
+        port = int(os.getenv("SMTP_PORT", "587"))
+        username = os.getenv("SMTP_USERNAME", "")
+        password = os.getenv("SMTP_PASSWORD", "")
+        sender = os.getenv("ALERT_FROM_EMAIL", "")
+        use_tls = os.getenv("SMTP_USE_TLS", "true").lower() in {"1", "true", "yes", "y"}
+        if not (host and username and password and sender):
+            return {"sent": False, "reason": "smtp_not_configured"}
+
+        msg = MIMEText(html, "html", "utf-8")
+        msg["Subject"] = subject
+        msg["From"] = sender
+        msg["To"] = ", ".join(recipients)
+
+        key = (host, port, username, password, use_tls)
+        try:
+            self._smtp_session(key).sendmail(sender, recipients, msg.as_string())
+        except smtplib.SMTPServerDisconnected:
+            # The server may hang up between NOOP and the send: one fresh session, then give up.
+            self._close_smtp()
+            self._smtp_session(key).sendmail(sender, recipients, msg.as_string())
+        return {"sent": True, "provider": "smtp", "recipients": recipients}
+
+    def _client(self) -> httpx.Client:
+        if self._http is None:
+            self._http = httpx.Client(
+                timeout=15.0,
+                limits=httpx.Limits(max_keepalive_connections=2, keepalive_expiry=120),
+            )
+        return self._http
+
+    def _smtp_session(self, key: tuple[Any, ...]) -> smtplib.SMTP:
+        if self._smtp is not None and self._smtp_key == key:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+        self._close_smtp()
+        host, port, username, password, use_tls = key
+        server = smtplib.SMTP(host, port, timeout=20)
+        try:
+            if use_tls:
+                server.starttls()
+            server.login(username, password)
+        except Exception:
+            server.close()
+            raise
+        self._smtp = server
+        self._smtp_key = key
+        return server
+
+    def _close_smtp(self) -> None:
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        self._smtp = None
+        self._smtp_key = None
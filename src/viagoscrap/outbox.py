@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import sys
+import threading
+from typing import Any
+
+from .notifier import Mailer, is_retryable
+from .storage import build_digests, claim_notifications, complete_notification
+
+POLL_INTERVAL_S = 15.0
+BATCH_SIZE = 20
+DIGEST_WINDOW_S = 30 * 60
+DIGEST_THROTTLE_S = 60 * 60
+
+
+def _debug(enabled: bool, message: str) -> None:
+    if enabled:
+        print(f"[outbox] {message}", file=sys.stderr)
+
+
+class OutboxDispatcher:
+    """Background thread that drains `notification_outbox`.
+
+    Scrapes only insert outbox rows (in the same transaction as the prices); this thread
+    sends them with one long-lived `Mailer`, so a slow or failing provider never holds up
+    a scrape. `wake()` triggers an immediate pass; otherwise the outbox is polled every
+    `poll_interval_s` seconds, which is also when backed-off retries become due.
+    Each pass first folds held digest items into per-recipient digests (ALERT_MODE=digest);
+    the digests claimed together go out as one provider batch call.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        poll_interval_s: float = POLL_INTERVAL_S,
+        batch_size: int = BATCH_SIZE,
+        digest_window_s: float = DIGEST_WINDOW_S,
+        digest_throttle_s: float = DIGEST_THROTTLE_S,
+        mailer: Any | None = None,
+        debug: bool = False,
+    ) -> None:
+        self.db_path = db_path
+        self.poll_interval_s = poll_interval_s
+        self.batch_size = batch_size
+        self.digest_window_s = digest_window_s
+        self.digest_throttle_s = digest_throttle_s
+        self.debug = debug
+        self.mailer = mailer or Mailer()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._drain_lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._loop, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.mailer.close()
+
+    def drain(self) -> dict[str, int]:
+        counts = {"sent": 0, "pending": 0, "failed": 0}
+        with self._drain_lock:
+            build_digests(self.db_path, self.digest_window_s, self.digest_throttle_s)
+            while not self._stopping.is_set():
+                batch = claim_notifications(self.db_path, limit=self.batch_size)
+                digests = [item for item in batch if item["kind"] == "digest"]
+                for item, result in zip(digests, self._send_digests(digests)):
+                    counts[self._complete(item, result)] += 1
+                for item in batch:
+                    if item["kind"] != "digest":
+                        counts[self._deliver(item)] += 1
+                if len(batch) < self.batch_size:
+                    break
+        return counts
+
+    def _deliver(self, item: dict[str, Any]) -> str:
+        try:
+            if item["kind"] != "min_drop":
+                raise ValueError(f"unknown notification kind: {item['kind']}")
+            result = self.mailer.send_min_drop(**item["payload"])
+        except ValueError as exc:
+            result = {"sent": False, "reason": "invalid", "error": str(exc)}
+        except Exception as exc:
+            result = {"sent": False, "reason": "exception", "error": f"{type(exc).__name__}: {exc}"}
+        return self._complete(item, result)
+
+    def _send_digests(self, digests: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        if not digests:
+            return []
+        try:
+            return self.mailer.send_digests([item["payload"] for item in digests])
+        except Exception as exc:
+            return [{"sent": False, "reason": "exception", "error": f"{type(exc).__name__}: {exc}"}] * len(digests)
+
+    def _complete(self, item: dict[str, Any], result: dict[str, Any]) -> str:
+        error = None if result.get("sent") else str(result.get("error") or result.get("reason"))
+        status = complete_notification(
+            self.db_path,
+            int(item["id"]),
+            sent=bool(result.get("sent")),
+            retry=is_retryable(result),
+            error=error,
+            result=result,
+        )
+        _debug(self.debug, f"notification {item['id']} attempt {item['attempts']}: {status} ({error or 'ok'})")
+        return status
+
+    def _loop(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.clear()
+            try:
+                self.drain()
+            except Exception as exc:
+                _debug(self.debug, f"drain failed: {exc}")
+            self._wakeup.wait(self.poll_interval_s)
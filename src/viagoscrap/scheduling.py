@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from .config import Settings
+from .storage import active_events, list_schedules, save_schedule, schedule_inputs
+
+JITTER = 0.1
+LOOKBACK_DAYS = 7
+MIN_SAMPLES = 3
+
+
+def _iso(value: datetime) -> str:
+    return value.isoformat(timespec="milliseconds")
+
+
+def compute_interval(
+    base_min: float,
+    stats: dict[str, Any],
+    floor_min: float,
+    ceiling_min: float,
+) -> tuple[float, dict[str, Any]]:
+    """Scale the base interval by price volatility, audience and recent failures, then clamp."""
+    volatility = stats.get("volatility_pct")
+    if volatility is None or stats.get("summaries", 0) < MIN_SAMPLES:
+        volatility_factor = 1.0
+    elif volatility < 0.1:
+        volatility_factor = 3.0
+    elif volatility < 0.5:
+        volatility_factor = 1.5
+    elif volatility < 2.0:
+        volatility_factor = 1.0
+    else:
+        volatility_factor = 0.5
+    subscribers = int(stats.get("subscribers") or 0)
+    audience_factor = 1.5 if subscribers == 0 else 1.0 if subscribers < 5 else 0.75
+    # A page that keeps failing is retried less often instead of burning browser time.
+    error_rate = float(stats.get("error_rate") or 0.0)
+    error_factor = 1.0 + 3.0 * error_rate if stats.get("runs", 0) >= MIN_SAMPLES else 1.0
+    interval = min(ceiling_min, max(floor_min, base_min * volatility_factor * audience_factor * error_factor))
+    factors = {
+        "base_min": base_min,
+        "volatility_pct": None if volatility is None else round(volatility, 3),
+        "volatility_factor": volatility_factor,
+        "subscribers": subscribers,
+        "audience_factor": audience_factor,
+        "error_rate": round(error_rate, 3),
+        "error_factor": round(error_factor, 3),
+    }
+    return round(interval, 2), factors
+
+
+def plan_due_events(
+    db_path: str,
+    base_min: float,
+    settings: Settings,
+    now: datetime | None = None,
+    rng: random.Random | None = None,
+) -> list[dict[str, Any]]:
+    """Return the active events due for a scrape and book their next run.
+
+    Events without a schedule get a first run spread over one base interval, and every
+    next run is jittered by +/-JITTER so events never settle into firing together.
+    """
+    now = now or datetime.now(timezone.utc)
+    rng = rng or random.Random()
+    now_iso = _iso(now)
+    schedules = {row["event_id"]: row for row in list_schedules(db_path) if row["next_run_at"]}
+    due: list[tuple[dict[str, Any], dict[str, Any]]] = []
+    for event in active_events(db_path):
+        schedule = schedules.get(event["id"])
+        if schedule is None:
+            first_run = now + timedelta(minutes=rng.uniform(0, base_min))
+            save_schedule(db_path, int(event["id"]), base_min, _iso(first_run))
+        elif schedule["next_run_at"] <= now_iso:
+            due.append((event, schedule))
+    if not due:
+        return []
+
+    inputs = schedule_inputs(db_path, since=_iso(now - timedelta(days=LOOKBACK_DAYS)))
+    for event, schedule in due:
+        if schedule["pinned_interval_min"]:
+            interval, factors = float(schedule["pinned_interval_min"]), {"pinned": True}
+        else:
+            interval, factors = compute_interval(
+                base_min,
+                inputs.get(int(event["id"]), {}),
+                settings.schedule_min_interval_min,
+                settings.schedule_max_interval_min,
+            )
+        next_run = now + timedelta(minutes=interval * rng.uniform(1 - JITTER, 1 + JITTER))
+        save_schedule(db_path, int(event["id"]), interval, _iso(next_run), factors)
+    return [event for event, _ in due]
@@ -1,12 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import contextmanager
 from dataclasses import dataclass
+from pathlib import Path
 import re
 import sys
-from typing import Any, Protocol
-from urllib.parse import urljoin
-
+import time
+from typing import Any, Callable, Iterator, Protocol
+from urllib.parse import urljoin, urlsplit
+
+from .browser import (
+    CONTEXT_OPTIONS,
+    DEFAULT_USER_AGENT,
+    BrowserPool,
+    launch_browser,
+    save_storage_state,
+    usable_storage_state,
+)
 from .config import Settings
+from .network import ListingCapture, RequestFilter, XhrActivity
 
 
 @dataclass(slots=True)
@@ -22,10 +35,50 @@ class _LocatorContext(Protocol):
 
 
 EURO = "\u20ac"
-DEFAULT_USER_AGENT = (
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-    "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36"
+LISTINGS_CONTAINER = "[data-testid='listings-container']"
+CARD_SNAPSHOT_JS = "nodes => nodes.map((node) => [node.innerText || '', node.getAttribute('href')])"
+# Cheap fingerprint of the listing area: node count + hash of every price string it shows.
+SETTLE_PROBE_JS = """() => {
+  const container = document.querySelector("[data-testid='listings-container']");
+  const loaded = document.readyState === "complete";
+  const scope = container || document.body;
+  if (!scope) return [0, 0, 0, false, loaded];
+  const count = scope.querySelectorAll("[data-testid*='listing'], li, article").length;
+  const prices = scope.innerText.match(/\\d[\\d\\s,.]*\\s?(?:\u20ac|EUR)/gi) || [];
+  let hash = 0;
+  for (const price of prices) {
+    for (let i = 0; i < price.length; i++) hash = (hash * 31 + price.charCodeAt(i)) | 0;
+  }
+  return [count, prices.length, hash, !!container, loaded];
+}"""
+COOKIE_BANNER_SELECTORS = (
+    "[data-testid='cookie-compliance-allow-all-button']",
+    "button#onetrust-accept-btn-handler",
+    "#onetrust-banner-sdk",
 )
+LISTING_SELECTORS = (
+    LISTINGS_CONTAINER,
+    "div[data-testid*='listing']:has-text('\u20ac')",
+    "li[data-testid*='listing']:has-text('\u20ac')",
+    "tr[data-testid*='listing']:has-text('\u20ac')",
+    "div[data-testid*='listing']",
+    "li[data-testid*='listing']",
+    "tr[data-testid*='listing']",
+    "div[data-testid='event-card']",
+    "a[data-testid='event-link']",
+    "article:has-text('\u20ac')",
+    "li:has-text('\u20ac')",
+)
+EXPAND_SELECTORS = (
+    "button:has-text('Afficher plus')",
+    "button:has-text('Show more')",
+    "[data-testid='listings-container'] button",
+)
+SETTLE_POLL_MS = 250
+FOLLOW_UP_SETTLE_MS = 3_000
+# A page showing no listing must stay unchanged this many settle windows (and have no
+# XHR/fetch in flight) before it counts as empty rather than still loading.
+EMPTY_SETTLE_WINDOWS = 3
 COOKIE_ACCEPT_SELECTORS = (
     "[data-testid='cookie-compliance-allow-all-button']",
     "button#onetrust-accept-btn-handler",
@@ -80,6 +133,135 @@ def _is_reasonable_ticket_price(price: str) -> bool:
     return value >= 20.0
 
 
+class _Stability:
+    """Tracks probe samples and reports when they stopped changing for `window_s`.
+
+    A page without listings (sold out, no offers) also settles once its listing container
+    is rendered or the document has loaded, but only after `empty_window_s` and a quiet
+    network: listing XHRs often complete after the load event.
+    """
+
+    def __init__(self, window_s: float, empty_window_s: float | None = None) -> None:
+        self.window_s = window_s
+        self.empty_window_s = window_s if empty_window_s is None else empty_window_s
+        self.last: tuple[Any, ...] | None = None
+        self.since = 0.0
+
+    def update(self, sample: tuple[Any, ...] | None, now: float, network_idle_s: float | None = None) -> bool:
+        if sample != self.last:
+            self.last = sample
+            self.since = now
+            return False
+        if not sample:
+            return False
+        count, prices, _hash, has_container, loaded = sample
+        if count or prices:
+            return now - self.since >= self.window_s
+        if not (has_container or loaded):
+            return False
+        if network_idle_s is not None and network_idle_s < self.window_s:
+            return False
+        return now - self.since >= self.empty_window_s
+
+
+@contextmanager
+def _stage(metrics: dict[str, Any], name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = metrics.setdefault("timings_ms", {})
+        timings[name] = timings.get(name, 0) + round((time.perf_counter() - started) * 1000)
+
+
+async def _wait_until_settled(
+    page,
+    window_ms: int,
+    deadline_ms: int,
+    stop: Callable[[], bool] | None = None,
+    activity: XhrActivity | None = None,
+) -> bool:
+    stability = _Stability(window_ms / 1000, EMPTY_SETTLE_WINDOWS * window_ms / 1000)
+    deadline = time.monotonic() + deadline_ms / 1000
+    while True:
+        if stop is not None and stop():
+            return True
+        try:
+            sample = tuple(await page.evaluate(SETTLE_PROBE_JS))
+        except Exception:
+            sample = None
+        now = time.monotonic()
+        if stability.update(sample, now, activity.idle_for(now) if activity is not None else None):
+            return True
+        if now >= deadline:
+            return False
+        await asyncio.sleep(SETTLE_POLL_MS / 1000)
+
+
+class _SelectorPicks:
+    """Puts the selector that won last time first and reports which one won this time."""
+
+    def __init__(self, preferred: dict[str, str] | None, metrics: dict[str, Any]) -> None:
+        self.preferred = preferred or {}
+        self.outcomes: dict[str, dict[str, Any]] = metrics.setdefault("selectors", {})
+
+    def order(self, kind: str, candidates: list[str] | tuple[str, ...]) -> list[str]:
+        preferred = self.preferred.get(kind)
+        if preferred not in candidates:
+            return list(candidates)
+        return [preferred, *[selector for selector in candidates if selector != preferred]]
+
+    def record(self, kind: str, winner: str | None) -> None:
+        preferred = self.preferred.get(kind)
+        if winner is None and preferred is None:
+            return
+        self.outcomes[kind] = {"selector": winner, "hit": preferred is not None and winner == preferred}
+
+
+def _parse_cards(
+    nodes: list[list[str | None]],
+    page_url: str,
+    container: bool = False,
+    debug: bool = False,
+) -> list[Ticket]:
+    items: list[Ticket] = []
+    seen: set[tuple[str, str, str]] = set()
+
+    for i, (text, href) in enumerate(nodes):
+        text = text or ""
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+
+        title = lines[0] if lines else ""
+        date = lines[1] if len(lines) > 1 else ""
+        full_url = urljoin(page_url, href or "")
+
+        # listings-container often contains all rows in one block; split all prices
+        multi_prices = _extract_all_prices(text) if container else []
+        if multi_prices:
+            for price in multi_prices:
+                key = (title or "Listing", price, full_url)
+                if key in seen:
+                    continue
+                seen.add(key)
+                items.append(Ticket(title=title or "Listing", date=date, price=price, url=full_url))
+            if debug and i < 3:
+                _debug(debug, f"Container prices extracted: {multi_prices[:8]}")
+            continue
+
+        price = _extract_price(text)
+        if not price:
+            continue
+
+        key = (title, price, full_url)
+        if key in seen:
+            continue
+        seen.add(key)
+        items.append(Ticket(title=title, date=date, price=price, url=full_url))
+        if debug and i < 5:
+            _debug(debug, f"Sample {i + 1}: title='{title}' date='{date}' price='{price}'")
+    return items
+
+
 async def _try_click_cookie_button(context: _LocatorContext, selector: str) -> bool:
     locator = context.locator(selector).first
     if await locator.count() == 0:
@@ -90,161 +272,215 @@ async def _try_click_cookie_button(context: _LocatorContext, selector: str) -> b
     return True
 
 
-async def _accept_cookies(page, debug: bool) -> None:
+async def _cookie_banner_visible(page, picks: "_SelectorPicks") -> bool:
+    selectors = list(COOKIE_BANNER_SELECTORS)
+    if picks.preferred.get("cookie") in COOKIE_ACCEPT_SELECTORS:
+        selectors.append(picks.preferred["cookie"])
+    try:
+        return await page.locator(", ".join(selectors)).first.is_visible()
+    except Exception:
+        return True
+
+
+async def _accept_cookies(page, debug: bool, picks: "_SelectorPicks") -> bool:
     contexts: list[_LocatorContext] = [page, *page.frames]
-    for context in contexts:
-        for selector in COOKIE_ACCEPT_SELECTORS:
-            try:
-                if await _try_click_cookie_button(context, selector):
-                    _debug(debug, f"Cookie popup accepted with '{selector}'")
-                    await page.wait_for_timeout(1_000)
-                    return
-            except Exception:
-                continue
+    # Probe the learned selector across every frame before falling back to the full list.
+    preferred = picks.preferred.get("cookie")
+    passes = [(preferred,)] if preferred in COOKIE_ACCEPT_SELECTORS else []
+    passes.append(COOKIE_ACCEPT_SELECTORS)
+    for selectors in passes:
+        for context in contexts:
+            for selector in selectors:
+                try:
+                    if await _try_click_cookie_button(context, selector):
+                        _debug(debug, f"Cookie popup accepted with '{selector}'")
+                        picks.record("cookie", selector)
+                        return True
+                except Exception:
+                    continue
+    picks.record("cookie", None)
     _debug(debug, "No cookie accept button found/clicked")
+    return False
+
+
+async def _handle_consent(page, settings: Settings, debug: bool, picks: "_SelectorPicks", state_loaded: bool) -> str:
+    # A reused storage state normally carries the consent cookies: only look for the
+    # banner again when it actually shows up, and refresh the saved state if it does.
+    if state_loaded and not await _cookie_banner_visible(page, picks):
+        return "reused"
+    if not await _accept_cookies(page, debug, picks):
+        if state_loaded:
+            # Banner shown but not dismissable: the saved state is useless, start blank next time.
+            Path(settings.storage_state_path).unlink(missing_ok=True)
+            return "stale"
+        return "none"
+    if settings.storage_state_path:
+        try:
+            await save_storage_state(page.context, settings.storage_state_path)
+        except Exception as exc:
+            _debug(debug, f"Could not save storage state: {exc}")
+    return "refreshed" if state_loaded else "accepted"
+
+
+async def scrape_listings(
+    url: str,
+    settings: Settings,
+    debug: bool = False,
+    pool: BrowserPool | None = None,
+    metrics: dict[str, Any] | None = None,
+    preferred_selectors: dict[str, str] | None = None,
+) -> list[Ticket]:
+    storage_state = usable_storage_state(settings)
+    if pool is not None:
+        async with pool.page(storage_state=storage_state) as page:
+            return await _scrape_page(page, url, settings, debug, metrics, preferred_selectors, storage_state is not None)
 
-
-async def scrape_listings(url: str, settings: Settings, debug: bool = False) -> list[Ticket]:
     from playwright.async_api import async_playwright
 
     async with async_playwright() as p:
         _debug(debug, "Launching Chromium")
-        browser = await p.chromium.launch(
-            headless=settings.headless,
-            args=["--disable-blink-features=AutomationControlled"],
-        )
-        context = await browser.new_context(
-            user_agent=DEFAULT_USER_AGENT,
-            locale="fr-FR",
-            timezone_id="Europe/Paris",
-            viewport={"width": 1366, "height": 2000},
-            extra_http_headers={"Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8"},
-        )
-        page = await context.new_page()
+        browser = await launch_browser(p, settings)
+        try:
+            context = await browser.new_context(**CONTEXT_OPTIONS, storage_state=storage_state)
+            page = await context.new_page()
+            return await _scrape_page(page, url, settings, debug, metrics, preferred_selectors, storage_state is not None)
+        finally:
+            await browser.close()
+
+
+async def _scrape_page(
+    page,
+    url: str,
+    settings: Settings,
+    debug: bool,
+    metrics: dict[str, Any] | None = None,
+    preferred_selectors: dict[str, str] | None = None,
+    state_loaded: bool = False,
+) -> list[Ticket]:
+    metrics = metrics if metrics is not None else {}
+    picks = _SelectorPicks(preferred_selectors, metrics)
+    request_filter = RequestFilter.from_settings(settings)
+    await request_filter.attach(page)
+    activity = XhrActivity()
+    activity.attach(page)
+    capture: ListingCapture | None = None
+    if settings.extraction_mode != "dom":
+        capture = ListingCapture(url, quiet_s=settings.settle_window_ms / 1000)
+        capture.attach(page)
+    try:
         _debug(debug, f"Opening page: {url}")
-        await page.goto(url, timeout=settings.timeout_ms, wait_until="domcontentloaded")
+        with _stage(metrics, "goto"):
+            await page.goto(url, timeout=settings.timeout_ms, wait_until="domcontentloaded")
+
+        # Return as soon as the listing area stops changing instead of sleeping a fixed time,
+        # or as soon as the listing API responses have been captured.
+        with _stage(metrics, "settle"):
+            settled = await _wait_until_settled(
+                page,
+                settings.settle_window_ms,
+                settings.settle_deadline_ms,
+                stop=capture.ready if capture is not None else None,
+                activity=activity,
+            )
+        metrics["settled"] = settled
+        _debug(debug, f"Listings {'settled' if settled else 'not settled before deadline'}")
+        if capture is not None and capture.listings:
+            metrics["extraction"] = "network"
+            metrics["listing_payloads"] = capture.payloads
+            _debug(debug, f"Captured {len(capture.listings)} listings from {capture.payloads} JSON responses")
+            return [Ticket(title=title, date=date, price=price, url=href) for title, date, price, href in capture.listings]
+        metrics["extraction"] = "dom"
+        with _stage(metrics, "cookies"):
+            metrics["consent"] = await _handle_consent(page, settings, debug, picks, state_loaded)
+        with _stage(metrics, "scroll"):
+            for _ in range(3):
+                await page.mouse.wheel(0, 2_000)
+            await _wait_until_settled(page, settings.settle_window_ms, FOLLOW_UP_SETTLE_MS, activity=activity)
+        with _stage(metrics, "expand"):
+            expanded_with = None
+            for expand_selector in picks.order("expand", EXPAND_SELECTORS):
+                try:
+                    btn = page.locator(expand_selector).first
+                    if await btn.count() and await btn.is_visible():
+                        await btn.click(timeout=2_000)
+                        _debug(debug, f"Clicked expand button '{expand_selector}'")
+                        expanded_with = expand_selector
+                        await _wait_until_settled(page, settings.settle_window_ms, FOLLOW_UP_SETTLE_MS, activity=activity)
+                        break
+                except Exception:
+                    continue
+            picks.record("expand", expanded_with)
+        _debug(debug, f"Stage timings (ms): {metrics['timings_ms']}")
+
+        with _stage(metrics, "extract"):
+            return await _extract_tickets(page, debug, metrics, picks)
+    finally:
+        if capture is not None:
+            capture.close()
+        metrics["network"] = request_filter.summary()
+        _debug(debug, f"Network: {metrics['network']}")
+
+
+async def _extract_tickets(page, debug: bool, metrics: dict[str, Any], picks: _SelectorPicks) -> list[Ticket]:
+    cards = None
+    count = 0
+    selected = ""
+    for selector in picks.order("listing", LISTING_SELECTORS):
+        candidate = page.locator(selector)
+        candidate_count = await candidate.count()
+        _debug(debug, f"Selector '{selector}' -> {candidate_count}")
+        if candidate_count > 0:
+            cards = candidate
+            count = candidate_count
+            selected = selector
+            break
+
+    picks.record("listing", selected or None)
+    if cards is None:
+        _debug(debug, "No candidate selector matched any listing.")
+        return []
+
+    _debug(debug, f"Using selector '{selected}' with {count} nodes")
+    # One in-page evaluation instead of inner_text() + get_attribute() per card.
+    nodes = await cards.evaluate_all(CARD_SNAPSHOT_JS)
+    saved_round_trips = max(0, 2 * len(nodes) - 1)
+    metrics["dom_round_trips_saved"] = metrics.get("dom_round_trips_saved", 0) + saved_round_trips
+    _debug(debug, f"Extracted {len(nodes)} nodes in one round trip ({saved_round_trips} round trips saved)")
+    items = _parse_cards(nodes, page.url, container=selected == LISTINGS_CONTAINER, debug=debug)
+
+    if not items:
+        _debug(debug, "No priced cards found, trying container-level fallback")
         try:
-            await page.wait_for_load_state("networkidle", timeout=min(settings.timeout_ms, 20_000))
+            container_text = await page.locator(LISTINGS_CONTAINER).inner_text()
+            fallback_price = _extract_price(container_text)
+            if fallback_price:
+                items.append(Ticket(title="Listing", date="", price=fallback_price, url=page.url))
         except Exception:
             pass
-        await _accept_cookies(page, debug)
-
-        # Let dynamic content render before querying cards
-        await page.wait_for_timeout(2_500)
-        for _ in range(3):
-            await page.mouse.wheel(0, 2_000)
-            await page.wait_for_timeout(500)
-        for expand_selector in [
-            "button:has-text('Afficher plus')",
-            "button:has-text('Show more')",
-            "[data-testid='listings-container'] button",
-        ]:
-            try:
-                btn = page.locator(expand_selector).first
-                if await btn.count() and await btn.is_visible():
-                    await btn.click(timeout=2_000)
-                    _debug(debug, f"Clicked expand button '{expand_selector}'")
-                    await page.wait_for_timeout(1_500)
-                    break
-            except Exception:
-                continue
-
-        selector_candidates = [
-            "[data-testid='listings-container']",
-            "div[data-testid*='listing']:has-text('\u20ac')",
-            "li[data-testid*='listing']:has-text('\u20ac')",
-            "tr[data-testid*='listing']:has-text('\u20ac')",
-            "div[data-testid*='listing']",
-            "li[data-testid*='listing']",
-            "tr[data-testid*='listing']",
-            "div[data-testid='event-card']",
-            "a[data-testid='event-link']",
-            "article:has-text('\u20ac')",
-            "li:has-text('\u20ac')",
-        ]
-
-        cards = None
-        count = 0
-        selected = ""
-        for selector in selector_candidates:
-            candidate = page.locator(selector)
-            candidate_count = await candidate.count()
-            _debug(debug, f"Selector '{selector}' -> {candidate_count}")
-            if candidate_count > 0:
-                cards = candidate
-                count = candidate_count
-                selected = selector
-                break
-
-        if cards is None:
-            _debug(debug, "No candidate selector matched any listing.")
-            await browser.close()
-            return []
-
-        _debug(debug, f"Using selector '{selected}' with {count} nodes")
-        items: list[Ticket] = []
-        seen: set[tuple[str, str, str]] = set()
-
-        for i in range(count):
-            card = cards.nth(i)
-            text = await card.inner_text()
-            href = await card.get_attribute("href")
-            lines = [line.strip() for line in text.splitlines() if line.strip()]
-
-            title = lines[0] if lines else ""
-            date = lines[1] if len(lines) > 1 else ""
-            full_url = urljoin(page.url, href or "")
-
-            # listings-container often contains all rows in one block; split all prices
-            multi_prices = _extract_all_prices(text) if selected == "[data-testid='listings-container']" else []
-            if multi_prices:
-                for price in multi_prices:
-                    key = (title or "Listing", price, full_url)
-                    if key in seen:
-                        continue
-                    seen.add(key)
-                    items.append(Ticket(title=title or "Listing", date=date, price=price, url=full_url))
-                if debug and i < 3:
-                    _debug(debug, f"Container prices extracted: {multi_prices[:8]}")
-                continue
-
-            price = _extract_price(text)
-            if not price:
-                continue
-
-            key = (title, price, full_url)
-            if key in seen:
-                continue
-            seen.add(key)
-            items.append(Ticket(title=title, date=date, price=price, url=full_url))
-            if debug and i < 5:
-                _debug(debug, f"Sample {i + 1}: title='{title}' date='{date}' price='{price}'")
-
-        if not items:
-            _debug(debug, "No priced cards found, trying container-level fallback")
-            try:
-                container_text = await page.locator("[data-testid='listings-container']").inner_text()
-                fallback_price = _extract_price(container_text)
-                if fallback_price:
-                    items.append(Ticket(title="Listing", date="", price=fallback_price, url=page.url))
-            except Exception:
-                pass
-        if not items:
-            _debug(debug, "No container price, trying page HTML fallback")
-            try:
-                html = await page.content()
-                candidates = _extract_all_prices(html)
-                for price in candidates[:20]:
-                    if not _is_reasonable_ticket_price(price):
-                        continue
-                    items.append(Ticket(title="Listing", date="", price=price, url=page.url))
-            except Exception:
-                pass
-
-        _debug(debug, f"Parsed tickets: {len(items)}")
-        await context.close()
-        await browser.close()
-        return items
+    if not items:
+        _debug(debug, "No container price, trying page HTML fallback")
+        try:
+            html = await page.content()
+            candidates = _extract_all_prices(html)
+            for price in candidates[:20]:
+                if not _is_reasonable_ticket_price(price):
+                    continue
+                items.append(Ticket(title="Listing", date="", price=price, url=page.url))
+        except Exception:
+            pass
+
+    _debug(debug, f"Parsed tickets: {len(items)}")
+    return items
+
+
+def selector_cache_key(url: str) -> tuple[str, str]:
+    """Host and a coarse path pattern (locale + masked event segment) used to share learned selectors."""
+    parts = urlsplit(url)
+    segments = [segment for segment in parts.path.split("/") if segment]
+    masked = [re.sub(r"\d+", "*", segment) for segment in segments]
+    if len(masked) > 2:
+        masked = [masked[0], "*", masked[-1]]
+    return (parts.hostname or "").lower(), "/" + "/".join(masked)
 
 
 def as_dicts(tickets: list[Ticket]) -> list[dict[str, Any]]:
@@ -1,24 +1,224 @@
 from __future__ import annotations
 
+from collections import Counter
+import base64
+import hashlib
+from itertools import groupby, islice
+import json
 import sqlite3
-from datetime import datetime, timezone
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import wraps
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+import weakref
+
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+STATEMENT_CACHE_SIZE = 256
+SCHEMA_VERSION = 1
+MIGRATION_BATCH_SIZE = 5000
+EXPORT_STRING_CACHE_SIZE = 100_000
+HOURLY_ROLLUP_RETENTION_DAYS = 365
+DAY_MS = 86_400_000
+INCREMENTAL_VACUUM_PAGES = 2000
+NOTIFICATION_MAX_ATTEMPTS = 8
+NOTIFICATION_BACKOFF_S = 30
+NOTIFICATION_MAX_BACKOFF_S = 3600
+NOTIFICATION_LEASE_S = 300
+JOB_LEASE_S = 120
+JOB_MAX_ATTEMPTS = 3
+
+_local = threading.local()
+_open_connections: "weakref.WeakSet[_PooledConnection]" = weakref.WeakSet()
+_open_lock = threading.Lock()
+_generation = 0
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_data_version = 0
+_data_version_lock = threading.Lock()
+_write_listeners: list[Callable[[str, int], None]] = []
+_version_watchers: dict[str, tuple[int, sqlite3.Connection]] = {}
+_version_watchers_lock = threading.Lock()
+
+F = TypeVar("F", bound=Callable[..., Any])
 
 
 def utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
 
 
-def _connect(db_path: str) -> sqlite3.Connection:
-    conn = sqlite3.connect(db_path)
+def to_utc_iso(value: str) -> str:
+    """Normalize an ISO date/datetime (naive values are taken as UTC) to the stored format."""
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat(timespec="milliseconds")
+
+
+def data_version() -> int:
+    """Counter bumped after every write made by this process; lets readers skip unchanged polls."""
+    return _data_version
+
+
+def database_version(db_path: str) -> str:
+    """Change marker for the database file, including commits made by other processes.
+
+    PRAGMA data_version moves whenever another connection commits; it is read from one
+    connection per process that never writes, so it sees every writer (CLI, workers, threads).
+    """
+    with _version_watchers_lock:
+        generation, conn = _version_watchers.get(db_path, (-1, None))
+        if conn is None or generation != _generation:
+            generation, conn = _generation, _open(db_path, readonly=True)
+            _version_watchers[db_path] = (generation, conn)
+        return f"{generation}.{conn.execute('PRAGMA data_version').fetchone()[0]}"
+
+
+def bump_data_version() -> int:
+    global _data_version
+    with _data_version_lock:
+        _data_version += 1
+        return _data_version
+
+
+def on_write(listener: Callable[[str, int], None]) -> Callable[[], None]:
+    """Call `listener(write_function_name, data_version)` after every storage write.
+
+    Returns a function that unregisters the listener.
+    """
+    _write_listeners.append(listener)
+
+    def remove() -> None:
+        if listener in _write_listeners:
+            _write_listeners.remove(listener)
+
+    return remove
+
+
+def _writes(func: F) -> F:
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return func(*args, **kwargs)
+        finally:
+            version = bump_data_version()
+            for listener in list(_write_listeners):
+                try:
+                    listener(func.__name__, version)
+                except Exception:
+                    pass
+
+    return wrapper  # type: ignore[return-value]
+
+
+def iso_to_ms(value: str) -> int:
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    delta = parsed - _EPOCH
+    return delta.days * 86_400_000 + delta.seconds * 1000 + delta.microseconds // 1000
+
+
+def ms_to_iso(value: int) -> str:
+    return (_EPOCH + timedelta(milliseconds=value)).isoformat(timespec="milliseconds")
+
+
+def _to_cents(value: float | None) -> int | None:
+    return None if value is None else round(value * 100)
+
+
+def _from_cents(value: int | None) -> float | None:
+    return None if value is None else value / 100
+
+
+def _sql_iso_to_ms(value: str | None) -> int | None:
+    try:
+        return iso_to_ms(value) if value else None
+    except ValueError:
+        return None
+
+
+class _PooledConnection(sqlite3.Connection):
+    pass
+
+
+def _open(db_path: str, readonly: bool) -> sqlite3.Connection:
+    conn: sqlite3.Connection | None = None
+    if readonly:
+        try:
+            conn = sqlite3.connect(
+                f"{Path(db_path).absolute().as_uri()}?mode=ro",
+                uri=True,
+                cached_statements=STATEMENT_CACHE_SIZE,
+                check_same_thread=False,
+                factory=_PooledConnection,
+            )
+        except sqlite3.OperationalError:
+            conn = None
+    if conn is None:
+        conn = sqlite3.connect(
+            db_path,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+            factory=_PooledConnection,
+        )
     conn.row_factory = sqlite3.Row
+    conn.create_function("iso_ms", 1, _sql_iso_to_ms, deterministic=True)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    with _open_lock:
+        _open_connections.add(conn)
+    return conn
+
+
+def _connect(db_path: str, readonly: bool = False) -> sqlite3.Connection:
+    # One long-lived connection per thread, database and mode. Callers keep using
+    # `with _connect(...) as conn:`, which commits or rolls back without closing.
+    connections: dict[tuple[str, bool], sqlite3.Connection] | None = getattr(_local, "connections", None)
+    if connections is None or getattr(_local, "generation", None) != _generation:
+        connections = _local.connections = {}
+        _local.generation = _generation
+    key = (db_path, readonly)
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = _open(db_path, readonly)
     return conn
 
 
-def init_db(db_path: str) -> None:
+def close_connections() -> None:
+    global _generation
+    with _open_lock:
+        _generation += 1
+        connections = list(_open_connections)
+        _open_connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+def _ensure_columns(conn: sqlite3.Connection, table: str, columns: dict[str, str]) -> None:
+    existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+@_writes
+def init_db(db_path: str, migration_batch_size: int = MIGRATION_BATCH_SIZE) -> dict[str, Any]:
     Path(db_path).parent.mkdir(parents=True, exist_ok=True)
     with _connect(db_path) as conn:
+        if conn.execute("PRAGMA page_count").fetchone()[0] == 0:
+            # Only takes effect before the first table exists; older files need `compact --vacuum`.
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
         conn.executescript(
             """
             PRAGMA journal_mode = WAL;
@@ -36,19 +236,6 @@ def init_db(db_path: str) -> None:
                 lowest_seen_at TEXT
             );
 
-            CREATE TABLE IF NOT EXISTS price_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                event_id INTEGER NOT NULL,
-                scraped_at TEXT NOT NULL,
-                title TEXT,
-                date_label TEXT,
-                price_raw TEXT,
-                price_value REAL,
-                currency TEXT,
-                listing_url TEXT,
-                FOREIGN KEY (event_id) REFERENCES tracked_events(id)
-            );
-
             CREATE TABLE IF NOT EXISTS scrape_runs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 event_id INTEGER NOT NULL,
@@ -62,6 +249,11 @@ def init_db(db_path: str) -> None:
                 FOREIGN KEY (event_id) REFERENCES tracked_events(id)
             );
 
+            CREATE TABLE IF NOT EXISTS strings (
+                id INTEGER PRIMARY KEY,
+                value TEXT NOT NULL UNIQUE
+            );
+
             CREATE TABLE IF NOT EXISTS subscribers (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 email TEXT NOT NULL,
@@ -72,31 +264,350 @@ def init_db(db_path: str) -> None:
                 FOREIGN KEY (event_id) REFERENCES tracked_events(id)
             );
 
-            CREATE INDEX IF NOT EXISTS idx_price_history_event_time
-                ON price_history(event_id, scraped_at);
+            CREATE TABLE IF NOT EXISTS selector_cache (
+                host TEXT NOT NULL,
+                url_pattern TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                selector TEXT,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (host, url_pattern, kind)
+            );
+
+            CREATE TABLE IF NOT EXISTS run_summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id INTEGER NOT NULL,
+                run_id INTEGER,
+                scraped_at TEXT NOT NULL,
+                min_price REAL,
+                max_price REAL,
+                median_price REAL,
+                listing_count INTEGER NOT NULL DEFAULT 0,
+                listing_delta INTEGER,
+                UNIQUE(event_id, scraped_at),
+                FOREIGN KEY (event_id) REFERENCES tracked_events(id),
+                FOREIGN KEY (run_id) REFERENCES scrape_runs(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS listing_snapshot (
+                event_id INTEGER NOT NULL,
+                listing_key TEXT NOT NULL,
+                title TEXT,
+                date_label TEXT,
+                price_raw TEXT,
+                price_value REAL,
+                currency TEXT,
+                listing_url TEXT,
+                first_seen_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (event_id, listing_key),
+                FOREIGN KEY (event_id) REFERENCES tracked_events(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS price_rollups (
+                event_id INTEGER NOT NULL,
+                granularity TEXT NOT NULL,
+                bucket_start TEXT NOT NULL,
+                min_price REAL,
+                p25_price REAL,
+                median_price REAL,
+                p75_price REAL,
+                max_price REAL,
+                listing_count INTEGER NOT NULL DEFAULT 0,
+                run_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (event_id, granularity, bucket_start),
+                FOREIGN KEY (event_id) REFERENCES tracked_events(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS notification_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                event_id INTEGER,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TEXT NOT NULL,
+                last_error TEXT,
+                result TEXT,
+                created_at TEXT NOT NULL,
+                sent_at TEXT,
+                FOREIGN KEY (event_id) REFERENCES tracked_events(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS event_schedule (
+                event_id INTEGER PRIMARY KEY,
+                interval_min REAL NOT NULL,
+                next_run_at TEXT NOT NULL,
+                pinned_interval_min REAL,
+                factors TEXT,
+                updated_at TEXT NOT NULL,
+                FOREIGN KEY (event_id) REFERENCES tracked_events(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS scrape_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                event_id INTEGER NOT NULL,
+                source TEXT NOT NULL DEFAULT 'manual',
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker_id TEXT,
+                lease_expires_at TEXT,
+                enqueued_at TEXT NOT NULL,
+                started_at TEXT,
+                finished_at TEXT,
+                result TEXT,
+                error TEXT,
+                FOREIGN KEY (event_id) REFERENCES tracked_events(id)
+            );
+
+            CREATE TABLE IF NOT EXISTS scrape_batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,
+                job_ids TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                cancelled_at TEXT
+            );
+
             CREATE INDEX IF NOT EXISTS idx_scrape_runs_event_time
                 ON scrape_runs(event_id, started_at);
+            CREATE INDEX IF NOT EXISTS idx_scrape_runs_time
+                ON scrape_runs(started_at);
             CREATE INDEX IF NOT EXISTS idx_subscribers_event
                 ON subscribers(event_id, active);
+            CREATE INDEX IF NOT EXISTS idx_notification_outbox_due
+                ON notification_outbox(status, next_attempt_at);
+            -- At most one queued or running job per event, whichever process enqueues it.
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_scrape_jobs_active
+                ON scrape_jobs(event_id) WHERE status IN ('queued', 'running');
+            CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status
+                ON scrape_jobs(status, id);
+            CREATE INDEX IF NOT EXISTS idx_scrape_jobs_finished
+                ON scrape_jobs(finished_at);
+            """
+        )
+        _ensure_columns(conn, "scrape_runs", {"metrics": "TEXT"})
+        _ensure_columns(conn, "notification_outbox", {"recipient": "TEXT", "digest_id": "INTEGER"})
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_notification_outbox_recipient ON notification_outbox(recipient, kind, created_at)"
+        )
+    report = migrate_schema(db_path, batch_size=migration_batch_size)
+    with _connect(db_path) as conn:
+        needs_backfill = conn.execute(
+            """
+            SELECT EXISTS(SELECT 1 FROM price_history) AND NOT EXISTS(SELECT 1 FROM run_summaries) AS needed
+            """
+        ).fetchone()["needed"]
+    if needs_backfill:
+        backfill_run_summaries(db_path)
+    return report
+
+
+# price_history v1: text columns point into the interned `strings` table, prices are integer
+# cents and timestamps integer epoch milliseconds. listing_key/change are only set in delta
+# mode ('appeared', 'changed' or 'gone' against the previous snapshot; 'base' when compaction
+# carries a still-live listing forward to the retention cutoff).
+PRICE_HISTORY_V1 = """
+    CREATE TABLE {name} (
+        id INTEGER PRIMARY KEY,
+        event_id INTEGER NOT NULL,
+        scraped_ms INTEGER NOT NULL,
+        title_id INTEGER,
+        date_label_id INTEGER,
+        price_raw_id INTEGER,
+        price_cents INTEGER,
+        currency_id INTEGER,
+        listing_url_id INTEGER,
+        listing_key TEXT,
+        change TEXT,
+        FOREIGN KEY (event_id) REFERENCES tracked_events(id)
+    )
+"""
+HISTORY_TEXT_COLUMNS = ("title", "date_label", "price_raw", "currency", "listing_url")
+HISTORY_STRING_IDS = tuple(f"{column}_id" for column in HISTORY_TEXT_COLUMNS)
+HISTORY_SELECT = """
+    SELECT ph.id, ph.event_id, ph.scraped_ms, t.value AS title, d.value AS date_label, r.value AS price_raw,
+           ph.price_cents, c.value AS currency, u.value AS listing_url, ph.listing_key, ph.change
+    FROM {source} AS ph
+    LEFT JOIN strings AS t ON t.id = ph.title_id
+    LEFT JOIN strings AS d ON d.id = ph.date_label_id
+    LEFT JOIN strings AS r ON r.id = ph.price_raw_id
+    LEFT JOIN strings AS c ON c.id = ph.currency_id
+    LEFT JOIN strings AS u ON u.id = ph.listing_url_id
+"""
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> set[str]:
+    return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _used_bytes(conn: sqlite3.Connection) -> int:
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    used = conn.execute("PRAGMA page_count").fetchone()[0] - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return used * page_size
+
+
+def _time_history_query(conn: sqlite3.Connection, legacy: bool) -> dict[str, Any] | None:
+    # Same work the dashboard does for its busiest event: latest 500 rows plus the all-time low.
+    row = conn.execute(
+        "SELECT event_id, COUNT(*) AS n FROM price_history GROUP BY event_id ORDER BY n DESC LIMIT 1"
+    ).fetchone()
+    if row is None:
+        return None
+    event_id = row["event_id"]
+    if legacy:
+        queries = (
+            "SELECT * FROM price_history WHERE event_id = ? ORDER BY scraped_at DESC, id DESC LIMIT 500",
+            "SELECT MIN(price_value) FROM price_history WHERE event_id = ?",
+        )
+    else:
+        queries = (
+            HISTORY_SELECT.format(source="price_history")
+            + " WHERE ph.event_id = ? ORDER BY ph.scraped_ms DESC, ph.id DESC LIMIT 500",
+            "SELECT MIN(price_cents) FROM price_history WHERE event_id = ?",
+        )
+    started = time.perf_counter()
+    for sql in queries:
+        conn.execute(sql, (event_id,)).fetchall()
+    return {"event_id": event_id, "rows": row["n"], "ms": round((time.perf_counter() - started) * 1000, 2)}
+
+
+def migrate_schema(db_path: str, batch_size: int = MIGRATION_BATCH_SIZE) -> dict[str, Any]:
+    """Bring price_history to SCHEMA_VERSION (PRAGMA user_version), copying legacy rows in batches.
+
+    Each batch commits on its own, so an interrupted migration resumes where it stopped.
+    Returns a before/after size and query-time report.
+    """
+    conn = _connect(db_path)
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    report: dict[str, Any] = {"from_version": version, "to_version": max(version, SCHEMA_VERSION), "migrated_rows": 0}
+    if version >= SCHEMA_VERSION:
+        return report
+
+    columns = _table_columns(conn, "price_history")
+    if not columns or "scraped_ms" in columns:
+        with conn:
+            if not columns:
+                conn.execute(PRICE_HISTORY_V1.format(name="price_history"))
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_price_history_event_time ON price_history(event_id, scraped_ms)"
+            )
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        return report
+
+    with conn:
+        _ensure_columns(conn, "price_history", {"listing_key": "TEXT", "change": "TEXT"})
+        conn.execute(PRICE_HISTORY_V1.format(name="IF NOT EXISTS price_history_v1"))
+    report["bytes_before"] = _used_bytes(conn)
+    report["query_before"] = _time_history_query(conn, legacy=True)
+    last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM price_history_v1").fetchone()[0]
+    while True:
+        rows = conn.execute(
             """
+            SELECT id, event_id, scraped_at, title, date_label, price_raw, price_value, currency, listing_url,
+                   listing_key, change
+            FROM price_history
+            WHERE id > ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        with conn:
+            _write_history(conn, [dict(row) for row in rows], table="price_history_v1")
+        last_id = rows[-1]["id"]
+        report["migrated_rows"] += len(rows)
+
+    with conn:
+        conn.execute("DROP TABLE price_history")
+        conn.execute("ALTER TABLE price_history_v1 RENAME TO price_history")
+        conn.execute("CREATE INDEX idx_price_history_event_time ON price_history(event_id, scraped_ms)")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    incremental_vacuum(db_path)
+    report["bytes_after"] = _used_bytes(conn)
+    report["query_after"] = _time_history_query(conn, legacy=False)
+    return report
+
+
+def _intern(conn: sqlite3.Connection, values: Iterable[str | None]) -> dict[str, int]:
+    distinct = sorted({value for value in values if value is not None})
+    if not distinct:
+        return {}
+    conn.executemany("INSERT OR IGNORE INTO strings(value) VALUES(?)", [(value,) for value in distinct])
+    ids: dict[str, int] = {}
+    for start in range(0, len(distinct), 500):
+        chunk = distinct[start : start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for row in conn.execute(f"SELECT id, value FROM strings WHERE value IN ({placeholders})", chunk):
+            ids[row["value"]] = row["id"]
+    return ids
+
+
+def _write_history(conn: sqlite3.Connection, rows: list[dict[str, Any]], table: str = "price_history") -> None:
+    """Insert history rows given in the public dict shape (ISO scraped_at, float price_value)."""
+    ids = _intern(conn, (row.get(column) for row in rows for column in HISTORY_TEXT_COLUMNS))
+    conn.executemany(
+        f"""
+        INSERT INTO {table}(
+            id, event_id, scraped_ms, title_id, date_label_id, price_raw_id, price_cents, currency_id,
+            listing_url_id, listing_key, change
         )
+        VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                row.get("id"),
+                row["event_id"],
+                iso_to_ms(row["scraped_at"]),
+                ids.get(row.get("title")),
+                ids.get(row.get("date_label")),
+                ids.get(row.get("price_raw")),
+                _to_cents(row.get("price_value")),
+                ids.get(row.get("currency")),
+                ids.get(row.get("listing_url")),
+                row.get("listing_key"),
+                row.get("change"),
+            )
+            for row in rows
+        ],
+    )
+
+
+def _history_row(row: sqlite3.Row) -> dict[str, Any]:
+    return {
+        "id": row["id"],
+        "event_id": row["event_id"],
+        "scraped_at": ms_to_iso(row["scraped_ms"]),
+        "title": row["title"],
+        "date_label": row["date_label"],
+        "price_raw": row["price_raw"],
+        "price_value": _from_cents(row["price_cents"]),
+        "currency": row["currency"],
+        "listing_url": row["listing_url"],
+        "listing_key": row["listing_key"],
+        "change": row["change"],
+    }
 
 
 def list_events(db_path: str) -> list[dict[str, Any]]:
-    with _connect(db_path) as conn:
+    with _connect(db_path, readonly=True) as conn:
         rows = conn.execute(
             """
-            SELECT id, name, url, active, created_at, last_scraped_at,
-                   lowest_price_value, lowest_price_raw, lowest_currency, lowest_seen_at
-            FROM tracked_events
-            ORDER BY created_at DESC
+            SELECT e.id, e.name, e.url, e.active, e.created_at, e.last_scraped_at,
+                   e.lowest_price_value, e.lowest_price_raw, e.lowest_currency, e.lowest_seen_at,
+                   s.next_run_at, s.interval_min AS scrape_interval_min
+            FROM tracked_events AS e
+            LEFT JOIN event_schedule AS s ON s.event_id = e.id
+            ORDER BY e.created_at DESC
             """
         ).fetchall()
     return [dict(row) for row in rows]
 
 
 def get_event(db_path: str, event_id: int) -> dict[str, Any] | None:
-    with _connect(db_path) as conn:
+    with _connect(db_path, readonly=True) as conn:
         row = conn.execute(
             """
             SELECT id, name, url, active, created_at, last_scraped_at,
@@ -109,6 +620,7 @@ def get_event(db_path: str, event_id: int) -> dict[str, Any] | None:
     return dict(row) if row else None
 
 
+@_writes
 def add_event(db_path: str, name: str, url: str, active: bool = True) -> int:
     now = utc_now_iso()
     with _connect(db_path) as conn:
@@ -134,7 +646,7 @@ def add_event(db_path: str, name: str, url: str, active: bool = True) -> int:
 
 
 def active_events(db_path: str) -> list[dict[str, Any]]:
-    with _connect(db_path) as conn:
+    with _connect(db_path, readonly=True) as conn:
         rows = conn.execute(
             """
             SELECT id, name, url, active, created_at, last_scraped_at,
@@ -147,6 +659,7 @@ def active_events(db_path: str) -> list[dict[str, Any]]:
     return [dict(row) for row in rows]
 
 
+@_writes
 def insert_run_started(db_path: str, event_id: int) -> int:
     with _connect(db_path) as conn:
         cur = conn.execute(
@@ -159,6 +672,7 @@ def insert_run_started(db_path: str, event_id: int) -> int:
         return int(cur.lastrowid)
 
 
+@_writes
 def finish_run(
     db_path: str,
     run_id: int,
@@ -168,65 +682,290 @@ def finish_run(
     items_found: int,
     items_saved: int,
     min_price_found: float | None,
+    metrics: dict[str, Any] | None = None,
 ) -> None:
     with _connect(db_path) as conn:
         conn.execute(
             """
             UPDATE scrape_runs
             SET finished_at = ?, status = ?, error = ?, items_found = ?,
-                items_saved = ?, min_price_found = ?
+                items_saved = ?, min_price_found = ?, metrics = ?
             WHERE id = ?
             """,
-            (utc_now_iso(), status, error, items_found, items_saved, min_price_found, run_id),
+            (
+                utc_now_iso(),
+                status,
+                error,
+                items_found,
+                items_saved,
+                min_price_found,
+                json.dumps(metrics) if metrics else None,
+                run_id,
+            ),
         )
 
 
+@_writes
 def insert_prices(
     db_path: str,
     event_id: int,
     rows: list[dict[str, Any]],
+    notifications: list[dict[str, Any]] | None = None,
+    summarize: bool = False,
+    run_id: int | None = None,
 ) -> int:
+    """Append a full scrape to price_history; `summarize` also writes its run_summaries row
+    in the same transaction."""
     if not rows:
         return 0
     with _connect(db_path) as conn:
+        _write_history(conn, [{**row, "event_id": event_id, "listing_key": None, "change": None} for row in rows])
+        _apply_batch_stats(conn, event_id, rows)
+        if summarize:
+            _summarize_batch(conn, event_id, rows, run_id)
+        _enqueue_notifications(conn, event_id, notifications or [])
+        # A snapshot left over from delta mode would no longer match what is stored.
+        conn.execute("DELETE FROM listing_snapshot WHERE event_id = ?", (event_id,))
+    return len(rows)
+
+
+def _summarize_batch(conn: sqlite3.Connection, event_id: int, rows: list[dict[str, Any]], run_id: int | None) -> None:
+    prices = [row["price_value"] for row in rows if row.get("price_value") is not None]
+    _write_run_summary(conn, event_id, max(row["scraped_at"] for row in rows), prices, len(rows), run_id)
+
+
+def listing_keys(rows: list[dict[str, Any]]) -> list[str]:
+    """Stable identity per listing: title, date and URL, disambiguated by price then position."""
+    def digest(*parts: Any) -> str:
+        return hashlib.sha1("\x1f".join("" if part is None else str(part) for part in parts).encode()).hexdigest()[:16]
+
+    bases = [digest(row.get("title"), row.get("date_label"), row.get("listing_url")) for row in rows]
+    base_counts = Counter(bases)
+    keys: list[str] = []
+    seen: dict[str, int] = {}
+    for base, row in zip(bases, rows):
+        key = base if base_counts[base] == 1 else digest(base, row.get("price_raw"))
+        seen[key] = seen.get(key, 0) + 1
+        keys.append(key if seen[key] == 1 else digest(key, seen[key]))
+    return keys
+
+
+@_writes
+def insert_listing_changes(
+    db_path: str,
+    event_id: int,
+    rows: list[dict[str, Any]],
+    notifications: list[dict[str, Any]] | None = None,
+    summarize: bool = False,
+    run_id: int | None = None,
+) -> dict[str, int]:
+    """Delta mode: store only listings that appeared, changed price or disappeared since the last run.
+
+    `listing_snapshot` keeps the current full set. An empty scrape is treated as a failed
+    extraction rather than every listing disappearing. `summarize` writes the run's
+    run_summaries row (from the full scrape) in the same transaction.
+    """
+    counts = {"rows_written": 0, "rows_avoided": 0, "appeared": 0, "changed": 0, "gone": 0}
+    if not rows:
+        return counts
+    scraped_at = max(row["scraped_at"] for row in rows)
+    keyed = dict(zip(listing_keys(rows), rows))
+    with _connect(db_path) as conn:
+        previous = {
+            row["listing_key"]: row
+            for row in conn.execute(
+                """
+                SELECT listing_key, title, date_label, price_raw, price_value, currency, listing_url
+                FROM listing_snapshot
+                WHERE event_id = ?
+                """,
+                (event_id,),
+            )
+        }
+        changes: list[dict[str, Any]] = []
+        for key, row in keyed.items():
+            before = previous.get(key)
+            if before is not None and before["price_value"] == row.get("price_value") and before["price_raw"] == row.get("price_raw"):
+                continue
+            change = "appeared" if before is None else "changed"
+            counts[change] += 1
+            changes.append({**row, "event_id": event_id, "listing_key": key, "change": change})
+        gone = [key for key in previous if key not in keyed]
+        for key in gone:
+            before = previous[key]
+            counts["gone"] += 1
+            changes.append(
+                {
+                    "event_id": event_id,
+                    "scraped_at": scraped_at,
+                    "title": before["title"],
+                    "date_label": before["date_label"],
+                    "listing_url": before["listing_url"],
+                    "listing_key": key,
+                    "change": "gone",
+                }
+            )
+        _write_history(conn, changes)
+        if summarize:
+            _summarize_batch(conn, event_id, rows, run_id)
+        conn.executemany(
+            "DELETE FROM listing_snapshot WHERE event_id = ? AND listing_key = ?",
+            [(event_id, key) for key in gone],
+        )
         conn.executemany(
             """
-            INSERT INTO price_history(event_id, scraped_at, title, date_label, price_raw, price_value, currency, listing_url)
-            VALUES(?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO listing_snapshot(
+                event_id, listing_key, title, date_label, price_raw, price_value, currency, listing_url,
+                first_seen_at, updated_at
+            )
+            VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(event_id, listing_key) DO UPDATE SET
+                price_raw = excluded.price_raw,
+                price_value = excluded.price_value,
+                currency = excluded.currency,
+                updated_at = excluded.updated_at
             """,
             [
                 (
                     event_id,
-                    row["scraped_at"],
-                    row.get("title"),
-                    row.get("date_label"),
-                    row.get("price_raw"),
-                    row.get("price_value"),
-                    row.get("currency"),
-                    row.get("listing_url"),
+                    change["listing_key"],
+                    change.get("title"),
+                    change.get("date_label"),
+                    change.get("price_raw"),
+                    change.get("price_value"),
+                    change.get("currency"),
+                    change.get("listing_url"),
+                    change["scraped_at"],
+                    change["scraped_at"],
                 )
-                for row in rows
+                for change in changes
+                if change["change"] != "gone"
             ],
         )
-    return len(rows)
+        _apply_batch_stats(conn, event_id, rows)
+        _enqueue_notifications(conn, event_id, notifications or [])
+    counts["rows_written"] = len(changes)
+    counts["rows_avoided"] = max(0, len(rows) - len(changes))
+    return counts
+
+
+def current_listings(db_path: str, event_id: int) -> list[dict[str, Any]]:
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(
+            """
+            SELECT listing_key, title, date_label, price_raw, price_value, currency, listing_url,
+                   first_seen_at, updated_at
+            FROM listing_snapshot
+            WHERE event_id = ?
+            ORDER BY price_value IS NULL, price_value, listing_key
+            """,
+            (event_id,),
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def listings_at(db_path: str, event_id: int, at: str) -> list[dict[str, Any]]:
+    """Rebuild the listing set at `at` by replaying delta rows (within the retention window)."""
+    latest = """(
+        SELECT * FROM (
+            SELECT *, ROW_NUMBER() OVER (PARTITION BY listing_key ORDER BY scraped_ms DESC, id DESC) AS rank
+            FROM price_history
+            WHERE event_id = ? AND scraped_ms <= ? AND change IS NOT NULL
+        )
+        WHERE rank = 1 AND change != 'gone'
+    )"""
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(
+            HISTORY_SELECT.format(source=latest) + " ORDER BY ph.price_cents IS NULL, ph.price_cents, ph.listing_key",
+            (event_id, iso_to_ms(at)),
+        ).fetchall()
+    listings = []
+    for row in rows:
+        data = _history_row(row)
+        listings.append(
+            {
+                "listing_key": data["listing_key"],
+                "title": data["title"],
+                "date_label": data["date_label"],
+                "price_raw": data["price_raw"],
+                "price_value": data["price_value"],
+                "currency": data["currency"],
+                "listing_url": data["listing_url"],
+                "updated_at": data["scraped_at"],
+            }
+        )
+    return listings
+
 
+def _apply_batch_stats(conn: sqlite3.Connection, event_id: int, rows: list[dict[str, Any]]) -> None:
+    # Fold the batch into the running stats so the cost does not grow with history size.
+    last_scraped_at = max(row["scraped_at"] for row in rows)
+    conn.execute(
+        """
+        UPDATE tracked_events
+        SET last_scraped_at = ?
+        WHERE id = ? AND (last_scraped_at IS NULL OR last_scraped_at < ?)
+        """,
+        (last_scraped_at, event_id, last_scraped_at),
+    )
+    priced = [row for row in rows if row.get("price_value") is not None]
+    if not priced:
+        return
+    lowest = min(priced, key=lambda row: (row["price_value"], row["scraped_at"]))
+    conn.execute(
+        """
+        UPDATE tracked_events
+        SET lowest_price_value = ?,
+            lowest_price_raw = ?,
+            lowest_currency = ?,
+            lowest_seen_at = ?
+        WHERE id = ? AND (lowest_price_value IS NULL OR lowest_price_value > ?)
+        """,
+        (
+            lowest["price_value"],
+            lowest.get("price_raw"),
+            lowest.get("currency"),
+            lowest["scraped_at"],
+            event_id,
+            lowest["price_value"],
+        ),
+    )
 
+
+@_writes
 def refresh_event_stats(db_path: str, event_id: int) -> None:
+    # Full recompute; scrapes update stats incrementally in insert_prices, this is kept
+    # for repairs and backfills (`viagoscrap repair-stats`).
     with _connect(db_path) as conn:
+        # run_summaries holds one row per scrape, so the lowest run is found without
+        # scanning every listing; its raw row is then a single indexed lookup.
+        # The raw row may already have been compacted away; fall back to the summary value.
         lowest = conn.execute(
             """
-            SELECT price_value, price_raw, currency, scraped_at
-            FROM price_history
-            WHERE event_id = ? AND price_value IS NOT NULL
-            ORDER BY price_value ASC, scraped_at ASC
+            SELECT best.min_price AS price_value,
+                   COALESCE(r.value, replace(printf('%.2f', best.min_price), '.', ',') || ' €') AS price_raw,
+                   COALESCE(c.value, 'EUR') AS currency,
+                   best.scraped_at
+            FROM (
+                SELECT scraped_at, min_price
+                FROM run_summaries
+                WHERE event_id = ? AND min_price IS NOT NULL
+                ORDER BY min_price ASC, scraped_at ASC
+                LIMIT 1
+            ) AS best
+            LEFT JOIN price_history AS ph
+                ON ph.event_id = ? AND ph.scraped_ms = iso_ms(best.scraped_at)
+               AND ph.price_cents = CAST(round(best.min_price * 100) AS INTEGER)
+            LEFT JOIN strings AS r ON r.id = ph.price_raw_id
+            LEFT JOIN strings AS c ON c.id = ph.currency_id
             LIMIT 1
             """,
-            (event_id,),
+            (event_id, event_id),
         ).fetchone()
         last_scrape = conn.execute(
             """
             SELECT MAX(scraped_at) AS last_scraped_at
-            FROM price_history
+            FROM run_summaries
             WHERE event_id = ?
             """,
             (event_id,),
@@ -252,78 +991,766 @@ def refresh_event_stats(db_path: str, event_id: int) -> None:
         )
 
 
-def event_history(db_path: str, event_id: int, limit: int = 500) -> list[dict[str, Any]]:
-    with _connect(db_path) as conn:
-        rows = conn.execute(
-            """
-            SELECT id, event_id, scraped_at, title, date_label, price_raw, price_value, currency, listing_url
-            FROM price_history
-            WHERE event_id = ?
-            ORDER BY scraped_at DESC, id DESC
-            LIMIT ?
-            """,
-            (event_id, max(1, min(limit, 5000))),
-        ).fetchall()
-    return [dict(row) for row in rows]
+HISTORY_TIERS = ("raw", "hour", "day")
+# Length of the bucket_start prefix that identifies a bucket, used to stop a coarser tier
+# where the finer one ends.
+ROLLUP_PREFIX = {"hour": 13, "day": 10}
 
 
-def chart_points(db_path: str, event_id: int) -> list[dict[str, Any]]:
-    with _connect(db_path) as conn:
+def encode_cursor(*key: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *types: type) -> list[Any]:
+    """Decode a cursor made by encode_cursor(), checking it holds one value of each of `types`."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError("invalid cursor") from exc
+    if not isinstance(key, list) or len(key) != len(types):
+        raise ValueError("invalid cursor")
+    # bool is an int subclass; JSON true/false is never a valid id.
+    if any(isinstance(value, bool) or not isinstance(value, kind) for value, kind in zip(key, types)):
+        raise ValueError("invalid cursor")
+    return key
+
+
+def history_cursor(row: dict[str, Any]) -> str:
+    return encode_cursor(row["tier"], row["scraped_at"], row["id"] or 0)
+
+
+def _iter_history(
+    conn: sqlite3.Connection,
+    event_id: int,
+    cursor: str | None = None,
+) -> Iterator[dict[str, Any]]:
+    # Newest first: raw listings, then hourly rollups, then daily rollups for what retention
+    # compacted. The cursor is the (tier, scraped_at, id) of the last row already returned.
+    tier, oldest, last_id = decode_cursor(cursor, str, str, int) if cursor else ("raw", None, 0)
+    if tier not in HISTORY_TIERS:
+        raise ValueError("invalid cursor")
+    for granularity in HISTORY_TIERS[HISTORY_TIERS.index(tier) :]:
+        if granularity == "raw":
+            sql = HISTORY_SELECT.format(source="price_history") + " WHERE ph.event_id = ?"
+            params: tuple[Any, ...] = (event_id,)
+            if oldest is not None:
+                sql += " AND (ph.scraped_ms, ph.id) < (?, ?)"
+                params += (iso_to_ms(oldest), last_id)
+            rows = conn.execute(sql + " ORDER BY ph.scraped_ms DESC, ph.id DESC", params)
+            for row in rows:
+                data = {**_history_row(row), "tier": "raw"}
+                oldest = data["scraped_at"]
+                yield data
+            continue
+        # Start of the bucket holding the oldest row so far: a day that still has hourly
+        # rollups must not come back again as a daily row.
+        boundary = oldest[: ROLLUP_PREFIX[granularity]] if oldest is not None else None
         rows = conn.execute(
             """
-            SELECT scraped_at, MIN(price_value) AS min_price
-            FROM price_history
-            WHERE event_id = ? AND price_value IS NOT NULL
-            GROUP BY scraped_at
-            ORDER BY scraped_at
+            SELECT event_id, bucket_start, min_price, p25_price, median_price, p75_price, max_price,
+                   listing_count, run_count
+            FROM price_rollups
+            WHERE event_id = ? AND granularity = ? AND (? IS NULL OR bucket_start < ?)
+            ORDER BY bucket_start DESC
             """,
-            (event_id,),
-        ).fetchall()
-    return [{"scraped_at": row["scraped_at"], "min_price": row["min_price"]} for row in rows]
+            (event_id, granularity, boundary, boundary),
+        )
+        for row in rows:
+            oldest = row["bucket_start"]
+            yield _rollup_row(row, granularity)
 
 
-def list_runs(db_path: str, event_id: int | None = None, limit: int = 100) -> list[dict[str, Any]]:
-    sql = """
-        SELECT id, event_id, started_at, finished_at, status, error, items_found, items_saved, min_price_found
-        FROM scrape_runs
+def event_history(
+    db_path: str,
+    event_id: int,
+    limit: int = 500,
+    cursor: str | None = None,
+) -> list[dict[str, Any]]:
+    limit = max(1, min(limit, 5000))
+    with _connect(db_path, readonly=True) as conn:
+        return list(islice(_iter_history(conn, event_id, cursor), limit))
+
+
+def stream_event_history(db_path: str, event_id: int, cursor: str | None = None) -> Iterator[dict[str, Any]]:
+    """Yield an event's whole history straight from the SQLite cursor.
+
+    Uses its own connection: a streaming response may resume the generator on another thread.
     """
-    params: tuple[Any, ...] = ()
-    if event_id is not None:
-        sql += " WHERE event_id = ?"
-        params = (event_id,)
-    sql += " ORDER BY started_at DESC LIMIT ?"
-    params += (max(1, min(limit, 1000)),)
-    with _connect(db_path) as conn:
-        rows = conn.execute(sql, params).fetchall()
-    return [dict(row) for row in rows]
+    conn = _open(db_path, readonly=True)
+    try:
+        yield from _iter_history(conn, event_id, cursor)
+    finally:
+        conn.close()
 
 
-def add_subscriber(db_path: str, email: str, event_id: int | None) -> int:
-    clean_email = email.strip().lower()
-    now = utc_now_iso()
-    with _connect(db_path) as conn:
-        cur = conn.execute(
-            """
-            INSERT INTO subscribers(email, event_id, active, created_at)
-            VALUES(?, ?, 1, ?)
-            ON CONFLICT(email, event_id) DO UPDATE SET active = 1
-            """,
-            (clean_email, event_id, now),
+def _rollup_row(row: sqlite3.Row, granularity: str) -> dict[str, Any]:
+    data = dict(row)
+    return {
+        "id": None,
+        "event_id": data["event_id"],
+        "scraped_at": data["bucket_start"],
+        "title": None,
+        "date_label": None,
+        "price_raw": None,
+        "price_value": data["min_price"],
+        "currency": "EUR",
+        "listing_url": None,
+        "listing_key": None,
+        "change": None,
+        "tier": granularity,
+        "p25_price": data["p25_price"],
+        "median_price": data["median_price"],
+        "p75_price": data["p75_price"],
+        "max_price": data["max_price"],
+        "listing_count": data["listing_count"],
+        "run_count": data["run_count"],
+    }
+
+
+def chart_points(
+    db_path: str,
+    event_id: int,
+    start: str | None = None,
+    end: str | None = None,
+    max_points: int | None = None,
+) -> list[dict[str, Any]]:
+    # Hourly rollups only fill in spans older than the first run summary (e.g. summaries
+    # rebuilt after raw rows were compacted).
+    series = """
+        WITH series(scraped_at, min_price) AS (
+            SELECT bucket_start, min_price
+            FROM price_rollups
+            WHERE event_id = :event_id AND granularity = 'hour' AND min_price IS NOT NULL
+              AND bucket_start < COALESCE((SELECT MIN(scraped_at) FROM run_summaries WHERE event_id = :event_id), '9')
+            UNION ALL
+            SELECT scraped_at, min_price
+            FROM run_summaries
+            WHERE event_id = :event_id AND min_price IS NOT NULL
         )
-        if cur.lastrowid:
-            return int(cur.lastrowid)
-        row = conn.execute(
-            "SELECT id FROM subscribers WHERE email = ? AND event_id IS ?",
-            (clean_email, event_id),
-        ).fetchone()
-    if not row:
-        raise RuntimeError("Failed to resolve subscriber id after upsert")
-    return int(row["id"])
+    """
+    where = "1 = 1"
+    params: dict[str, Any] = {"event_id": event_id}
+    if start is not None:
+        where += " AND scraped_at >= :start"
+        params["start"] = start
+    if end is not None:
+        where += " AND scraped_at <= :end"
+        params["end"] = end
+    with _connect(db_path, readonly=True) as conn:
+        total = None
+        if max_points is not None:
+            total = conn.execute(f"{series} SELECT COUNT(*) FROM series WHERE {where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"{series} SELECT scraped_at, min_price FROM series WHERE {where} ORDER BY scraped_at",
+            params,
+        )
+        if max_points is None or total is None:
+            return [{"scraped_at": row["scraped_at"], "min_price": row["min_price"]} for row in rows]
+        points = ((row["scraped_at"], row["min_price"]) for row in rows)
+        return [
+            {"scraped_at": scraped_at, "min_price": min_price}
+            for scraped_at, min_price in downsample_minmax(points, total, max_points)
+        ]
 
 
-def list_subscribers(db_path: str, event_id: int | None = None) -> list[dict[str, Any]]:
+def downsample_minmax(
+    points: Iterable[tuple[str, float]],
+    total: int,
+    max_points: int,
+) -> Iterator[tuple[str, float]]:
+    """Stream (time, value) points into max_points // 2 buckets, keeping each bucket's low and high.
+
+    Keeping the minimum of every bucket means a price dip is never averaged away.
+    """
+    if total <= max_points:
+        yield from points
+        return
+    buckets = max(1, max_points // 2)
+    current = -1
+    low: tuple[str, float] | None = None
+    high: tuple[str, float] | None = None
+    for index, point in enumerate(points):
+        bucket = index * buckets // total
+        if bucket != current:
+            if low is not None and high is not None:
+                yield from _bucket_points(low, high)
+            current, low, high = bucket, point, point
+            continue
+        if point[1] < low[1]:
+            low = point
+        if point[1] > high[1]:
+            high = point
+    if low is not None and high is not None:
+        yield from _bucket_points(low, high)
+
+
+def _bucket_points(low: tuple[str, float], high: tuple[str, float]) -> tuple[tuple[str, float], ...]:
+    if low == high:
+        return (low,)
+    return (low, high) if low[0] <= high[0] else (high, low)
+
+
+def _summary_values(prices: list[float]) -> tuple[float | None, float | None, float | None]:
+    if not prices:
+        return None, None, None
+    return min(prices), max(prices), float(statistics.median(prices))
+
+
+@_writes
+def record_run_summary(
+    db_path: str,
+    event_id: int,
+    scraped_at: str,
+    prices: list[float],
+    listing_count: int,
+    run_id: int | None = None,
+) -> dict[str, Any]:
     with _connect(db_path) as conn:
-        if event_id is None:
+        return _write_run_summary(conn, event_id, scraped_at, prices, listing_count, run_id)
+
+
+def _write_run_summary(
+    conn: sqlite3.Connection,
+    event_id: int,
+    scraped_at: str,
+    prices: list[float],
+    listing_count: int,
+    run_id: int | None = None,
+) -> dict[str, Any]:
+    min_price, max_price, median_price = _summary_values(prices)
+    previous = conn.execute(
+        """
+        SELECT listing_count
+        FROM run_summaries
+        WHERE event_id = ? AND scraped_at < ?
+        ORDER BY scraped_at DESC
+        LIMIT 1
+        """,
+        (event_id, scraped_at),
+    ).fetchone()
+    listing_delta = listing_count - previous["listing_count"] if previous else None
+    conn.execute(
+        """
+        INSERT INTO run_summaries(
+            event_id, run_id, scraped_at, min_price, max_price, median_price, listing_count, listing_delta
+        )
+        VALUES(?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(event_id, scraped_at) DO NOTHING
+        """,
+        (event_id, run_id, scraped_at, min_price, max_price, median_price, listing_count, listing_delta),
+    )
+    return {
+        "scraped_at": scraped_at,
+        "min_price": min_price,
+        "max_price": max_price,
+        "median_price": median_price,
+        "listing_count": listing_count,
+        "listing_delta": listing_delta,
+    }
+
+
+@_writes
+def backfill_run_summaries(db_path: str, event_id: int | None = None, batch_size: int = 1000) -> int:
+    """Rebuild run_summaries from price_history (all events, or one), streaming over the rows."""
+    # Delta rows only hold changes, so runs stored that way keep their recorded summary.
+    sql = "SELECT event_id, scraped_ms, price_cents FROM price_history WHERE change IS NULL"
+    params: tuple[Any, ...] = ()
+    if event_id is not None:
+        sql += " AND event_id = ?"
+        params = (event_id,)
+    sql += " ORDER BY event_id, scraped_ms"
+    insert_sql = """
+        INSERT INTO run_summaries(
+            event_id, run_id, scraped_at, min_price, max_price, median_price, listing_count, listing_delta
+        )
+        VALUES(?, NULL, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(event_id, scraped_at) DO NOTHING
+    """
+    written = 0
+    reader = sqlite3.connect(db_path)
+    try:
+        with _connect(db_path) as conn:
+            # Only runs still present as full raw rows can be rebuilt; compacted or delta runs are kept.
+            conn.execute(
+                """
+                DELETE FROM run_summaries
+                WHERE (? IS NULL OR event_id = ?)
+                  AND EXISTS (
+                      SELECT 1 FROM price_history AS ph
+                      WHERE ph.event_id = run_summaries.event_id
+                        AND ph.scraped_ms = iso_ms(run_summaries.scraped_at)
+                        AND ph.change IS NULL
+                  )
+                """,
+                (event_id, event_id),
+            )
+        batch: list[tuple[Any, ...]] = []
+        rows = reader.execute(sql, params)
+        for current_event, event_rows in groupby(rows, key=lambda row: row[0]):
+            previous_count: int | None = None
+            for scraped_ms, run_rows in groupby(event_rows, key=lambda row: row[1]):
+                run_rows = list(run_rows)
+                scraped_at = ms_to_iso(scraped_ms)
+                prices = [row[2] / 100 for row in run_rows if row[2] is not None]
+                min_price, max_price, median_price = _summary_values(prices)
+                delta = len(run_rows) - previous_count if previous_count is not None else None
+                previous_count = len(run_rows)
+                batch.append((current_event, scraped_at, min_price, max_price, median_price, len(run_rows), delta))
+                if len(batch) >= batch_size:
+                    with _connect(db_path) as conn:
+                        conn.executemany(insert_sql, batch)
+                    written += len(batch)
+                    batch = []
+        if batch:
+            with _connect(db_path) as conn:
+                conn.executemany(insert_sql, batch)
+            written += len(batch)
+    finally:
+        reader.close()
+    return written
+
+
+def _rollup_values(prices: list[float]) -> tuple[float | None, ...]:
+    if not prices:
+        return None, None, None, None, None
+    if len(prices) == 1:
+        return (prices[0],) * 5
+    p25, median, p75 = statistics.quantiles(prices, n=4, method="inclusive")
+    return min(prices), p25, median, p75, max(prices)
+
+
+def _rollup_rows(event_id: int, rows: list[tuple[str, float | None]]) -> list[tuple[Any, ...]]:
+    """Hourly rollups for one day of (scraped_at, price_value) rows, plus the daily one."""
+    out: list[tuple[Any, ...]] = []
+    for hour, hour_rows in groupby(rows, key=lambda row: row[0][:13]):
+        hour_rows = list(hour_rows)
+        prices = [price for _, price in hour_rows if price is not None]
+        runs = len({scraped_at for scraped_at, _ in hour_rows})
+        out.append((event_id, "hour", f"{hour}:00:00.000+00:00", *_rollup_values(prices), len(hour_rows), runs))
+    prices = [price for _, price in rows if price is not None]
+    runs = len({scraped_at for scraped_at, _ in rows})
+    out.append((event_id, "day", f"{rows[0][0][:10]}T00:00:00.000+00:00", *_rollup_values(prices), len(rows), runs))
+    return out
+
+
+def _summary_rollup_rows(event_id: int, summaries: list[sqlite3.Row]) -> list[tuple[Any, ...]]:
+    """Rollups for one day of delta-mode runs, built from their run_summaries.
+
+    Delta rows only hold changes, so the listing prices of a run are not in price_history;
+    quartiles are unknown and the median is the median of the run medians.
+    """
+
+    def rollup(bucket_start: str, rows: list[sqlite3.Row], granularity: str) -> tuple[Any, ...]:
+        mins = [row["min_price"] for row in rows if row["min_price"] is not None]
+        maxes = [row["max_price"] for row in rows if row["max_price"] is not None]
+        medians = [row["median_price"] for row in rows if row["median_price"] is not None]
+        return (
+            event_id,
+            granularity,
+            bucket_start,
+            min(mins, default=None),
+            None,
+            statistics.median(medians) if medians else None,
+            None,
+            max(maxes, default=None),
+            sum(row["listing_count"] for row in rows),
+            len(rows),
+        )
+
+    out = [
+        rollup(f"{hour}:00:00.000+00:00", list(hour_rows), "hour")
+        for hour, hour_rows in groupby(summaries, key=lambda row: row["scraped_at"][:13])
+    ]
+    out.append(rollup(f"{summaries[0]['scraped_at'][:10]}T00:00:00.000+00:00", summaries, "day"))
+    return out
+
+
+@_writes
+def compact_history(
+    db_path: str,
+    retention_days: int,
+    batch_size: int = 500,
+    now: datetime | None = None,
+) -> dict[str, Any]:
+    """Roll raw listings older than `retention_days` into price_rollups, then delete them.
+
+    The cutoff is aligned to midnight UTC so every rolled-up day is complete. Rollups are
+    written before any delete and never overwritten, so an interrupted run can be replayed.
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff_day = (now - timedelta(days=retention_days)).astimezone(timezone.utc)
+    cutoff = cutoff_day.replace(hour=0, minute=0, second=0, microsecond=0).isoformat(timespec="milliseconds")
+    cutoff_ms = iso_to_ms(cutoff)
+    # Day-aligned too, so a day is either fully covered by hourly rollups or only by its daily one.
+    hourly_cutoff = (now - timedelta(days=HOURLY_ROLLUP_RETENTION_DAYS)).astimezone(timezone.utc)
+    hourly_cutoff = hourly_cutoff.replace(hour=0, minute=0, second=0, microsecond=0)
+    insert_sql = """
+        INSERT OR IGNORE INTO price_rollups(
+            event_id, granularity, bucket_start, min_price, p25_price, median_price, p75_price, max_price,
+            listing_count, run_count
+        )
+        VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    result = {"cutoff": cutoff, "events": 0, "rollups_written": 0, "rows_deleted": 0, "pages_freed": 0}
+    if retention_days <= 0:
+        return result
+
+    with _connect(db_path) as conn:
+        event_ids = [row["id"] for row in conn.execute("SELECT id FROM tracked_events ORDER BY id")]
+    string_ids: set[int] = set()
+    reader = sqlite3.connect(db_path)
+    try:
+        for event_id in event_ids:
+            rows = reader.execute(
+                """
+                SELECT scraped_ms, price_cents
+                FROM price_history
+                WHERE event_id = ? AND scraped_ms < ? AND change IS NULL
+                ORDER BY scraped_ms
+                """,
+                (event_id, cutoff_ms),
+            )
+            points = ((ms_to_iso(ms), None if cents is None else cents / 100) for ms, cents in rows)
+            full_days: set[str] = set()
+            for day, day_rows in groupby(points, key=lambda row: row[0][:10]):
+                full_days.add(day)
+                rollups = _rollup_rows(event_id, list(day_rows))
+                with _connect(db_path) as conn:
+                    result["rollups_written"] += conn.executemany(insert_sql, rollups).rowcount
+            # Delta-mode days only stored changes: roll them up from the run summaries instead.
+            delta_days = {
+                ms_to_iso(day * DAY_MS)[:10]
+                for (day,) in reader.execute(
+                    """
+                    SELECT DISTINCT scraped_ms / ? FROM price_history
+                    WHERE event_id = ? AND scraped_ms < ? AND change IS NOT NULL
+                    """,
+                    (DAY_MS, event_id, cutoff_ms),
+                )
+            }
+            for day in sorted(delta_days - full_days):
+                summaries = _connect(db_path, readonly=True).execute(
+                    """
+                    SELECT scraped_at, min_price, max_price, median_price, listing_count
+                    FROM run_summaries
+                    WHERE event_id = ? AND scraped_at >= ? AND scraped_at < ?
+                    ORDER BY scraped_at
+                    """,
+                    (event_id, f"{day}T00:00", f"{day}T99"),
+                ).fetchall()
+                if summaries:
+                    with _connect(db_path) as conn:
+                        rollups = _summary_rollup_rows(event_id, summaries)
+                        result["rollups_written"] += conn.executemany(insert_sql, rollups).rowcount
+            # Delta rows before the cutoff are the only record of listings that have not changed
+            # since; carry each live one forward as a 'base' row at the cutoff for listings_at().
+            with _connect(db_path) as conn:
+                conn.execute(
+                    """
+                    INSERT INTO price_history(
+                        event_id, scraped_ms, title_id, date_label_id, price_raw_id, price_cents, currency_id,
+                        listing_url_id, listing_key, change
+                    )
+                    SELECT event_id, :cutoff, title_id, date_label_id, price_raw_id, price_cents, currency_id,
+                           listing_url_id, listing_key, 'base'
+                    FROM (
+                        SELECT *, ROW_NUMBER() OVER (PARTITION BY listing_key ORDER BY scraped_ms DESC, id DESC) AS rank
+                        FROM price_history
+                        WHERE event_id = :event_id AND scraped_ms < :cutoff AND change IS NOT NULL
+                    ) AS latest
+                    WHERE rank = 1 AND change != 'gone' AND NOT EXISTS (
+                        SELECT 1 FROM price_history AS base
+                        WHERE base.event_id = :event_id AND base.scraped_ms = :cutoff AND base.listing_key = latest.listing_key
+                    )
+                    """,
+                    {"event_id": event_id, "cutoff": cutoff_ms},
+                )
+            # Short transactions so scrapes waiting on the writer lock get in between batches.
+            deleted_for_event = 0
+            while True:
+                with _connect(db_path) as conn:
+                    rows = conn.execute(
+                        f"""
+                        SELECT id, {", ".join(HISTORY_STRING_IDS)} FROM price_history
+                        WHERE event_id = ? AND scraped_ms < ? LIMIT ?
+                        """,
+                        (event_id, cutoff_ms, batch_size),
+                    ).fetchall()
+                    string_ids.update(value for row in rows for value in tuple(row)[1:] if value is not None)
+                    conn.execute(
+                        f"DELETE FROM price_history WHERE id IN ({','.join('?' * len(rows))})",
+                        [row["id"] for row in rows],
+                    )
+                deleted_for_event += len(rows)
+                if len(rows) < batch_size:
+                    break
+            if deleted_for_event:
+                result["events"] += 1
+                result["rows_deleted"] += deleted_for_event
+        if string_ids:
+            result["strings_deleted"] = _delete_unreferenced_strings(db_path, reader, string_ids, batch_size)
+    finally:
+        reader.close()
+
+    with _connect(db_path) as conn:
+        conn.execute(
+            "DELETE FROM price_rollups WHERE granularity = 'hour' AND bucket_start < ?",
+            (hourly_cutoff.isoformat(timespec="milliseconds"),),
+        )
+    result["pages_freed"] = incremental_vacuum(db_path)
+    return result
+
+
+def _delete_unreferenced_strings(
+    db_path: str,
+    reader: sqlite3.Connection,
+    candidates: set[int],
+    batch_size: int,
+) -> int:
+    # Only strings used by the deleted rows can have become orphans. The history scan runs on
+    # the reader connection (no writer lock); rows inserted after it are re-checked by id
+    # inside each short delete transaction.
+    scanned_up_to = reader.execute("SELECT COALESCE(MAX(id), 0) FROM price_history").fetchone()[0]
+    columns = ", ".join(HISTORY_STRING_IDS)
+    for row in reader.execute(f"SELECT {columns} FROM price_history WHERE id <= ?", (scanned_up_to,)):
+        candidates.difference_update(row)
+        if not candidates:
+            return 0
+    recent = " UNION ".join(
+        f"SELECT {column} FROM price_history WHERE id > :after AND {column} IS NOT NULL"
+        for column in HISTORY_STRING_IDS
+    )
+    orphans = sorted(candidates)
+    deleted = 0
+    for start in range(0, len(orphans), batch_size):
+        chunk = {f"s{i}": string_id for i, string_id in enumerate(orphans[start : start + batch_size])}
+        with _connect(db_path) as conn:
+            deleted += conn.execute(
+                f"""
+                DELETE FROM strings
+                WHERE id IN ({",".join(":" + key for key in chunk)}) AND id NOT IN ({recent})
+                """,
+                {**chunk, "after": scanned_up_to},
+            ).rowcount
+    return deleted
+
+
+def incremental_vacuum(db_path: str, pages: int = INCREMENTAL_VACUUM_PAGES) -> int:
+    """Return free pages to the filesystem in small steps (no-op unless auto_vacuum=INCREMENTAL)."""
+    conn = _connect(db_path)
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0
+    freed = 0
+    while True:
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if not free:
+            return freed
+        # execute() steps the pragma once (one page); executescript() runs it to completion.
+        conn.executescript(f"PRAGMA incremental_vacuum({min(free, pages)});")
+        freed += min(free, pages)
+
+
+@_writes
+def enable_incremental_vacuum(db_path: str) -> None:
+    """Switch an existing database to auto_vacuum=INCREMENTAL; rewrites the whole file once."""
+    conn = _connect(db_path)
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+
+
+EXPORT_COLUMNS = {
+    "history": (
+        "id",
+        "event_id",
+        "scraped_at",
+        "title",
+        "date_label",
+        "price_raw",
+        "price_value",
+        "currency",
+        "listing_url",
+        "listing_key",
+        "change",
+    ),
+    "runs": (
+        "id",
+        "event_id",
+        "started_at",
+        "finished_at",
+        "status",
+        "error",
+        "items_found",
+        "items_saved",
+        "min_price_found",
+        "metrics",
+    ),
+}
+
+
+def export_rows(
+    db_path: str,
+    table: str,
+    event_id: int | None = None,
+    start: str | None = None,
+    end: str | None = None,
+    epoch_ms: bool = False,
+) -> Iterator[tuple[Any, ...]]:
+    """Yield raw tuples (EXPORT_COLUMNS order) for bulk export, oldest first, on a dedicated connection.
+
+    History timestamps are ISO strings, or the stored epoch milliseconds with `epoch_ms=True`.
+    """
+    if table == "history":
+        # Strings are resolved through a bounded cache instead of five joins per row.
+        sql = """
+            SELECT id, event_id, scraped_ms, title_id, date_label_id, price_raw_id, price_cents, currency_id,
+                   listing_url_id, listing_key, change
+            FROM price_history
+            WHERE 1 = 1
+        """
+        time_column, order = "scraped_ms", " ORDER BY event_id, scraped_ms, id"
+        bounds = [iso_to_ms(value) if value else None for value in (start, end)]
+    elif table == "runs":
+        sql = """
+            SELECT id, event_id, started_at, finished_at, status, error, items_found, items_saved,
+                   min_price_found, metrics
+            FROM scrape_runs
+            WHERE 1 = 1
+        """
+        time_column, order = "started_at", " ORDER BY event_id, started_at, id"
+        bounds = [start, end]
+    else:
+        raise ValueError(f"unknown export table: {table}")
+    params: list[Any] = []
+    if event_id is not None:
+        sql += " AND event_id = ?"
+        params.append(event_id)
+    if bounds[0] is not None:
+        sql += f" AND {time_column} >= ?"
+        params.append(bounds[0])
+    if bounds[1] is not None:
+        sql += f" AND {time_column} <= ?"
+        params.append(bounds[1])
+
+    conn = _open(db_path, readonly=True)
+    conn.row_factory = None
+    try:
+        rows = conn.execute(sql + order, params)
+        if table == "runs":
+            yield from rows
+            return
+        lookup = conn.cursor()
+        cache: dict[int | None, str | None] = {None: None}
+
+        def text(string_id: int | None) -> str | None:
+            if string_id in cache:
+                return cache[string_id]
+            if len(cache) > EXPORT_STRING_CACHE_SIZE:
+                cache.clear()
+                cache[None] = None
+            found = lookup.execute("SELECT value FROM strings WHERE id = ?", (string_id,)).fetchone()
+            cache[string_id] = found[0] if found else None
+            return cache[string_id]
+
+        # Rows of one scrape share a timestamp, so format it once per run.
+        last_ms, scraped_at = None, None
+        for row in rows:
+            if row[2] != last_ms:
+                last_ms = row[2]
+                scraped_at = last_ms if epoch_ms else ms_to_iso(last_ms)
+            cents = row[6]
+            yield (
+                row[0],
+                row[1],
+                scraped_at,
+                text(row[3]),
+                text(row[4]),
+                text(row[5]),
+                None if cents is None else cents / 100,
+                text(row[7]),
+                text(row[8]),
+                row[9],
+                row[10],
+            )
+    finally:
+        conn.close()
+
+
+def _runs_query(event_id: int | None, cursor: str | None) -> tuple[str, tuple[Any, ...]]:
+    sql = """
+        SELECT id, event_id, started_at, finished_at, status, error, items_found, items_saved, min_price_found, metrics
+        FROM scrape_runs
+        WHERE 1 = 1
+    """
+    params: tuple[Any, ...] = ()
+    if event_id is not None:
+        sql += " AND event_id = ?"
+        params += (event_id,)
+    if cursor:
+        started_at, run_id = decode_cursor(cursor, str, int)
+        sql += " AND (started_at, id) < (?, ?)"
+        params += (started_at, run_id)
+    return sql + " ORDER BY started_at DESC, id DESC", params
+
+
+def run_cursor(row: dict[str, Any]) -> str:
+    return encode_cursor(row["started_at"], row["id"])
+
+
+def list_runs(
+    db_path: str,
+    event_id: int | None = None,
+    limit: int = 100,
+    cursor: str | None = None,
+) -> list[dict[str, Any]]:
+    sql, params = _runs_query(event_id, cursor)
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(sql + " LIMIT ?", params + (max(1, min(limit, 1000)),)).fetchall()
+    return [_run_row(row) for row in rows]
+
+
+def stream_runs(db_path: str, event_id: int | None = None, cursor: str | None = None) -> Iterator[dict[str, Any]]:
+    sql, params = _runs_query(event_id, cursor)
+    conn = _open(db_path, readonly=True)
+    try:
+        for row in conn.execute(sql, params):
+            yield _run_row(row)
+    finally:
+        conn.close()
+
+
+def _run_row(row: sqlite3.Row) -> dict[str, Any]:
+    data = dict(row)
+    data["metrics"] = json.loads(data["metrics"]) if data.get("metrics") else None
+    return data
+
+
+@_writes
+def add_subscriber(db_path: str, email: str, event_id: int | None) -> int:
+    clean_email = email.strip().lower()
+    now = utc_now_iso()
+    with _connect(db_path) as conn:
+        cur = conn.execute(
+            """
+            INSERT INTO subscribers(email, event_id, active, created_at)
+            VALUES(?, ?, 1, ?)
+            ON CONFLICT(email, event_id) DO UPDATE SET active = 1
+            """,
+            (clean_email, event_id, now),
+        )
+        if cur.lastrowid:
+            return int(cur.lastrowid)
+        row = conn.execute(
+            "SELECT id FROM subscribers WHERE email = ? AND event_id IS ?",
+            (clean_email, event_id),
+        ).fetchone()
+    if not row:
+        raise RuntimeError("Failed to resolve subscriber id after upsert")
+    return int(row["id"])
+
+
+def list_subscribers(db_path: str, event_id: int | None = None) -> list[dict[str, Any]]:
+    with _connect(db_path, readonly=True) as conn:
+        if event_id is None:
             rows = conn.execute(
                 """
                 SELECT id, email, event_id, active, created_at
@@ -345,9 +1772,734 @@ def list_subscribers(db_path: str, event_id: int | None = None) -> list[dict[str
     return [dict(row) for row in rows]
 
 
+@_writes
 def deactivate_subscriber(db_path: str, subscriber_id: int) -> None:
     with _connect(db_path) as conn:
         conn.execute(
             "UPDATE subscribers SET active = 0 WHERE id = ?",
             (subscriber_id,),
         )
+
+
+def _enqueue_notifications(conn: sqlite3.Connection, event_id: int, notifications: list[dict[str, Any]]) -> None:
+    # Called inside the price write transaction: the alert exists if and only if the prices do.
+    now = utc_now_iso()
+    conn.executemany(
+        """
+        INSERT INTO notification_outbox(kind, event_id, recipient, payload, status, next_attempt_at, created_at)
+        VALUES(?, ?, ?, ?, ?, ?, ?)
+        """,
+        [
+            (
+                item["kind"],
+                event_id,
+                item.get("recipient"),
+                json.dumps(item["payload"], ensure_ascii=False),
+                item.get("status", "pending"),
+                now,
+                now,
+            )
+            for item in notifications
+        ],
+    )
+
+
+NOTIFICATION_SELECT = """
+    SELECT id, kind, event_id, recipient, digest_id, payload, status, attempts, next_attempt_at,
+           last_error, result, created_at, sent_at
+    FROM notification_outbox
+"""
+
+
+def _notification_row(row: sqlite3.Row) -> dict[str, Any]:
+    data = dict(row)
+    data["payload"] = json.loads(data["payload"])
+    data["result"] = json.loads(data["result"]) if data.get("result") else None
+    return data
+
+
+# Outbox bookkeeping runs every poll and feeds no cached view, so it does not bump the data version.
+def claim_notifications(
+    db_path: str,
+    limit: int = 20,
+    lease_s: int = NOTIFICATION_LEASE_S,
+    now: datetime | None = None,
+) -> list[dict[str, Any]]:
+    """Take due outbox rows for sending.
+
+    A claimed row stays `sending` for `lease_s` seconds; if the process dies mid-send it
+    becomes due again once the lease runs out.
+    """
+    now = now or datetime.now(timezone.utc)
+    now_iso = now.isoformat(timespec="milliseconds")
+    lease_until = (now + timedelta(seconds=lease_s)).isoformat(timespec="milliseconds")
+    claimed: list[dict[str, Any]] = []
+    with _connect(db_path) as conn:
+        rows = conn.execute(
+            f"""
+            {NOTIFICATION_SELECT}
+            WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?
+            ORDER BY next_attempt_at, id
+            LIMIT ?
+            """,
+            (now_iso, limit),
+        ).fetchall()
+        for row in rows:
+            # Compare-and-set on `attempts` so two dispatchers never send the same row.
+            cur = conn.execute(
+                """
+                UPDATE notification_outbox
+                SET status = 'sending', attempts = attempts + 1, next_attempt_at = ?
+                WHERE id = ? AND attempts = ?
+                """,
+                (lease_until, row["id"], row["attempts"]),
+            )
+            if cur.rowcount:
+                claimed.append(
+                    {**_notification_row(row), "status": "sending", "attempts": row["attempts"] + 1}
+                )
+    return claimed
+
+
+def complete_notification(
+    db_path: str,
+    notification_id: int,
+    *,
+    sent: bool,
+    retry: bool = True,
+    error: str | None = None,
+    result: dict[str, Any] | None = None,
+    now: datetime | None = None,
+) -> str:
+    """Record a send attempt; failures are retried with exponential backoff up to NOTIFICATION_MAX_ATTEMPTS."""
+    now = now or datetime.now(timezone.utc)
+    now_iso = now.isoformat(timespec="milliseconds")
+    with _connect(db_path) as conn:
+        row = conn.execute("SELECT attempts FROM notification_outbox WHERE id = ?", (notification_id,)).fetchone()
+        if not row:
+            raise KeyError(notification_id)
+        attempts = int(row["attempts"])
+        next_attempt_at = now_iso
+        if sent:
+            status = "sent"
+        elif retry and attempts < NOTIFICATION_MAX_ATTEMPTS:
+            status = "pending"
+            delay = min(NOTIFICATION_MAX_BACKOFF_S, NOTIFICATION_BACKOFF_S * 2 ** max(0, attempts - 1))
+            next_attempt_at = (now + timedelta(seconds=delay)).isoformat(timespec="milliseconds")
+        else:
+            status = "failed"
+        conn.execute(
+            """
+            UPDATE notification_outbox
+            SET status = ?, next_attempt_at = ?, last_error = ?, result = ?, sent_at = ?
+            WHERE id = ?
+            """,
+            (
+                status,
+                next_attempt_at,
+                None if sent else error,
+                json.dumps(result, ensure_ascii=False, default=str) if result else None,
+                now_iso if sent else None,
+                notification_id,
+            ),
+        )
+    return status
+
+
+@_writes
+def retry_notification(db_path: str, notification_id: int) -> bool:
+    with _connect(db_path) as conn:
+        cur = conn.execute(
+            """
+            UPDATE notification_outbox
+            SET status = 'pending', attempts = 0, next_attempt_at = ?
+            WHERE id = ? AND status = 'failed'
+            """,
+            (utc_now_iso(), notification_id),
+        )
+    return cur.rowcount > 0
+
+
+def list_notifications(
+    db_path: str,
+    status: str | None = None,
+    event_id: int | None = None,
+    limit: int = 100,
+) -> list[dict[str, Any]]:
+    clauses: list[str] = []
+    params: list[Any] = []
+    if status is not None:
+        clauses.append("status = ?")
+        params.append(status)
+    if event_id is not None:
+        clauses.append("event_id = ?")
+        params.append(event_id)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(
+            f"""
+            {NOTIFICATION_SELECT}
+            {where}
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (*params, limit),
+        ).fetchall()
+    return [_notification_row(row) for row in rows]
+
+
+def last_alerted_price(db_path: str, event_id: int) -> float | None:
+    with _connect(db_path, readonly=True) as conn:
+        row = conn.execute(
+            """
+            SELECT payload FROM notification_outbox
+            WHERE event_id = ? AND kind IN ('min_drop', 'digest_item')
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (event_id,),
+        ).fetchone()
+    return json.loads(row["payload"]).get("new_price") if row else None
+
+
+def _merge_drops(items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    # Several drops of one event collapse to: first old price -> lowest new price.
+    merged: dict[Any, dict[str, Any]] = {}
+    for item in items:
+        drop = item["payload"]
+        current = merged.get(item["event_id"])
+        if current is None:
+            merged[item["event_id"]] = {**drop, "event_id": item["event_id"], "drops": 1}
+            continue
+        current["old_price"] = max(current["old_price"], drop["old_price"])
+        current["new_price"] = min(current["new_price"], drop["new_price"])
+        current["drops"] += 1
+    return sorted(merged.values(), key=lambda drop: drop["old_price"] - drop["new_price"], reverse=True)
+
+
+def build_digests(db_path: str, window_s: float, throttle_s: float, now: datetime | None = None) -> int:
+    """Fold held `digest_item` rows into one pending `digest` row per recipient.
+
+    A recipient's items are held until the oldest is `window_s` old, and no more than one
+    digest is created per recipient every `throttle_s`; later drops wait for the next one.
+    """
+    now = now or datetime.now(timezone.utc)
+    now_iso = now.isoformat(timespec="milliseconds")
+    window_start = (now - timedelta(seconds=window_s)).isoformat(timespec="milliseconds")
+    throttle_start = (now - timedelta(seconds=throttle_s)).isoformat(timespec="milliseconds")
+    created = 0
+    with _connect(db_path) as conn:
+        recipients = conn.execute(
+            """
+            SELECT held.recipient
+            FROM notification_outbox AS held
+            WHERE held.kind = 'digest_item' AND held.status = 'held'
+            GROUP BY held.recipient
+            HAVING MIN(held.created_at) <= ?
+               AND NOT EXISTS (
+                   SELECT 1 FROM notification_outbox AS sent
+                   WHERE sent.recipient = held.recipient AND sent.kind = 'digest' AND sent.created_at > ?
+               )
+            """,
+            (window_start, throttle_start),
+        ).fetchall()
+        for (recipient,) in recipients:
+            items = [
+                _notification_row(row)
+                for row in conn.execute(
+                    f"""
+                    {NOTIFICATION_SELECT}
+                    WHERE recipient = ? AND kind = 'digest_item' AND status = 'held'
+                    ORDER BY id
+                    """,
+                    (recipient,),
+                )
+            ]
+            cur = conn.execute(
+                """
+                INSERT INTO notification_outbox(kind, recipient, payload, status, next_attempt_at, created_at)
+                VALUES('digest', ?, ?, 'pending', ?, ?)
+                """,
+                (
+                    recipient,
+                    json.dumps({"recipient": recipient, "drops": _merge_drops(items)}, ensure_ascii=False),
+                    now_iso,
+                    now_iso,
+                ),
+            )
+            conn.executemany(
+                "UPDATE notification_outbox SET status = 'merged', digest_id = ? WHERE id = ?",
+                [(cur.lastrowid, item["id"]) for item in items],
+            )
+            created += 1
+    return created
+
+
+def notification_counts(db_path: str) -> dict[str, int]:
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute("SELECT status, COUNT(*) AS n FROM notification_outbox GROUP BY status").fetchall()
+    return {row["status"]: int(row["n"]) for row in rows}
+
+
+def get_cached_selectors(db_path: str, host: str, url_pattern: str) -> dict[str, str]:
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(
+            """
+            SELECT kind, selector
+            FROM selector_cache
+            WHERE host = ? AND url_pattern = ? AND selector IS NOT NULL
+            """,
+            (host, url_pattern),
+        ).fetchall()
+    return {row["kind"]: row["selector"] for row in rows}
+
+
+@_writes
+def record_selector_outcomes(
+    db_path: str,
+    host: str,
+    url_pattern: str,
+    outcomes: dict[str, dict[str, Any]],
+) -> None:
+    if not outcomes:
+        return
+    now = utc_now_iso()
+    with _connect(db_path) as conn:
+        conn.executemany(
+            """
+            INSERT INTO selector_cache(host, url_pattern, kind, selector, hits, misses, updated_at)
+            VALUES(?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(host, url_pattern, kind) DO UPDATE SET
+                selector = COALESCE(excluded.selector, selector_cache.selector),
+                hits = selector_cache.hits + excluded.hits,
+                misses = selector_cache.misses + excluded.misses,
+                updated_at = excluded.updated_at
+            """,
+            [
+                (
+                    host,
+                    url_pattern,
+                    kind,
+                    outcome.get("selector"),
+                    1 if outcome.get("hit") else 0,
+                    0 if outcome.get("hit") else 1,
+                    now,
+                )
+                for kind, outcome in outcomes.items()
+            ],
+        )
+
+
+def list_selector_cache(db_path: str) -> list[dict[str, Any]]:
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(
+            """
+            SELECT host, url_pattern, kind, selector, hits, misses, updated_at
+            FROM selector_cache
+            ORDER BY host, url_pattern, kind
+            """
+        ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _schedule_row(row: sqlite3.Row) -> dict[str, Any]:
+    data = dict(row)
+    data["factors"] = json.loads(data["factors"]) if data.get("factors") else None
+    return data
+
+
+def list_schedules(db_path: str) -> list[dict[str, Any]]:
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(
+            """
+            SELECT e.id AS event_id, e.name, e.active, s.interval_min, s.pinned_interval_min, s.next_run_at,
+                   s.factors, s.updated_at
+            FROM tracked_events AS e
+            LEFT JOIN event_schedule AS s ON s.event_id = e.id
+            ORDER BY s.next_run_at IS NULL, s.next_run_at, e.id
+            """
+        ).fetchall()
+    return [_schedule_row(row) for row in rows]
+
+
+@_writes
+def save_schedule(
+    db_path: str,
+    event_id: int,
+    interval_min: float,
+    next_run_at: str,
+    factors: dict[str, Any] | None = None,
+) -> None:
+    with _connect(db_path) as conn:
+        conn.execute(
+            """
+            INSERT INTO event_schedule(event_id, interval_min, next_run_at, factors, updated_at)
+            VALUES(?, ?, ?, ?, ?)
+            ON CONFLICT(event_id) DO UPDATE SET
+                interval_min = excluded.interval_min,
+                next_run_at = excluded.next_run_at,
+                factors = COALESCE(excluded.factors, event_schedule.factors),
+                updated_at = excluded.updated_at
+            """,
+            (event_id, interval_min, next_run_at, json.dumps(factors) if factors else None, utc_now_iso()),
+        )
+
+
+@_writes
+def override_schedule(
+    db_path: str,
+    event_id: int,
+    *,
+    next_run_at: str | None = None,
+    pinned_interval_min: float | None = None,
+    pin: bool = False,
+) -> None:
+    """Move the next run and/or pin the interval (`pin=True` with None unpins)."""
+    now = utc_now_iso()
+    with _connect(db_path) as conn:
+        conn.execute(
+            """
+            INSERT INTO event_schedule(event_id, interval_min, next_run_at, updated_at)
+            VALUES(?, ?, ?, ?)
+            ON CONFLICT(event_id) DO NOTHING
+            """,
+            (event_id, pinned_interval_min or 0, next_run_at or now, now),
+        )
+        if next_run_at is not None:
+            conn.execute("UPDATE event_schedule SET next_run_at = ? WHERE event_id = ?", (next_run_at, event_id))
+        if pin:
+            conn.execute(
+                """
+                UPDATE event_schedule
+                SET pinned_interval_min = ?, interval_min = COALESCE(?, interval_min)
+                WHERE event_id = ?
+                """,
+                (pinned_interval_min, pinned_interval_min, event_id),
+            )
+        conn.execute("UPDATE event_schedule SET updated_at = ? WHERE event_id = ?", (now, event_id))
+
+
+def schedule_inputs(db_path: str, since: str, window_runs: int = 20) -> dict[int, dict[str, Any]]:
+    """Per active event: min-price volatility, error rate and audience, from the last `window_runs` runs since `since`."""
+    with _connect(db_path, readonly=True) as conn:
+        inputs = {
+            int(row["id"]): {"volatility_pct": None, "summaries": 0, "error_rate": 0.0, "runs": 0, "subscribers": row["subscribers"]}
+            for row in conn.execute(
+                """
+                SELECT e.id,
+                       (SELECT COUNT(*) FROM subscribers AS s
+                        WHERE s.active = 1 AND (s.event_id IS NULL OR s.event_id = e.id)) AS subscribers
+                FROM tracked_events AS e
+                WHERE e.active = 1
+                """
+            )
+        }
+        # Mean absolute change of the per-run minimum (run_summaries is price_history's per-run rollup).
+        for row in conn.execute(
+            """
+            SELECT event_id, COUNT(*) AS summaries, AVG(ABS(min_price - previous) * 100.0 / previous) AS volatility_pct
+            FROM (
+                SELECT event_id, min_price,
+                       LAG(min_price) OVER (PARTITION BY event_id ORDER BY scraped_at) AS previous,
+                       ROW_NUMBER() OVER (PARTITION BY event_id ORDER BY scraped_at DESC) AS recent
+                FROM run_summaries
+                WHERE scraped_at >= ?
+            )
+            WHERE recent <= ? AND previous > 0 AND min_price IS NOT NULL
+            GROUP BY event_id
+            """,
+            (since, window_runs),
+        ):
+            if row["event_id"] in inputs:
+                inputs[row["event_id"]].update(summaries=row["summaries"], volatility_pct=row["volatility_pct"])
+        for row in conn.execute(
+            """
+            SELECT event_id, COUNT(*) AS runs, AVG(status = 'error') AS error_rate
+            FROM (
+                SELECT event_id, status,
+                       ROW_NUMBER() OVER (PARTITION BY event_id ORDER BY started_at DESC) AS recent
+                FROM scrape_runs
+                WHERE started_at >= ? AND status != 'running'
+            )
+            WHERE recent <= ?
+            GROUP BY event_id
+            """,
+            (since, window_runs),
+        ):
+            if row["event_id"] in inputs:
+                inputs[row["event_id"]].update(runs=row["runs"], error_rate=row["error_rate"])
+    return inputs
+
+
+SCRAPE_JOB_SELECT = """
+    SELECT id, event_id, source, status, attempts, worker_id, lease_expires_at, enqueued_at,
+           started_at, finished_at, result, error
+    FROM scrape_jobs
+"""
+
+
+def _job_row(row: sqlite3.Row) -> dict[str, Any]:
+    data = dict(row)
+    data["result"] = json.loads(data["result"]) if data.get("result") else None
+    return data
+
+
+def _enqueue_jobs(conn: sqlite3.Connection, event_ids: Iterable[int], source: str) -> list[int]:
+    now = utc_now_iso()
+    job_ids: list[int] = []
+    for event_id in event_ids:
+        conn.execute(
+            "INSERT OR IGNORE INTO scrape_jobs(event_id, source, status, enqueued_at) VALUES(?, ?, 'queued', ?)",
+            (event_id, source, now),
+        )
+        row = conn.execute(
+            "SELECT id FROM scrape_jobs WHERE event_id = ? AND status IN ('queued', 'running')",
+            (event_id,),
+        ).fetchone()
+        job_ids.append(int(row["id"]))
+    return job_ids
+
+
+@_writes
+def enqueue_scrape_jobs(db_path: str, event_ids: Iterable[int], source: str = "manual") -> list[int]:
+    """Queue one scrape per event; an event that already has a queued or running job reuses it."""
+    with _connect(db_path) as conn:
+        return _enqueue_jobs(conn, event_ids, source)
+
+
+@_writes
+def create_scrape_batch(db_path: str, event_ids: Iterable[int], source: str = "manual") -> int:
+    """Queue a scrape per event and group them under one id the caller can poll or cancel."""
+    with _connect(db_path) as conn:
+        job_ids = _enqueue_jobs(conn, event_ids, source)
+        cur = conn.execute(
+            "INSERT INTO scrape_batches(source, job_ids, created_at) VALUES(?, ?, ?)",
+            (source, json.dumps(job_ids), utc_now_iso()),
+        )
+    return int(cur.lastrowid)
+
+
+def _batch_summary(row: sqlite3.Row, jobs: list[dict[str, Any]]) -> dict[str, Any]:
+    counts = Counter(job["status"] for job in jobs)
+    progress = {status: counts.get(status, 0) for status in ("queued", "running", "done", "error", "cancelled")}
+    pending = progress["queued"] + progress["running"]
+    if pending:
+        status = "queued" if pending == len(jobs) and not progress["running"] else "running"
+    elif progress["cancelled"] and (row["cancelled_at"] or progress["cancelled"] == len(jobs)):
+        # Scrapes can be shared between batches, so cancelling one batch can cancel part of another.
+        status = "cancelled"
+    elif progress["error"] and progress["error"] == len(jobs):
+        status = "error"
+    else:
+        status = "partial" if progress["error"] or progress["cancelled"] else "done"
+    finished_at = max((job["finished_at"] for job in jobs if job["finished_at"]), default=None)
+    total_wall_time_s = None
+    if not pending and finished_at:
+        elapsed = datetime.fromisoformat(finished_at) - datetime.fromisoformat(row["created_at"])
+        total_wall_time_s = round(max(elapsed.total_seconds(), 0.0), 3)
+    return {
+        "job_id": int(row["id"]),
+        "source": row["source"],
+        "status": status,
+        "finished": not pending,
+        "created_at": row["created_at"],
+        "finished_at": None if pending else finished_at,
+        "cancelled_at": row["cancelled_at"],
+        "total_wall_time_s": total_wall_time_s,
+        "progress": {"total": len(jobs), "finished": len(jobs) - pending, **progress},
+        "events": [
+            {
+                "event_id": job["event_id"],
+                "scrape_job_id": job["id"],
+                "status": job["status"],
+                "attempts": job["attempts"],
+                "worker_id": job["worker_id"],
+                "started_at": job["started_at"],
+                "finished_at": job["finished_at"],
+                "error": job["error"],
+                "result": job["result"],
+            }
+            for job in jobs
+        ],
+    }
+
+
+def get_scrape_batch(db_path: str, batch_id: int) -> dict[str, Any] | None:
+    with _connect(db_path, readonly=True) as conn:
+        row = conn.execute(
+            "SELECT id, source, job_ids, created_at, cancelled_at FROM scrape_batches WHERE id = ?",
+            (batch_id,),
+        ).fetchone()
+    if row is None:
+        return None
+    return _batch_summary(row, get_scrape_jobs(db_path, json.loads(row["job_ids"])))
+
+
+def list_scrape_batches(db_path: str, limit: int = 20) -> list[dict[str, Any]]:
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(
+            "SELECT id, source, job_ids, created_at, cancelled_at FROM scrape_batches ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+    return [_batch_summary(row, get_scrape_jobs(db_path, json.loads(row["job_ids"]))) for row in rows]
+
+
+@_writes
+def cancel_scrape_batch(db_path: str, batch_id: int) -> int | None:
+    """Drop the batch's scrapes that no worker has started; running ones finish. None if unknown."""
+    now = utc_now_iso()
+    with _connect(db_path) as conn:
+        row = conn.execute("SELECT job_ids FROM scrape_batches WHERE id = ?", (batch_id,)).fetchone()
+        if row is None:
+            return None
+        job_ids = json.loads(row["job_ids"])
+        cur = conn.execute(
+            f"""
+            UPDATE scrape_jobs SET status = 'cancelled', finished_at = ?
+            WHERE status = 'queued' AND id IN ({','.join('?' * len(job_ids)) or 'NULL'})
+            """,
+            (now, *job_ids),
+        )
+        conn.execute(
+            "UPDATE scrape_batches SET cancelled_at = COALESCE(cancelled_at, ?) WHERE id = ?",
+            (now, batch_id),
+        )
+    return cur.rowcount
+
+
+def _lease_until(lease_s: float) -> str:
+    return (datetime.now(timezone.utc) + timedelta(seconds=lease_s)).isoformat(timespec="milliseconds")
+
+
+def claim_scrape_jobs(db_path: str, worker_id: str, limit: int = 1, lease_s: float = JOB_LEASE_S) -> list[dict[str, Any]]:
+    now = utc_now_iso()
+    lease_until = _lease_until(lease_s)
+    claimed: list[dict[str, Any]] = []
+    with _connect(db_path) as conn:
+        candidates = conn.execute(
+            f"{SCRAPE_JOB_SELECT} WHERE status = 'queued' ORDER BY id LIMIT ?",
+            (limit,),
+        ).fetchall()
+        for row in candidates:
+            # The UPDATE runs under SQLite's write lock: only one worker can move a row out of 'queued'.
+            cur = conn.execute(
+                """
+                UPDATE scrape_jobs
+                SET status = 'running', worker_id = ?, lease_expires_at = ?, started_at = ?, attempts = attempts + 1
+                WHERE id = ? AND status = 'queued'
+                """,
+                (worker_id, lease_until, now, row["id"]),
+            )
+            if cur.rowcount:
+                claimed.append(
+                    {
+                        **_job_row(row),
+                        "status": "running",
+                        "worker_id": worker_id,
+                        "lease_expires_at": lease_until,
+                        "started_at": now,
+                        "attempts": row["attempts"] + 1,
+                    }
+                )
+    return claimed
+
+
+def heartbeat_scrape_jobs(db_path: str, worker_id: str, job_ids: list[int], lease_s: float = JOB_LEASE_S) -> set[int]:
+    """Extend the leases this worker still holds; returns the job ids it still owns."""
+    if not job_ids:
+        return set()
+    marks = ",".join("?" * len(job_ids))
+    with _connect(db_path) as conn:
+        conn.execute(
+            f"""
+            UPDATE scrape_jobs SET lease_expires_at = ?
+            WHERE worker_id = ? AND status = 'running' AND id IN ({marks})
+            """,
+            (_lease_until(lease_s), worker_id, *job_ids),
+        )
+        rows = conn.execute(
+            f"SELECT id FROM scrape_jobs WHERE worker_id = ? AND status = 'running' AND id IN ({marks})",
+            (worker_id, *job_ids),
+        ).fetchall()
+    return {int(row["id"]) for row in rows}
+
+
+def requeue_expired_scrape_jobs(db_path: str, max_attempts: int = JOB_MAX_ATTEMPTS) -> int:
+    """Put running jobs whose worker stopped heartbeating back in the queue (or fail them after `max_attempts`)."""
+    now = utc_now_iso()
+    with _connect(db_path) as conn:
+        cur = conn.execute(
+            """
+            UPDATE scrape_jobs
+            SET status = CASE WHEN attempts >= ? THEN 'error' ELSE 'queued' END,
+                error = CASE WHEN attempts >= ? THEN 'lease expired' ELSE error END,
+                finished_at = CASE WHEN attempts >= ? THEN ? ELSE NULL END,
+                worker_id = NULL,
+                lease_expires_at = NULL
+            WHERE status = 'running' AND lease_expires_at < ?
+            """,
+            (max_attempts, max_attempts, max_attempts, now, now),
+        )
+    return cur.rowcount
+
+
+@_writes
+def finish_scrape_job(
+    db_path: str,
+    job_id: int,
+    worker_id: str,
+    *,
+    status: str,
+    result: dict[str, Any] | None = None,
+    error: str | None = None,
+) -> bool:
+    with _connect(db_path) as conn:
+        cur = conn.execute(
+            """
+            UPDATE scrape_jobs
+            SET status = ?, result = ?, error = ?, finished_at = ?, lease_expires_at = NULL
+            WHERE id = ? AND worker_id = ? AND status = 'running'
+            """,
+            (
+                status,
+                json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                error,
+                utc_now_iso(),
+                job_id,
+                worker_id,
+            ),
+        )
+    return cur.rowcount > 0
+
+
+def get_scrape_jobs(db_path: str, job_ids: list[int]) -> list[dict[str, Any]]:
+    if not job_ids:
+        return []
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(
+            f"{SCRAPE_JOB_SELECT} WHERE id IN ({','.join('?' * len(job_ids))})",
+            job_ids,
+        ).fetchall()
+    by_id = {int(row["id"]): _job_row(row) for row in rows}
+    return [by_id[job_id] for job_id in job_ids if job_id in by_id]
+
+
+def list_scrape_jobs(db_path: str, status: str | None = None, limit: int = 100) -> list[dict[str, Any]]:
+    with _connect(db_path, readonly=True) as conn:
+        if status is None:
+            rows = conn.execute(f"{SCRAPE_JOB_SELECT} ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        else:
+            rows = conn.execute(
+                f"{SCRAPE_JOB_SELECT} WHERE status = ? ORDER BY id DESC LIMIT ?",
+                (status, limit),
+            ).fetchall()
+    return [_job_row(row) for row in rows]
+
+
+def scrape_jobs_finished_since(db_path: str, since: str) -> list[dict[str, Any]]:
+    with _connect(db_path, readonly=True) as conn:
+        rows = conn.execute(
+            f"{SCRAPE_JOB_SELECT} WHERE finished_at > ? ORDER BY finished_at",
+            (since,),
+        ).fetchall()
+    return [_job_row(row) for row in rows]
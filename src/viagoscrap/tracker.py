@@ -1,13 +1,34 @@
 from __future__ import annotations
 
 import asyncio
+from concurrent.futures import Future
 import re
+import threading
+import time
 from typing import Any
 
+from .browser import BrowserPool
+from .bus import bus
 from .config import Settings
-from .notifier import send_min_drop_email
-from .scraper import scrape_listings
-from .storage import finish_run, insert_prices, insert_run_started, list_subscribers, refresh_event_stats, utc_now_iso
+from .notifier import resolve_recipients
+from .scraper import Ticket, scrape_listings, selector_cache_key
+from .storage import (
+    finish_run,
+    get_cached_selectors,
+    insert_listing_changes,
+    insert_prices,
+    insert_run_started,
+    last_alerted_price,
+    list_subscribers,
+    record_selector_outcomes,
+    utc_now_iso,
+)
+
+# Single-flight state, keyed by (db_path, event_id): the scrape currently running for an
+# event and the last successful result (for SCRAPE_FRESHNESS_S).
+_flight_lock = threading.Lock()
+_in_flight: dict[tuple[str, int], Future] = {}
+_last_results: dict[tuple[str, int], tuple[float, dict[str, Any]]] = {}
 
 
 def parse_price(raw: str) -> tuple[float | None, str | None]:
@@ -44,67 +65,207 @@ def is_price_drop(previous_low: float | None, new_low: float | None) -> bool:
     return previous_low is not None and new_low is not None and new_low < previous_low
 
 
-def scrape_event_once(
+def _alert_notifications(
+    db_path: str,
+    event: dict[str, Any],
+    previous_low_value: float | None,
+    min_price: float | None,
+    rows: list[dict[str, Any]],
+    settings: Settings,
+) -> tuple[list[dict[str, Any]], dict[str, Any] | None]:
+    """Outbox rows for a new minimum; they are queued with the prices and sent by the dispatcher."""
+    if not is_price_drop(previous_low_value, min_price):
+        return [], None
+    event_id = int(event["id"])
+    if settings.alert_min_delta_pct > 0:
+        # Measure from the last alerted price so a slow slide still alerts once it adds up.
+        reference = last_alerted_price(db_path, event_id) or previous_low_value
+        if (reference - min_price) * 100 < settings.alert_min_delta_pct * reference:
+            return [], {"queued": False, "reason": "below_min_delta", "reference_price": reference}
+    recipients = [entry["email"] for entry in list_subscribers(db_path, event_id) if entry.get("email")]
+    drop = {
+        "event_name": str(event.get("name", f"event-{event['id']}")),
+        "event_url": str(event.get("url", "")),
+        "old_price": previous_low_value,
+        "new_price": float(min_price),
+        "currency": (rows[0].get("currency") if rows else None) or "EUR",
+    }
+    if settings.alert_mode == "digest":
+        to_list = resolve_recipients(recipients)
+        notifications = [
+            {"kind": "digest_item", "recipient": recipient, "status": "held", "payload": drop} for recipient in to_list
+        ]
+        return notifications, {"queued": True, "mode": "digest", "recipients": len(to_list)}
+    return [{"kind": "min_drop", "payload": {**drop, "recipients": recipients}}], {
+        "queued": True,
+        "mode": "instant",
+        "recipients": len(recipients),
+    }
+
+
+def _save_results(
+    db_path: str,
+    event: dict[str, Any],
+    run_id: int,
+    previous_low_value: float | None,
+    tickets: list[Ticket],
+    metrics: dict[str, Any],
+    settings: Settings | None = None,
+) -> dict[str, Any]:
+    settings = settings or Settings()
+    history_mode = settings.history_mode
+    now = utc_now_iso()
+    rows: list[dict[str, Any]] = []
+    for ticket in tickets:
+        price_value, currency = parse_price(ticket.price)
+        rows.append(
+            {
+                "scraped_at": now,
+                "title": ticket.title,
+                "date_label": ticket.date,
+                "price_raw": ticket.price,
+                "price_value": price_value,
+                "currency": currency,
+                "listing_url": ticket.url,
+            }
+        )
+
+    selector_outcomes = metrics.get("selectors") or {}
+    if selector_outcomes:
+        host, url_pattern = selector_cache_key(str(event["url"]))
+        record_selector_outcomes(db_path, host, url_pattern, selector_outcomes)
+        hits = sum(1 for outcome in selector_outcomes.values() if outcome.get("hit"))
+        metrics["selector_cache"] = {"hits": hits, "misses": len(selector_outcomes) - hits}
+
+    valid_prices = [row["price_value"] for row in rows if row["price_value"] is not None]
+    min_price = min(valid_prices) if valid_prices else None
+    notifications, alert_result = _alert_notifications(db_path, event, previous_low_value, min_price, rows, settings)
+
+    # Prices, their run summary and any alert rows are committed together.
+    if history_mode == "delta":
+        storage_stats = insert_listing_changes(
+            db_path, int(event["id"]), rows, notifications=notifications, summarize=True, run_id=run_id
+        )
+        saved = storage_stats["rows_written"]
+    else:
+        saved = insert_prices(db_path, int(event["id"]), rows, notifications=notifications, summarize=True, run_id=run_id)
+        storage_stats = {"rows_written": saved, "rows_avoided": 0}
+    metrics["storage"] = {"mode": history_mode, **storage_stats}
+    if alert_result is not None:
+        bus.publish(
+            "new_minimum",
+            {"event_id": int(event["id"]), "old_price": previous_low_value, "new_price": min_price},
+        )
+    finish_run(
+        db_path,
+        run_id,
+        status="ok",
+        error=None,
+        items_found=len(tickets),
+        items_saved=saved,
+        min_price_found=min_price,
+        metrics=metrics,
+    )
+    return {
+        "event_id": int(event["id"]),
+        "items_found": len(tickets),
+        "items_saved": saved,
+        "rows_avoided": storage_stats["rows_avoided"],
+        "min_price_found": min_price,
+        "status": "ok",
+        "alert": alert_result,
+    }
+
+
+def _fresh_result(key: tuple[str, int], freshness_s: float) -> dict[str, Any] | None:
+    cached = _last_results.get(key)
+    if cached is None or freshness_s <= 0:
+        return None
+    age = time.monotonic() - cached[0]
+    if age > freshness_s:
+        _last_results.pop(key, None)
+        return None
+    return {**cached[1], "cached": True, "age_s": round(age, 3)}
+
+
+async def scrape_event(
     db_path: str,
     event: dict[str, Any],
     settings: Settings,
     debug: bool = False,
+    pool: BrowserPool | None = None,
 ) -> dict[str, Any]:
-    run_id = insert_run_started(db_path, int(event["id"]))
+    """Scrape one event, joining the scrape already running for it if there is one.
+
+    Concurrent callers (scheduler, manual scrape, worker threads, other event loops) share
+    a single run and each get a copy of its result. With `scrape_freshness_s`, a successful
+    result younger than that is returned as is (`cached: true`) without opening a page.
+    """
+    key = (db_path, int(event["id"]))
+    with _flight_lock:
+        cached = _fresh_result(key, settings.scrape_freshness_s)
+        leader = cached is None and key not in _in_flight
+        if leader:
+            _in_flight[key] = Future()
+        flight = _in_flight.get(key)
+    if cached is not None:
+        return cached
+    if not leader:
+        return {**await asyncio.wrap_future(flight), "joined": True}
+
+    try:
+        result = await _scrape_event(db_path, event, settings, debug=debug, pool=pool)
+    except BaseException as exc:
+        with _flight_lock:
+            _in_flight.pop(key, None)
+        flight.set_exception(exc)
+        raise
+    with _flight_lock:
+        _in_flight.pop(key, None)
+        if result["status"] == "ok":
+            _last_results[key] = (time.monotonic(), dict(result))
+    flight.set_result(dict(result))
+    return result
+
+
+async def _scrape_event(
+    db_path: str,
+    event: dict[str, Any],
+    settings: Settings,
+    debug: bool = False,
+    pool: BrowserPool | None = None,
+) -> dict[str, Any]:
+    # SQLite writes are blocking: keep them off the loop so
+    # concurrent scrapes sharing it are not stalled.
+    started = time.perf_counter()
+    run_id = await asyncio.to_thread(insert_run_started, db_path, int(event["id"]))
+    bus.publish("scrape_started", {"event_id": int(event["id"]), "run_id": run_id})
     previous_low = event.get("lowest_price_value")
     previous_low_value = float(previous_low) if previous_low is not None else None
+    metrics: dict[str, Any] = {}
     try:
-        tickets = asyncio.run(scrape_listings(event["url"], settings, debug=debug))
-        now = utc_now_iso()
-        rows: list[dict[str, Any]] = []
-        for ticket in tickets:
-            price_value, currency = parse_price(ticket.price)
-            rows.append(
-                {
-                    "scraped_at": now,
-                    "title": ticket.title,
-                    "date_label": ticket.date,
-                    "price_raw": ticket.price,
-                    "price_value": price_value,
-                    "currency": currency,
-                    "listing_url": ticket.url,
-                }
-            )
-
-        saved = insert_prices(db_path, int(event["id"]), rows)
-        refresh_event_stats(db_path, int(event["id"]))
-        valid_prices = [row["price_value"] for row in rows if row["price_value"] is not None]
-        min_price = min(valid_prices) if valid_prices else None
-        alert_result: dict[str, Any] | None = None
-        if is_price_drop(previous_low_value, min_price):
-            recipients = [entry["email"] for entry in list_subscribers(db_path, int(event["id"])) if entry.get("email")]
-            alert_result = send_min_drop_email(
-                event_name=str(event.get("name", f"event-{event['id']}")),
-                event_url=str(event.get("url", "")),
-                old_price=previous_low_value,
-                new_price=float(min_price),
-                currency=(rows[0].get("currency") if rows else None) or "EUR",
-                recipients=recipients,
-            )
-        finish_run(
+        preferred = await asyncio.to_thread(get_cached_selectors, db_path, *selector_cache_key(str(event["url"])))
+        tickets = await scrape_listings(
+            event["url"],
+            settings,
+            debug=debug,
+            pool=pool,
+            metrics=metrics,
+            preferred_selectors=preferred,
+        )
+        result = await asyncio.to_thread(
+            _save_results,
             db_path,
+            event,
             run_id,
-            status="ok",
-            error=None,
-            items_found=len(tickets),
-            items_saved=saved,
-            min_price_found=min_price,
+            previous_low_value,
+            tickets,
+            metrics,
+            settings,
         )
-        return {
-            "event_id": int(event["id"]),
-            "items_found": len(tickets),
-            "items_saved": saved,
-            "min_price_found": min_price,
-            "status": "ok",
-            "alert": alert_result,
-        }
     except Exception as exc:
-        finish_run(
+        await asyncio.to_thread(
+            finish_run,
             db_path,
             run_id,
             status="error",
@@ -112,5 +273,36 @@ def scrape_event_once(
             items_found=0,
             items_saved=0,
             min_price_found=None,
+            metrics=metrics,
         )
-        return {"event_id": int(event["id"]), "status": "error", "error": str(exc)}
+        result = {"event_id": int(event["id"]), "status": "error", "error": str(exc)}
+    result["wall_time_s"] = round(time.perf_counter() - started, 3)
+    result["metrics"] = metrics
+    bus.publish(
+        "scrape_finished",
+        {
+            "event_id": int(event["id"]),
+            "run_id": run_id,
+            "status": result["status"],
+            "items_found": result.get("items_found", 0),
+            "min_price_found": result.get("min_price_found"),
+            "wall_time_s": result["wall_time_s"],
+        },
+    )
+    return result
+
+
+def _run(coro, pool: BrowserPool | None):
+    if pool is not None:
+        return pool.run(coro)
+    return asyncio.run(coro)
+
+
+def scrape_event_once(
+    db_path: str,
+    event: dict[str, Any],
+    settings: Settings,
+    debug: bool = False,
+    pool: BrowserPool | None = None,
+) -> dict[str, Any]:
+    return _run(scrape_event(db_path, event, settings, debug=debug, pool=pool), pool)
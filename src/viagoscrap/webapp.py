@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+import asyncio
+from itertools import chain, islice
+import json
 import os
-from typing import Any
+import sys
+import time
+from typing import Any, Callable, Iterable, Iterator
 
 from apscheduler.schedulers.background import BackgroundScheduler
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 try:
@@ -14,21 +19,53 @@ except ModuleNotFoundError:
     def load_dotenv() -> bool:
         return False
 
+from .browser import BrowserPool
+from .bus import bus
 from .config import Settings
+from .export import EXPORT_FORMATS, export_filename, stream_export
+from .outbox import OutboxDispatcher
+from .scheduling import plan_due_events
 from .storage import (
     active_events,
     add_subscriber,
     add_event,
+    bump_data_version,
+    cancel_scrape_batch,
     chart_points,
+    close_connections,
+    compact_history,
+    create_scrape_batch,
+    current_listings,
+    data_version,
+    database_version,
     deactivate_subscriber,
+    enqueue_scrape_jobs,
     event_history,
     get_event,
+    get_scrape_batch,
+    history_cursor,
     init_db,
     list_events,
+    list_notifications,
     list_runs,
+    list_scrape_batches,
+    list_scrape_jobs,
+    list_schedules,
+    list_selector_cache,
     list_subscribers,
+    listings_at,
+    notification_counts,
+    on_write,
+    override_schedule,
+    retry_notification,
+    scrape_jobs_finished_since,
+    run_cursor,
+    stream_event_history,
+    stream_runs,
+    to_utc_iso,
+    utc_now_iso,
 )
-from .tracker import scrape_event_once
+from .worker import ScrapeWorker
 
 
 class EventCreate(BaseModel):
@@ -41,6 +78,11 @@ class IntervalUpdate(BaseModel):
     scrape_interval_min: int = Field(ge=1, le=1440)
 
 
+class ScheduleOverride(BaseModel):
+    next_run_at: str | None = None
+    interval_min: float | None = Field(default=None, ge=1, le=10080)
+
+
 class SubscriberCreate(BaseModel):
     email: str = Field(min_length=5, max_length=320)
     event_id: int | None = None
@@ -53,6 +95,44 @@ def _env_bool(name: str, default: bool = False) -> bool:
     return raw.strip().strip('"').strip("'").lower() in {"1", "true", "yes", "y", "on"}
 
 
+NDJSON_CHUNK_ROWS = 500
+JOB_WATCH_INTERVAL_S = 5
+SSE_HEARTBEAT_S = 25.0
+# Storage writes that the dashboard cares about, and the SSE event they are published as.
+WRITE_EVENTS = {
+    "add_event": "events_changed",
+    "add_subscriber": "subscribers_changed",
+    "deactivate_subscriber": "subscribers_changed",
+}
+# Writes that queue scrapes for the embedded worker.
+QUEUE_WRITES = {"enqueue_scrape_jobs", "create_scrape_batch"}
+# Writes that can enqueue an alert in `notification_outbox`.
+OUTBOX_WRITES = {"insert_prices", "insert_listing_changes", "retry_notification"}
+
+
+def _publish_write(name: str, version: int) -> None:
+    kind = WRITE_EVENTS.get(name)
+    if kind:
+        bus.publish(kind, {"version": version})
+
+
+def _ndjson(rows: Iterable[dict[str, Any]]) -> Iterator[bytes]:
+    # Starlette hops to a worker thread for every chunk, so batch lines rather than yield per row.
+    rows = iter(rows)
+    while chunk := list(islice(rows, NDJSON_CHUNK_ROWS)):
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in chunk).encode()
+
+
+def _cached_json(request: Request, tag: str, build: Callable[[], Any]) -> Response:
+    # `tag` must be computed before `build()` runs so a concurrent write can only make it stale-safe.
+    etag = f'W/"{tag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    candidates = {value.strip() for value in request.headers.get("if-none-match", "").split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(build(), headers=headers)
+
+
 def _build_dashboard_html() -> str:
     return """<!doctype html>
 <html lang="fr">
@@ -121,7 +201,15 @@ def _build_dashboard_html() -> str:
       </div>
       <div class="card chart-box">
         <h3>Evolution du prix min</h3>
-        <select id="eventSelect" onchange="refreshChart()"></select>
+        <div class="cluster">
+          <select id="eventSelect" onchange="refreshChart()"></select>
+          <select id="chartRange" onchange="refreshChart()">
+            <option value="24">24 h</option>
+            <option value="168" selected>7 jours</option>
+            <option value="720">30 jours</option>
+            <option value="">Tout</option>
+          </select>
+        </div>
         <canvas id="chart"></canvas>
       </div>
     </div>
@@ -143,29 +231,30 @@ function setBusyButton(btn, busyText, finalText) {
 }
 
 async function api(path, opts={}) {
-  const res = await fetch(path, { headers: {'Content-Type':'application/json'}, cache: 'no-store', ...opts });
+  // 'no-cache' revalidates with If-None-Match: unchanged data comes back as a 304 from the server.
+  const res = await fetch(path, { headers: {'Content-Type':'application/json'}, cache: 'no-cache', ...opts });
   if (!res.ok) throw new Error(await res.text());
   return res.json();
 }
 
 async function loadMeta() {
-  const cfg = await api('/api/config?ts=' + Date.now());
+  const cfg = await api('/api/config');
   document.getElementById('meta').textContent = `DB: ${cfg.db_path} | Auto: ${cfg.scrape_interval_min} min`;
   document.getElementById('intervalMin').value = cfg.scrape_interval_min;
 }
 
 async function loadEvents() {
-  const events = await api('/api/events?ts=' + Date.now());
+  const events = await api('/api/events');
   const select = document.getElementById('eventSelect');
   const subSelect = document.getElementById('subEvent');
   const selectedBefore = select.value;
   const table = document.getElementById('events');
-  table.innerHTML = '<tr><th>ID</th><th>Nom</th><th>Prix min</th><th>Dernier scrape</th><th>Action</th></tr>';
+  table.innerHTML = '<tr><th>ID</th><th>Nom</th><th>Prix min</th><th>Dernier scrape</th><th>Prochain scrape</th><th>Action</th></tr>';
   select.innerHTML = '';
   subSelect.innerHTML = '<option value=\"\">Tous les events</option>';
   events.forEach((e) => {
     const tr = document.createElement('tr');
-    tr.innerHTML = `<td>${e.id}</td><td>${e.name}</td><td>${e.lowest_price_raw ?? '-'}</td><td>${e.last_scraped_at ?? '-'}</td><td><button class="ghost" onclick="scrapeOne(${e.id}, this)">Scrape</button></td>`;
+    tr.innerHTML = `<td>${e.id}</td><td>${e.name}</td><td>${e.lowest_price_raw ?? '-'}</td><td>${e.last_scraped_at ?? '-'}</td><td>${e.next_run_at ?? '-'}</td><td><button class="ghost" onclick="scrapeOne(${e.id}, this)">Scrape</button></td>`;
     table.appendChild(tr);
     const opt = document.createElement('option');
     opt.value = e.id;
@@ -186,7 +275,7 @@ async function loadEvents() {
 }
 
 async function loadSubscribers() {
-  const rows = await api('/api/subscribers?ts=' + Date.now());
+  const rows = await api('/api/subscribers');
   const table = document.getElementById('subs');
   table.innerHTML = '<tr><th>Email</th><th>Scope</th><th>Action</th></tr>';
   rows.forEach((s) => {
@@ -212,15 +301,26 @@ async function addEvent() {
   } finally { done(); }
 }
 
+async function waitForJob(job, label) {
+  // Scrape endpoints answer at once with a job id; follow it until every event is finished.
+  while (!job.finished) {
+    setStatus(`${label}: ${job.progress.finished}/${job.progress.total}`, 'busy');
+    await new Promise((resolve) => setTimeout(resolve, 1500));
+    job = await api(`/api/jobs/${job.job_id}`);
+  }
+  return job;
+}
+
 async function scrapeOne(id, btn=null) {
   const done = setBusyButton(btn, 'Scrape...', 'Scrape');
   setStatus(`Scrape ${id}...`, 'busy');
   try {
-    await api(`/api/events/${id}/scrape`, { method: 'POST' });
+    const job = await waitForJob(await api(`/api/events/${id}/scrape`, { method: 'POST' }), `Scrape ${id}`);
     document.getElementById('eventSelect').value = String(id);
     await loadEvents();
     await refreshChart();
-    setStatus(`Scrape ${id} termine`, 'ok');
+    if (job.status === 'done') setStatus(`Scrape ${id} termine`, 'ok');
+    else setStatus(`Scrape ${id}: ${job.events[0]?.error ?? job.status}`, 'error');
   } catch (e) {
     setStatus(`Erreur scrape: ${e.message}`, 'error');
   } finally { done(); }
@@ -230,10 +330,11 @@ async function scrapeAll() {
   const done = setBusyButton(document.getElementById('btnScrapeAll'), 'Scrape en cours...', 'Scraper maintenant');
   setStatus('Scrape global en cours...', 'busy');
   try {
-    await api('/api/scrape-all', { method: 'POST' });
+    const job = await waitForJob(await api('/api/scrape-all', { method: 'POST' }), 'Scrape global');
     await loadEvents();
     await refreshChart();
-    setStatus('Scrape global termine', 'ok');
+    if (job.status === 'done') setStatus('Scrape global termine', 'ok');
+    else setStatus(`Scrape global: ${job.progress.error} erreur(s) sur ${job.progress.total}`, 'error');
   } catch (e) {
     setStatus(`Erreur globale: ${e.message}`, 'error');
   } finally { done(); }
@@ -288,7 +389,13 @@ function prettyDate(iso) {
 async function refreshChart() {
   const id = document.getElementById('eventSelect').value;
   if (!id) return;
-  const points = await api(`/api/events/${id}/chart?ts=${Date.now()}`);
+  const hours = document.getElementById('chartRange').value;
+  const canvas = document.getElementById('chart');
+  const params = new URLSearchParams({ max_points: Math.max(50, Math.round(canvas.clientWidth || 600)) });
+  // Start of range rounded to 5 min so consecutive polls reuse the same URL (and its ETag).
+  const step = 5 * 60 * 1000;
+  if (hours) params.set('from', new Date(Math.floor((Date.now() - parseInt(hours, 10) * 3600 * 1000) / step) * step).toISOString());
+  const points = await api(`/api/events/${id}/chart?${params}`);
   if (!points.length) {
     if (chart) { chart.destroy(); chart = null; }
     setStatus('Pas encore de donnees', 'busy');
@@ -321,8 +428,58 @@ async function refreshDataSilently() {
   try { await loadMeta(); await loadEvents(); } catch (_) {}
 }
 
+// Push updates: the server sends an event when something changes; polling only runs while
+// the stream is down.
+let stream = null;
+const pending = new Set();
+let flushTimer = null;
+
+function schedule(what) {
+  pending.add(what);
+  if (flushTimer) return;
+  flushTimer = setTimeout(async () => {
+    const todo = new Set(pending);
+    pending.clear();
+    flushTimer = null;
+    try {
+      if (todo.has('all')) { await refreshDataSilently(); return; }
+      if (todo.has('events')) await loadEvents();
+      else if (todo.has('chart')) await refreshChart();
+      if (todo.has('subscribers') && !todo.has('events')) await loadSubscribers();
+    } catch (_) {}
+  }, 300);
+}
+
+function connectStream() {
+  if (!window.EventSource) return;
+  stream = new EventSource('/api/stream');
+  stream.addEventListener('scrape_started', (e) => {
+    const data = JSON.parse(e.data);
+    setStatus(`Scraping event ${data.event_id}...`, 'busy');
+  });
+  stream.addEventListener('scrape_finished', (e) => {
+    const data = JSON.parse(e.data);
+    if (data.status === 'ok') setStatus(`Event ${data.event_id}: ${data.items_found} annonces`, 'ok');
+    else setStatus(`Event ${data.event_id}: erreur`, 'error');
+    schedule('events');
+  });
+  stream.addEventListener('new_minimum', (e) => {
+    const data = JSON.parse(e.data);
+    setStatus(`Nouveau prix min pour l'event ${data.event_id}: ${data.new_price} EUR`, 'ok');
+    schedule('events');
+  });
+  stream.addEventListener('events_changed', () => schedule('events'));
+  stream.addEventListener('subscribers_changed', () => schedule('subscribers'));
+  stream.addEventListener('resync', () => schedule('all'));
+  // Catch up on whatever happened while disconnected.
+  stream.addEventListener('open', () => schedule('all'));
+}
+
 loadMeta().then(loadEvents);
-setInterval(refreshDataSilently, 15000);
+connectStream();
+setInterval(() => {
+  if (!stream || stream.readyState !== EventSource.OPEN) refreshDataSilently();
+}, 15000);
 </script>
 </body></html>"""
 
@@ -332,45 +489,147 @@ def create_app() -> FastAPI:
     app = FastAPI(title="ViagoScrap Web")
     db_path = os.getenv("DB_PATH", "data/viagoscrap.db")
     interval_min = int(os.getenv("SCRAPE_INTERVAL_MIN", "15"))
+    retention_days = max(0, int(os.getenv("HISTORY_RETENTION_DAYS", "0")))
     runtime = {"interval_min": max(1, interval_min)}
     settings = Settings.from_env()
     scraper_debug = _env_bool("SCRAPER_DEBUG", default=False)
     scheduler = BackgroundScheduler()
+    pool = BrowserPool(settings, debug=scraper_debug)
+    dispatcher = OutboxDispatcher(
+        db_path,
+        digest_window_s=settings.alert_digest_window_min * 60,
+        digest_throttle_s=settings.alert_throttle_min * 60,
+        debug=scraper_debug,
+    )
+    # The web process only enqueues scrapes; they run in the embedded worker or in `viagoscrap-worker` processes.
+    worker = ScrapeWorker(db_path, settings, pool=pool, debug=scraper_debug) if settings.worker_mode == "embedded" else None
+    # Registered at startup and removed at shutdown: the listener list is module-global.
+    write_listeners = [
+        _publish_write,
+        lambda name, _version: dispatcher.wake() if name in OUTBOX_WRITES else None,
+    ]
+    if worker is not None:
+        write_listeners.append(lambda name, _version: worker.wake() if name in QUEUE_WRITES else None)
+    unregister_listeners: list[Callable[[], None]] = []
+    # ETags combine this with the storage data version, so a restart never serves a stale 304.
+    instance = f"{os.getpid():x}.{time.time_ns():x}"
+
+    def version_tag() -> str:
+        # The in-process counter covers this process's writes as soon as they return; the
+        # database's own data_version covers commits from other processes (CLI, external workers).
+        return f"{instance}.{data_version()}.{database_version(db_path)}"
 
     def schedule_scrape_job() -> None:
+        # Adaptive mode ticks every minute and only scrapes the events whose own next run is due.
+        adaptive = settings.schedule_mode == "adaptive"
         scheduler.add_job(
-            run_all_active,
+            run_due_events if adaptive else run_all_active,
             "interval",
-            minutes=runtime["interval_min"],
+            minutes=1 if adaptive else runtime["interval_min"],
             id="scheduled-scrape",
             replace_existing=True,
             max_instances=1,
             coalesce=True,
         )
 
-    def run_all_active() -> list[dict[str, Any]]:
-        results = []
-        for event in active_events(db_path):
-            results.append(scrape_event_once(db_path, event, settings, debug=scraper_debug))
-        return results
+    def compact_old_history() -> dict[str, Any]:
+        result = compact_history(db_path, retention_days)
+        if scraper_debug:
+            print(f"[retention] {result}", file=sys.stderr)
+        return result
+
+    def run_all_active() -> list[int]:
+        return enqueue_scrape_jobs(db_path, [int(event["id"]) for event in active_events(db_path)], source="schedule")
+
+    def run_due_events() -> list[int]:
+        due = plan_due_events(db_path, runtime["interval_min"], settings)
+        return enqueue_scrape_jobs(db_path, [int(event["id"]) for event in due], source="schedule")
+
+    def queued_job(event_ids: list[int]) -> JSONResponse:
+        job = get_scrape_batch(db_path, create_scrape_batch(db_path, event_ids))
+        return JSONResponse(job, status_code=202, headers={"Location": f"/api/jobs/{job['job_id']}"})
+
+    def watch_external_jobs() -> None:
+        # Scrapes written by other processes bypass this process's data version and event bus.
+        finished = scrape_jobs_finished_since(db_path, runtime["jobs_seen_at"])
+        if not finished:
+            return
+        runtime["jobs_seen_at"] = finished[-1]["finished_at"]
+        bump_data_version()
+        for job in finished:
+            result = job["result"] or {}
+            bus.publish(
+                "scrape_finished",
+                {
+                    "event_id": job["event_id"],
+                    "job_id": job["id"],
+                    "status": result.get("status", job["status"]),
+                    "items_found": result.get("items_found", 0),
+                    "min_price_found": result.get("min_price_found"),
+                    "wall_time_s": result.get("wall_time_s"),
+                },
+            )
 
     @app.on_event("startup")
     def startup() -> None:
         init_db(db_path)
+        unregister_listeners.extend(on_write(listener) for listener in write_listeners)
+        dispatcher.start()
+        if worker is not None:
+            pool.start()
+            worker.start()
+        else:
+            runtime["jobs_seen_at"] = utc_now_iso()
+            scheduler.add_job(
+                watch_external_jobs,
+                "interval",
+                seconds=JOB_WATCH_INTERVAL_S,
+                id="external-jobs",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
         schedule_scrape_job()
+        if retention_days:
+            scheduler.add_job(
+                compact_old_history,
+                "cron",
+                hour=4,
+                minute=17,
+                id="history-retention",
+                replace_existing=True,
+                max_instances=1,
+                coalesce=True,
+            )
         scheduler.start()
 
     @app.on_event("shutdown")
     def shutdown() -> None:
+        while unregister_listeners:
+            unregister_listeners.pop()()
         if scheduler.running:
             scheduler.shutdown(wait=False)
+        dispatcher.stop()
+        if worker is not None:
+            worker.stop()
+        pool.close()
+        close_connections()
 
     @app.get("/", response_class=HTMLResponse)
     def home() -> str:
         return _build_dashboard_html()
 
     @app.get("/api/config")
-    def config() -> dict[str, Any]:
+    def config(request: Request) -> Response:
+        # Everything that can change at runtime goes in the tag.
+        stream_clients = bus.subscriber_count
+        return _cached_json(
+            request,
+            f"{instance}.{runtime['interval_min']}.{stream_clients}",
+            lambda: config_payload(stream_clients),
+        )
+
+    def config_payload(stream_clients: int) -> dict[str, Any]:
         notifications_enabled = bool(
             os.getenv("RESEND_API_KEY") and os.getenv("ALERT_FROM_EMAIL") and os.getenv("ALERT_TO_EMAIL")
         )
@@ -378,14 +637,78 @@ def create_app() -> FastAPI:
             "db_path": db_path,
             "scrape_interval_min": runtime["interval_min"],
             "headless": settings.headless,
+            "scrape_concurrency": settings.scrape_concurrency,
+            "history_retention_days": retention_days,
+            "history_mode": settings.history_mode,
             "scraper_debug": scraper_debug,
+            "stream_clients": stream_clients,
             "notifications_enabled": notifications_enabled,
+            "alert_mode": settings.alert_mode,
+            "schedule_mode": settings.schedule_mode,
         }
 
     @app.get("/healthz")
     def healthz() -> dict[str, str]:
         return {"status": "ok"}
 
+    @app.get("/api/stream")
+    async def stream(request: Request) -> StreamingResponse:
+        # Runs on the event loop (async def): an idle client is one parked coroutine, not a thread.
+        try:
+            last_event_id = int(request.headers["last-event-id"])
+        except (KeyError, ValueError):
+            last_event_id = None
+        queue = bus.subscribe(last_event_id)
+
+        async def messages():
+            try:
+                yield b"retry: 5000\n\n"
+                while True:
+                    try:
+                        message = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_S)
+                    except asyncio.TimeoutError:
+                        yield b": ping\n\n"
+                        continue
+                    yield message.encode()
+            finally:
+                bus.unsubscribe(queue)
+
+        return StreamingResponse(
+            messages(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.get("/api/browser")
+    def browser_stats() -> dict[str, Any]:
+        return pool.stats()
+
+    @app.get("/api/queue")
+    def queue(status: str | None = None, limit: int = Query(default=100, ge=1, le=1000)) -> dict[str, Any]:
+        return {
+            "worker_mode": settings.worker_mode,
+            "worker": worker.stats() if worker is not None else None,
+            "jobs": list_scrape_jobs(db_path, status=status, limit=limit),
+        }
+
+    @app.get("/api/jobs")
+    def jobs(limit: int = Query(default=20, ge=1, le=200)) -> list[dict[str, Any]]:
+        return list_scrape_batches(db_path, limit=limit)
+
+    @app.get("/api/jobs/{job_id}")
+    def job(job_id: int) -> dict[str, Any]:
+        found = get_scrape_batch(db_path, job_id)
+        if not found:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return found
+
+    @app.post("/api/jobs/{job_id}/cancel")
+    def cancel_job(job_id: int) -> dict[str, Any]:
+        cancelled = cancel_scrape_batch(db_path, job_id)
+        if cancelled is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {**get_scrape_batch(db_path, job_id), "cancelled_now": cancelled}
+
     @app.post("/api/config/interval")
     def update_interval(payload: IntervalUpdate) -> dict[str, Any]:
         runtime["interval_min"] = payload.scrape_interval_min
@@ -394,8 +717,8 @@ def create_app() -> FastAPI:
         return {"ok": True, "scrape_interval_min": runtime["interval_min"]}
 
     @app.get("/api/events")
-    def events() -> list[dict[str, Any]]:
-        return list_events(db_path)
+    def events(request: Request) -> Response:
+        return _cached_json(request, version_tag(), lambda: list_events(db_path))
 
     @app.post("/api/events")
     def create_event(payload: EventCreate) -> dict[str, Any]:
@@ -406,8 +729,12 @@ def create_app() -> FastAPI:
         return event
 
     @app.get("/api/subscribers")
-    def subscribers(event_id: int | None = None) -> list[dict[str, Any]]:
-        return list_subscribers(db_path, event_id=event_id)
+    def subscribers(request: Request, event_id: int | None = None) -> Response:
+        return _cached_json(
+            request,
+            version_tag(),
+            lambda: list_subscribers(db_path, event_id=event_id),
+        )
 
     @app.post("/api/subscribers")
     def create_subscriber(payload: SubscriberCreate) -> dict[str, Any]:
@@ -422,34 +749,179 @@ def create_app() -> FastAPI:
         deactivate_subscriber(db_path, subscriber_id)
         return {"ok": True}
 
-    @app.post("/api/events/{event_id}/scrape")
-    def scrape_one(event_id: int) -> dict[str, Any]:
-        event = get_event(db_path, event_id)
-        if not event:
+    @app.get("/api/schedule")
+    def schedule() -> dict[str, Any]:
+        return {
+            "mode": settings.schedule_mode,
+            "base_interval_min": runtime["interval_min"],
+            "min_interval_min": settings.schedule_min_interval_min,
+            "max_interval_min": settings.schedule_max_interval_min,
+            "events": list_schedules(db_path),
+        }
+
+    @app.post("/api/events/{event_id}/schedule")
+    def update_schedule(event_id: int, payload: ScheduleOverride) -> dict[str, Any]:
+        if not get_event(db_path, event_id):
             raise HTTPException(status_code=404, detail="Event not found")
-        return scrape_event_once(db_path, event, settings, debug=scraper_debug)
+        try:
+            next_run_at = to_utc_iso(payload.next_run_at) if payload.next_run_at else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="next_run_at must be an ISO 8601 date")
+        override_schedule(
+            db_path,
+            event_id,
+            next_run_at=next_run_at,
+            pinned_interval_min=payload.interval_min,
+            pin="interval_min" in payload.model_fields_set,
+        )
+        return next(row for row in list_schedules(db_path) if row["event_id"] == event_id)
+
+    @app.get("/api/notifications")
+    def notifications(
+        status: str | None = None,
+        event_id: int | None = None,
+        limit: int = Query(default=100, ge=1, le=1000),
+    ) -> dict[str, Any]:
+        return {
+            "counts": notification_counts(db_path),
+            "items": list_notifications(db_path, status=status, event_id=event_id, limit=limit),
+        }
 
-    @app.post("/api/scrape-all")
-    def scrape_all() -> list[dict[str, Any]]:
-        return run_all_active()
+    @app.post("/api/notifications/{notification_id}/retry")
+    def retry(notification_id: int) -> dict[str, Any]:
+        if not retry_notification(db_path, notification_id):
+            raise HTTPException(status_code=404, detail="No failed notification with this id")
+        return {"ok": True}
+
+    @app.post("/api/events/{event_id}/scrape", status_code=202)
+    def scrape_one(event_id: int) -> JSONResponse:
+        if not get_event(db_path, event_id):
+            raise HTTPException(status_code=404, detail="Event not found")
+        return queued_job([event_id])
+
+    @app.post("/api/scrape-all", status_code=202)
+    def scrape_all() -> JSONResponse:
+        return queued_job([int(event["id"]) for event in active_events(db_path)])
 
     @app.get("/api/events/{event_id}/history")
-    def history(event_id: int, limit: int = Query(default=500, ge=1, le=5000)) -> list[dict[str, Any]]:
+    def history(
+        event_id: int,
+        response: Response,
+        limit: int = Query(default=500, ge=1, le=5000),
+        cursor: str | None = None,
+    ) -> list[dict[str, Any]]:
         event = get_event(db_path, event_id)
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
-        return event_history(db_path, event_id, limit=limit)
-
-    @app.get("/api/events/{event_id}/chart")
-    def chart(event_id: int) -> list[dict[str, Any]]:
+        try:
+            rows = event_history(db_path, event_id, limit=limit, cursor=cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if len(rows) == limit:
+            response.headers["X-Next-Cursor"] = history_cursor(rows[-1])
+        return rows
+
+    @app.get("/api/events/{event_id}/history/stream")
+    def history_stream(event_id: int, cursor: str | None = None) -> StreamingResponse:
         event = get_event(db_path, event_id)
         if not event:
             raise HTTPException(status_code=404, detail="Event not found")
-        return chart_points(db_path, event_id)
+        rows = stream_event_history(db_path, event_id, cursor=cursor)
+        try:
+            first = list(islice(rows, 1))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return StreamingResponse(_ndjson(chain(first, rows)), media_type="application/x-ndjson")
+
+    @app.get("/api/events/{event_id}/listings")
+    def listings(event_id: int, at: str | None = None) -> list[dict[str, Any]]:
+        event = get_event(db_path, event_id)
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        if at is None:
+            return current_listings(db_path, event_id)
+        try:
+            return listings_at(db_path, event_id, to_utc_iso(at))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="at must be an ISO 8601 date")
+
+    @app.get("/api/events/{event_id}/chart")
+    def chart(
+        request: Request,
+        event_id: int,
+        start: str | None = Query(default=None, alias="from"),
+        end: str | None = Query(default=None, alias="to"),
+        max_points: int | None = Query(default=None, ge=2, le=10000),
+    ) -> Response:
+        try:
+            start = to_utc_iso(start) if start else None
+            end = to_utc_iso(end) if end else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="from/to must be ISO 8601 dates")
+
+        tag = version_tag()
+        if not get_event(db_path, event_id):
+            raise HTTPException(status_code=404, detail="Event not found")
+        return _cached_json(
+            request,
+            tag,
+            lambda: chart_points(db_path, event_id, start=start, end=end, max_points=max_points),
+        )
+
+    @app.get("/api/export/{table}")
+    def export(
+        table: str,
+        fmt: str = Query(default="csv", alias="format"),
+        event_id: int | None = None,
+        start: str | None = Query(default=None, alias="from"),
+        end: str | None = Query(default=None, alias="to"),
+    ) -> StreamingResponse:
+        if table not in {"history", "runs"} or fmt not in EXPORT_FORMATS:
+            raise HTTPException(status_code=404, detail="Unknown export")
+        if event_id is not None and not get_event(db_path, event_id):
+            raise HTTPException(status_code=404, detail="Event not found")
+        try:
+            start = to_utc_iso(start) if start else None
+            end = to_utc_iso(end) if end else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="from/to must be ISO 8601 dates")
+        try:
+            chunks = stream_export(db_path, table, fmt, event_id=event_id, start=start, end=end)
+        except RuntimeError as exc:
+            raise HTTPException(status_code=501, detail=str(exc))
+        return StreamingResponse(
+            chunks,
+            media_type=EXPORT_FORMATS[fmt][0],
+            headers={"Content-Disposition": f'attachment; filename="{export_filename(table, fmt, event_id)}"'},
+        )
+
+    @app.get("/api/selector-cache")
+    def selector_cache() -> list[dict[str, Any]]:
+        return list_selector_cache(db_path)
 
     @app.get("/api/runs")
-    def runs(event_id: int | None = None, limit: int = Query(default=100, ge=1, le=1000)) -> list[dict[str, Any]]:
-        return list_runs(db_path, event_id=event_id, limit=limit)
+    def runs(
+        response: Response,
+        event_id: int | None = None,
+        limit: int = Query(default=100, ge=1, le=1000),
+        cursor: str | None = None,
+    ) -> list[dict[str, Any]]:
+        try:
+            rows = list_runs(db_path, event_id=event_id, limit=limit, cursor=cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        if len(rows) == limit:
+            response.headers["X-Next-Cursor"] = run_cursor(rows[-1])
+        return rows
+
+    @app.get("/api/runs/stream")
+    def runs_stream(event_id: int | None = None, cursor: str | None = None) -> StreamingResponse:
+        rows = stream_runs(db_path, event_id=event_id, cursor=cursor)
+        try:
+            first = list(islice(rows, 1))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return StreamingResponse(_ndjson(chain(first, rows)), media_type="application/x-ndjson")
 
     return app
 
@@ -457,7 +929,15 @@ def create_app() -> FastAPI:
 def main() -> None:
     import uvicorn
 
-    uvicorn.run("viagoscrap.webapp:create_app", host="127.0.0.1", port=8000, reload=False, factory=True)
+    # SSE connections never end on their own; don't let them hold a shutdown forever.
+    uvicorn.run(
+        "viagoscrap.webapp:create_app",
+        host="127.0.0.1",
+        port=8000,
+        reload=False,
+        factory=True,
+        timeout_graceful_shutdown=5,
+    )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import signal
+import socket
+import sys
+import threading
+import uuid
+from typing import Any
+
+try:
+    from dotenv import load_dotenv
+except ModuleNotFoundError:
+    def load_dotenv() -> bool:
+        return False
+
+from .browser import BrowserPool
+from .config import Settings
+from .storage import (
+    JOB_LEASE_S,
+    claim_scrape_jobs,
+    finish_scrape_job,
+    get_event,
+    heartbeat_scrape_jobs,
+    init_db,
+    requeue_expired_scrape_jobs,
+)
+from .tracker import scrape_event_once
+
+POLL_INTERVAL_S = 2.0
+
+
+def _debug(enabled: bool, message: str) -> None:
+    if enabled:
+        print(f"[worker] {message}", file=sys.stderr)
+
+
+class ScrapeWorker:
+    """Claims jobs from `scrape_jobs` and scrapes them through the usual tracker path.
+
+    Any number of workers (threads, processes or containers on the same volume) can share
+    one database: a job is claimed by a single conditional UPDATE, its lease is renewed
+    every `lease_s / 3` while the scrape runs, and a job whose worker died is re-queued by
+    whichever worker notices the expired lease first. Up to `concurrency` jobs run at once
+    on one shared Chromium.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        settings: Settings,
+        *,
+        worker_id: str | None = None,
+        concurrency: int | None = None,
+        lease_s: float = JOB_LEASE_S,
+        poll_interval_s: float = POLL_INTERVAL_S,
+        pool: BrowserPool | None = None,
+        debug: bool = False,
+    ) -> None:
+        self.db_path = db_path
+        self.settings = settings
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.concurrency = max(1, concurrency or settings.scrape_concurrency)
+        self.lease_s = lease_s
+        self.poll_interval_s = poll_interval_s
+        self.debug = debug
+        self.pool = pool or BrowserPool(settings, debug=debug)
+        self._owns_pool = pool is None
+        self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="scrape-worker")
+        self._running: dict[int, Future] = {}
+        self._running_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.jobs_done = 0
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="scrape-worker-loop", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "concurrency": self.concurrency,
+            "running_jobs": self._running_ids(),
+            "jobs_done": self.jobs_done,
+        }
+
+    def _running_ids(self) -> list[int]:
+        with self._running_lock:
+            return sorted(self._running)
+
+    def run_forever(self) -> None:
+        if self._owns_pool:
+            self.pool.start()
+        _debug(self.debug, f"{self.worker_id} started (concurrency={self.concurrency})")
+        heartbeat_every = self.lease_s / 3
+        try:
+            while not self._stopping.is_set():
+                self._wakeup.clear()
+                try:
+                    self.poll_once()
+                except Exception as exc:
+                    _debug(self.debug, f"poll failed: {exc}")
+                self._wakeup.wait(min(self.poll_interval_s, heartbeat_every))
+        finally:
+            # Finish what was claimed; anything cut short is re-queued once its lease expires.
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            if self._owns_pool:
+                self.pool.close()
+            _debug(self.debug, f"{self.worker_id} stopped after {self.jobs_done} jobs")
+
+    def poll_once(self) -> int:
+        """Renew leases, recover expired jobs and claim as many jobs as there are free slots."""
+        with self._running_lock:
+            self._running = {job_id: future for job_id, future in self._running.items() if not future.done()}
+        running = self._running_ids()
+        if running:
+            heartbeat_scrape_jobs(self.db_path, self.worker_id, running, self.lease_s)
+        requeue_expired_scrape_jobs(self.db_path)
+        free = self.concurrency - len(running)
+        if free <= 0 or self._stopping.is_set():
+            return 0
+        jobs = claim_scrape_jobs(self.db_path, self.worker_id, limit=free, lease_s=self.lease_s)
+        for job in jobs:
+            future = self._executor.submit(self._execute, job)
+            with self._running_lock:
+                self._running[int(job["id"])] = future
+        return len(jobs)
+
+    def _execute(self, job: dict[str, Any]) -> None:
+        event = get_event(self.db_path, int(job["event_id"]))
+        if event is None:
+            finish_scrape_job(self.db_path, int(job["id"]), self.worker_id, status="error", error="event not found")
+            return
+        try:
+            result = scrape_event_once(self.db_path, event, self.settings, debug=self.debug, pool=self.pool)
+        except Exception as exc:
+            result = {"event_id": int(event["id"]), "status": "error", "error": str(exc)}
+        result.pop("metrics", None)
+        status = "done" if result.get("status") == "ok" else "error"
+        finish_scrape_job(
+            self.db_path,
+            int(job["id"]),
+            self.worker_id,
+            status=status,
+            result=result,
+            error=result.get("error"),
+        )
+        self.jobs_done += 1
+        self._wakeup.set()
+        _debug(self.debug, f"job {job['id']} event {event['id']}: {status} in {result.get('wall_time_s')}s")
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run a scrape worker against the shared job queue")
+    parser.add_argument("--db", help="SQLite database path (defaults to DB_PATH)")
+    parser.add_argument("--concurrency", type=int, help="Jobs scraped at once (defaults to SCRAPE_CONCURRENCY)")
+    parser.add_argument("--worker-id", help="Name shown in the jobs table (defaults to host:pid:random)")
+    parser.add_argument("--debug", action="store_true", help="Print debug logs to stderr")
+    args = parser.parse_args()
+
+    db_path = args.db or os.getenv("DB_PATH", "data/viagoscrap.db")
+    init_db(db_path)
+    worker = ScrapeWorker(
+        db_path,
+        Settings.from_env(),
+        worker_id=args.worker_id,
+        concurrency=args.concurrency,
+        debug=args.debug,
+    )
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop(timeout=0))
+    signal.signal(signal.SIGINT, lambda *_: worker.stop(timeout=0))
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()
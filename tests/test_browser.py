@@ -0,0 +1,157 @@
+import json
+import os
+import time
+
+from viagoscrap.browser import usable_storage_state
+from viagoscrap.config import Settings
+
+
+def test_usable_storage_state_accepts_fresh_state(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps({"cookies": [{"name": "OptanonConsent"}], "origins": []}))
+    assert usable_storage_state(Settings(storage_state_path=str(path))) == str(path)
+
+
+def test_usable_storage_state_drops_invalid_or_expired_state(tmp_path):
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json")
+    assert usable_storage_state(Settings(storage_state_path=str(broken))) is None
+    assert not broken.exists()
+
+    expired = tmp_path / "expired.json"
+    expired.write_text(json.dumps({"cookies": [], "origins": []}))
+    old = time.time() - 3 * 3600
+    os.utime(expired, (old, old))
+    assert usable_storage_state(Settings(storage_state_path=str(expired), storage_state_max_age_h=2)) is None
+    assert not expired.exists()
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.closed = False
+        self.contexts = 0
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, **options):
+        self.contexts += 1
+        browser = self
+
+        class Context:
+            async def new_page(self):
+                return browser
+
+            async def close(self):
+                pass
+
+        return Context()
+
+    async def close(self):
+        self.closed = True
+
+
+class FakePlaywright:
+    stopped = False
+
+    async def stop(self):
+        self.stopped = True
+
+
+def _fake_pool(monkeypatch, **settings):
+    import viagoscrap.browser as browser_module
+
+    launched = []
+
+    async def fake_launch(playwright, settings):
+        launched.append(FakeBrowser())
+        return launched[-1]
+
+    monkeypatch.setattr(browser_module, "launch_browser", fake_launch)
+    pool = browser_module.BrowserPool(Settings(**{"browser_max_rss_mb": 0, **settings}))
+    pool._playwright = FakePlaywright()
+    return pool, launched
+
+
+def test_pool_recycles_after_max_pages_but_waits_for_pages_in_flight(monkeypatch):
+    import asyncio
+
+    pool, launched = _fake_pool(monkeypatch, browser_max_pages=2)
+
+    async def scenario():
+        async with pool.page() as first:
+            async with pool.page() as second:
+                assert first is second
+            async with pool.page() as third:
+                # The first browser hit its page budget but still has a page open.
+                assert third is not first and first.is_connected()
+            assert first.is_connected()
+        assert not first.is_connected()
+
+    asyncio.run(scenario())
+    assert (pool.launches, pool.recycles, pool.pages_served) == (2, 1, 3)
+    assert pool.stats()["in_flight"] == 0
+
+
+def test_pool_skips_rss_recycle_while_a_retired_browser_is_open(monkeypatch):
+    import asyncio
+
+    import viagoscrap.browser as browser_module
+
+    pool, launched = _fake_pool(monkeypatch, browser_max_rss_mb=100)
+    monkeypatch.setattr(browser_module, "_child_rss_kb", lambda: 500 * 1024)
+
+    async def scenario():
+        async with pool.page() as first:
+            async with pool.page() as second:
+                # Over the RSS limit: recycled once, then the retiring browser's RSS is ignored.
+                assert second is not first
+                async with pool.page() as third:
+                    assert third is second
+        async with pool.page() as fourth:
+            assert fourth is not second
+
+    asyncio.run(scenario())
+    assert (pool.launches, pool.recycles) == (3, 2)
+
+
+def test_pool_shutdown_while_a_page_is_open(monkeypatch):
+    import asyncio
+
+    pool, launched = _fake_pool(monkeypatch)
+    playwright = pool._playwright
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def hold_page():
+            async with pool.page():
+                await release.wait()
+
+        holder = asyncio.create_task(hold_page())
+        await asyncio.sleep(0)
+        assert pool.stats()["in_flight"] == 1
+        await pool._shutdown()
+        release.set()
+        await holder
+
+    asyncio.run(scenario())
+    assert launched[0].closed and playwright.stopped
+    assert pool.stats()["in_flight"] == 0
+
+
+def test_pool_start_run_and_close(monkeypatch):
+    pool, launched = _fake_pool(monkeypatch)
+    playwright = pool._playwright
+
+    async def use_page():
+        async with pool.page() as page:
+            return page
+
+    pool.start()
+    assert pool.running
+    assert pool.run(use_page(), timeout=5) is launched[0]
+    pool.close(timeout=5)
+
+    assert len(launched) == 1 and launched[0].closed and playwright.stopped
+    assert not pool.running
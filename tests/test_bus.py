@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+from viagoscrap.bus import EventBus
+
+
+def test_publish_from_thread_reaches_subscriber_and_replays():
+    bus = EventBus(replay_size=8, queue_size=4)
+
+    async def scenario():
+        queue = bus.subscribe()
+        thread = threading.Thread(target=bus.publish, args=("scrape_started", {"event_id": 1}))
+        thread.start()
+        thread.join()
+        first = await asyncio.wait_for(queue.get(), 1)
+        bus.unsubscribe(queue)
+        bus.publish("scrape_finished", {"event_id": 1})
+
+        replay = bus.subscribe(last_event_id=first.id)
+        missed = replay.get_nowait()
+        stale = bus.subscribe(last_event_id=999)
+        return first, missed, stale.get_nowait()
+
+    first, missed, stale = asyncio.run(scenario())
+    assert (first.kind, first.data) == ("scrape_started", {"event_id": 1})
+    assert missed.kind == "scrape_finished"
+    assert stale.kind == "resync"
+    assert b"event: scrape_started\ndata: " in first.encode()
+
+
+def test_slow_subscriber_gets_single_resync():
+    bus = EventBus(queue_size=2)
+
+    async def scenario():
+        queue = bus.subscribe()
+        for index in range(5):
+            bus.publish("tick", {"n": index})
+        await asyncio.sleep(0)
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    kinds = [message.kind for message in asyncio.run(scenario())]
+    assert "resync" in kinds and len(kinds) <= 2
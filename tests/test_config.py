@@ -7,3 +7,11 @@ def test_defaults(monkeypatch):
     cfg = Settings.from_env()
     assert cfg.headless is False
     assert cfg.timeout_ms == 30000
+
+
+def test_browser_pool_limits_from_env(monkeypatch):
+    monkeypatch.setenv("BROWSER_MAX_PAGES", "0")
+    monkeypatch.setenv("BROWSER_MAX_RSS_MB", "512")
+    cfg = Settings.from_env()
+    assert cfg.browser_max_pages == 1
+    assert cfg.browser_max_rss_mb == 512
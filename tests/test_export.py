@@ -0,0 +1,45 @@
+import csv
+import gzip
+import io
+
+import pytest
+
+from viagoscrap.export import stream_export
+from viagoscrap.storage import add_event, init_db, insert_prices, insert_run_started
+
+
+def _db(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    other_id = add_event(db_path, "Other", "https://www.viagogo.fr/E-2")
+    for ts, price in (("2026-01-01T10:00:00.000+00:00", 120.5), ("2026-01-02T10:00:00.000+00:00", 99.0)):
+        insert_prices(
+            db_path,
+            event_id,
+            [{"scraped_at": ts, "title": "Fosse, debout", "price_raw": f"{price} €", "price_value": price, "currency": "EUR"}],
+        )
+    insert_prices(db_path, other_id, [{"scraped_at": "2026-01-01T10:00:00.000+00:00", "price_value": 10.0}])
+    insert_run_started(db_path, event_id)
+    return db_path, event_id
+
+
+def test_csv_export_is_gzipped_and_filtered(tmp_path):
+    db_path, event_id = _db(tmp_path)
+    data = b"".join(stream_export(db_path, "history", "csv", event_id=event_id, start="2026-01-02T00:00:00.000+00:00"))
+    rows = list(csv.DictReader(io.StringIO(gzip.decompress(data).decode("utf-8"))))
+    assert [(row["scraped_at"], row["title"], row["price_value"]) for row in rows] == [
+        ("2026-01-02T10:00:00.000+00:00", "Fosse, debout", "99.0")
+    ]
+
+    runs = gzip.decompress(b"".join(stream_export(db_path, "runs", "csv"))).decode("utf-8").splitlines()
+    assert runs[0].startswith("id,event_id,started_at") and len(runs) == 2
+
+
+def test_parquet_export_round_trips(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    db_path, _ = _db(tmp_path)
+    data = b"".join(stream_export(db_path, "history", "parquet"))
+    table = pq.read_table(io.BytesIO(data))
+    assert table.num_rows == 3
+    assert table.column("price_value").to_pylist() == [120.5, 99.0, 10.0]
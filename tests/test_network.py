@@ -0,0 +1,62 @@
+from viagoscrap.config import Settings
+from viagoscrap.network import RequestFilter
+
+
+def test_default_profile_blocks_heavy_types_and_trackers():
+    request_filter = RequestFilter.from_settings(Settings(blocked_domains=("ads.example.net",)))
+    assert request_filter.block_reason("image", "https://www.viagogo.fr/logo.png") == "image"
+    assert request_filter.block_reason("script", "https://www.googletagmanager.com/gtm.js") == "googletagmanager.com"
+    assert request_filter.block_reason("xhr", "https://cdn.ads.example.net/pixel") == "ads.example.net"
+    assert request_filter.block_reason("xhr", "https://www.viagogo.fr/api/listings") is None
+    assert request_filter.block_reason("document", "https://www.viagogo.fr/E-1") is None
+
+
+def test_off_profile_blocks_nothing():
+    request_filter = RequestFilter.from_settings(Settings(block_profile="off"))
+    assert request_filter.enabled is False
+    assert request_filter.block_reason("image", "https://www.google-analytics.com/collect") is None
+
+
+def test_listings_from_payload_reads_nested_listing_objects():
+    from viagoscrap.network import listings_from_payload
+
+    payload = {
+        "Items": [
+            {"ListingId": 1, "SectionName": "Fosse", "Row": None, "RawPrice": 189.5, "CurrencyCode": "EUR"},
+            {"ListingId": 2, "SectionName": "Tribune B", "Row": "12", "Price": "€1 250,00", "ListingUrl": "/l/2"},
+            {"ListingId": 3, "SectionName": "VIP", "RawPrice": 99.0, "CurrencyCode": "USD"},
+        ],
+        "TotalCount": 3,
+    }
+    assert listings_from_payload(payload, "https://www.viagogo.fr/E-1") == [
+        ("Fosse", "", "189,50 €", "https://www.viagogo.fr/E-1"),
+        ("Tribune B - Rang 12", "", "1 250,00 €", "https://www.viagogo.fr/l/2"),
+    ]
+
+
+def test_listing_capture_deduplicates_payloads():
+    from viagoscrap.network import ListingCapture
+
+    capture = ListingCapture("https://www.viagogo.fr/E-1", quiet_s=0)
+    capture.feed({"listings": [{"listingId": 7, "section": "Fosse", "price": {"amount": 120, "currency": "EUR"}}]})
+    capture.feed({"listings": [{"listingId": 7, "section": "Fosse", "price": {"amount": 120, "currency": "EUR"}}]})
+    capture.feed({"config": {"price": 5}})
+    assert capture.payloads == 2
+    assert capture.listings == [("Fosse", "", "120,00 €", "https://www.viagogo.fr/E-1")]
+    assert capture.ready() is True
+
+
+def test_xhr_activity_counts_only_data_requests():
+    from types import SimpleNamespace
+
+    from viagoscrap.network import XhrActivity
+
+    activity = XhrActivity()
+    listings, image = SimpleNamespace(resource_type="fetch"), SimpleNamespace(resource_type="image")
+    activity.on_started(listings)
+    activity.on_started(image)
+    assert activity.idle_for(activity.last_change + 5) == 0.0
+    activity.on_ended(listings)
+    activity.on_ended(image)
+    assert activity.pending == 0
+    assert activity.idle_for(activity.last_change + 5) == 5
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta, timezone
+
+from viagoscrap.outbox import OutboxDispatcher
+from viagoscrap.storage import (
+    NOTIFICATION_MAX_ATTEMPTS,
+    _connect,
+    add_event,
+    build_digests,
+    claim_notifications,
+    complete_notification,
+    init_db,
+    insert_prices,
+    list_notifications,
+    notification_counts,
+)
+
+PAYLOAD = {
+    "event_name": "Show",
+    "event_url": "https://www.viagogo.fr/E-1",
+    "old_price": 120.0,
+    "new_price": 99.0,
+    "currency": "EUR",
+    "recipients": ["a@example.com"],
+}
+ROW = {
+    "scraped_at": "2024-01-01T00:00:00.000+00:00",
+    "title": "Cat 1",
+    "date_label": None,
+    "price_raw": "99 €",
+    "price_value": 99.0,
+    "currency": "EUR",
+    "listing_url": None,
+}
+
+
+def _queued(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    insert_prices(db_path, event_id, [ROW], notifications=[{"kind": "min_drop", "payload": PAYLOAD}])
+    return db_path
+
+
+def _backdate_held(db_path, when):
+    with _connect(db_path) as conn:
+        conn.execute(
+            "UPDATE notification_outbox SET created_at = ? WHERE status = 'held'",
+            (when.isoformat(timespec="milliseconds"),),
+        )
+
+
+def test_failed_sends_back_off_then_give_up(tmp_path):
+    db_path = _queued(tmp_path)
+    now = datetime(2030, 1, 1, tzinfo=timezone.utc)
+
+    (item,) = claim_notifications(db_path, now=now)
+    assert item["payload"] == PAYLOAD and item["attempts"] == 1
+    assert claim_notifications(db_path, now=now) == []
+    assert complete_notification(db_path, item["id"], sent=False, error="timeout", now=now) == "pending"
+    assert claim_notifications(db_path, now=now + timedelta(seconds=29)) == []
+
+    for attempt in range(2, NOTIFICATION_MAX_ATTEMPTS + 1):
+        now += timedelta(hours=2)
+        (item,) = claim_notifications(db_path, now=now)
+        assert item["attempts"] == attempt
+        status = complete_notification(db_path, item["id"], sent=False, error="timeout", now=now)
+    assert status == "failed"
+    (row,) = list_notifications(db_path)
+    assert (row["status"], row["last_error"]) == ("failed", "timeout")
+
+
+def test_dispatcher_sends_with_one_mailer_and_keeps_retryable_errors(tmp_path):
+    db_path = _queued(tmp_path)
+
+    class FakeMailer:
+        def __init__(self):
+            self.calls = []
+
+        def send_min_drop(self, **payload):
+            self.calls.append(payload)
+            if len(self.calls) == 1:
+                return {"sent": False, "reason": "provider_error", "status_code": 503}
+            return {"sent": True, "provider": "fake"}
+
+        def close(self):
+            pass
+
+    mailer = FakeMailer()
+    dispatcher = OutboxDispatcher(db_path, mailer=mailer)
+    assert dispatcher.drain() == {"sent": 0, "pending": 1, "failed": 0}
+
+    assert dispatcher.drain() == {"sent": 0, "pending": 0, "failed": 0}
+
+    # Bring the retry forward instead of waiting out the backoff.
+    with _connect(db_path) as conn:
+        conn.execute("UPDATE notification_outbox SET next_attempt_at = '2000-01-01T00:00:00.000+00:00'")
+    assert dispatcher.drain()["sent"] == 1
+    assert notification_counts(db_path) == {"sent": 1}
+    assert mailer.calls[-1] == PAYLOAD
+
+
+def test_digest_merges_drops_per_recipient_and_throttles(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    first = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    second = add_event(db_path, "Other", "https://www.viagogo.fr/E-2")
+    for event_id, old, new in ((first, 120.0, 110.0), (first, 110.0, 99.0), (second, 50.0, 45.0)):
+        drop = {**PAYLOAD, "old_price": old, "new_price": new}
+        del drop["recipients"]
+        items = [
+            {"kind": "digest_item", "recipient": mail, "status": "held", "payload": drop}
+            for mail in ("a@example.com", "b@example.com")
+        ]
+        insert_prices(db_path, event_id, [ROW], notifications=items)
+    now = datetime.now(timezone.utc) - timedelta(hours=2)
+    _backdate_held(db_path, now)
+
+    assert build_digests(db_path, window_s=600, throttle_s=3600, now=now) == 0
+    assert build_digests(db_path, window_s=600, throttle_s=3600, now=now + timedelta(minutes=11)) == 2
+    digests = list_notifications(db_path, status="pending")
+    assert sorted(item["recipient"] for item in digests) == ["a@example.com", "b@example.com"]
+    drops = digests[0]["payload"]["drops"]
+    assert [(drop["event_id"], drop["old_price"], drop["new_price"], drop["drops"]) for drop in drops] == [
+        (first, 120.0, 99.0, 2),
+        (second, 50.0, 45.0, 1),
+    ]
+
+    # A new drop inside the throttle period waits for the next digest.
+    drop = {**PAYLOAD, "new_price": 90.0}
+    del drop["recipients"]
+    insert_prices(
+        db_path, first, [ROW], notifications=[{"kind": "digest_item", "recipient": "a@example.com", "status": "held", "payload": drop}]
+    )
+    _backdate_held(db_path, now + timedelta(minutes=20))
+    assert build_digests(db_path, window_s=0, throttle_s=3600, now=now + timedelta(minutes=30)) == 0
+    assert build_digests(db_path, window_s=0, throttle_s=3600, now=now + timedelta(minutes=72)) == 1
+
+    class FakeMailer:
+        batches = []
+
+        def send_digests(self, digests):
+            self.batches.append(digests)
+            return [{"sent": True} for _ in digests]
+
+        def close(self):
+            pass
+
+    mailer = FakeMailer()
+    counts = OutboxDispatcher(db_path, mailer=mailer, digest_window_s=0, digest_throttle_s=3600).drain()
+    assert counts["sent"] == 3
+    assert len(mailer.batches) == 1
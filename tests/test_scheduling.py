@@ -0,0 +1,43 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from viagoscrap.config import Settings
+from viagoscrap.scheduling import compute_interval, plan_due_events
+from viagoscrap.storage import add_event, init_db, list_schedules, override_schedule
+
+
+def test_interval_follows_volatility_audience_and_errors():
+    flat = {"volatility_pct": 0.0, "summaries": 10, "subscribers": 0, "runs": 10, "error_rate": 0.0}
+    busy = {"volatility_pct": 5.0, "summaries": 10, "subscribers": 8, "runs": 10, "error_rate": 0.0}
+    failing = {**busy, "error_rate": 1.0}
+
+    assert compute_interval(15, flat, 5, 360)[0] == 67.5
+    assert compute_interval(15, busy, 5, 360)[0] == 5.62
+    assert compute_interval(15, busy, 10, 360)[0] == 10
+    assert compute_interval(15, failing, 5, 360)[0] == 22.5
+    assert compute_interval(15, {}, 5, 360)[0] == 22.5
+    assert compute_interval(200, flat, 5, 360)[0] == 360
+
+
+def test_plan_spreads_first_runs_and_books_next_run(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    first = add_event(db_path, "A", "https://www.viagogo.fr/E-1")
+    second = add_event(db_path, "B", "https://www.viagogo.fr/E-2")
+    now = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    rng = random.Random(1)
+
+    assert plan_due_events(db_path, 15, Settings(), now=now, rng=rng) == []
+    booked = {row["event_id"]: row["next_run_at"] for row in list_schedules(db_path)}
+    assert len(set(booked.values())) == 2
+    assert all(now.isoformat() < at <= (now + timedelta(minutes=15)).isoformat() for at in booked.values())
+
+    override_schedule(db_path, first, next_run_at="2029-12-31T00:00:00.000+00:00", pinned_interval_min=60, pin=True)
+    due = plan_due_events(db_path, 15, Settings(), now=now, rng=rng)
+    assert [event["id"] for event in due] == [first]
+    row = next(row for row in list_schedules(db_path) if row["event_id"] == first)
+    assert row["interval_min"] == 60 and row["factors"] == {"pinned": True}
+    assert (now + timedelta(minutes=54)).isoformat() <= row["next_run_at"] <= (now + timedelta(minutes=66)).isoformat()
+
+    later = now + timedelta(minutes=20)
+    assert [event["id"] for event in plan_due_events(db_path, 15, Settings(), now=later, rng=rng)] == [second]
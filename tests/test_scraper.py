@@ -17,3 +17,90 @@ def test_extract_price_returns_empty_when_missing_currency():
 
 def test_cookie_selectors_include_french_allow_all():
     assert "button:has-text('Tout autoriser')" in COOKIE_ACCEPT_SELECTORS
+
+
+def test_parse_cards_matches_per_card_extraction():
+    from viagoscrap.scraper import _parse_cards
+
+    nodes = [
+        ["Cat 1\nSam. 12 juil.\n245 €", "/listing/1"],
+        ["Cat 1\nSam. 12 juil.\n245 €", "/listing/1"],
+        ["Sans prix\nquantite 2", None],
+        ["Fosse\n\n199,99 €", None],
+    ]
+    tickets = _parse_cards(nodes, "https://www.viagogo.fr/e/1")
+    assert [(t.title, t.date, t.price, t.url) for t in tickets] == [
+        ("Cat 1", "Sam. 12 juil.", "245 €", "https://www.viagogo.fr/listing/1"),
+        ("Fosse", "199,99 €", "199,99 €", "https://www.viagogo.fr/e/1"),
+    ]
+
+
+def test_parse_cards_splits_container_prices():
+    from viagoscrap.scraper import _parse_cards
+
+    nodes = [["Listings\n3 billets\n120 €\n150 €\n120 €", None]]
+    tickets = _parse_cards(nodes, "https://www.viagogo.fr/e/1", container=True)
+    assert [t.price for t in tickets] == ["120 €", "150 €"]
+    assert {t.title for t in tickets} == {"Listings"}
+
+
+def test_stability_requires_unchanged_listings_for_window():
+    from viagoscrap.scraper import _Stability
+
+    stability = _Stability(window_s=0.5)
+    assert stability.update((0, 0, 0, False, False), 0.0) is False
+    assert stability.update((0, 0, 0, False, False), 1.0) is False  # nothing rendered yet
+    assert stability.update((12, 12, 99, True, False), 1.1) is False
+    assert stability.update((12, 12, 99, True, False), 1.4) is False
+    assert stability.update((14, 14, 42, True, False), 1.5) is False  # more listings arrived
+    assert stability.update((14, 14, 42, True, False), 2.0) is True
+
+
+def test_stability_settles_empty_pages_once_rendered():
+    from viagoscrap.scraper import _Stability
+
+    # Sold-out page: the listing container is there but stays empty for the longer window.
+    stability = _Stability(window_s=0.5, empty_window_s=1.5)
+    assert stability.update((0, 0, 0, True, False), 0.0) is False
+    assert stability.update((0, 0, 0, True, False), 0.6) is False
+    assert stability.update((0, 0, 0, True, False), 1.5) is True
+
+    # No container at all: wait for the load event, then the empty window.
+    stability = _Stability(window_s=0.5, empty_window_s=1.5)
+    assert stability.update((0, 0, 0, False, False), 0.0) is False
+    assert stability.update((0, 0, 0, False, True), 0.3) is False
+    assert stability.update((0, 0, 0, False, True), 1.0) is False
+    assert stability.update((0, 0, 0, False, True), 1.8) is True
+
+    # Listing XHR still in flight after load: keep waiting until the network is quiet.
+    stability = _Stability(window_s=0.5, empty_window_s=1.5)
+    assert stability.update((0, 0, 0, False, True), 0.0) is False
+    assert stability.update((0, 0, 0, False, True), 2.0, network_idle_s=0.0) is False
+    assert stability.update((0, 0, 0, False, True), 2.2, network_idle_s=0.2) is False
+    assert stability.update((0, 0, 0, False, True), 2.6, network_idle_s=0.6) is True
+
+
+def test_selector_picks_prefers_learned_selector():
+    from viagoscrap.scraper import LISTING_SELECTORS, _SelectorPicks
+
+    metrics = {}
+    picks = _SelectorPicks({"listing": "li[data-testid*='listing']"}, metrics)
+    ordered = picks.order("listing", LISTING_SELECTORS)
+    assert ordered[0] == "li[data-testid*='listing']"
+    assert sorted(ordered) == sorted(LISTING_SELECTORS)
+    picks.record("listing", "li[data-testid*='listing']")
+    picks.record("expand", None)
+    picks.record("cookie", "button#onetrust-accept-btn-handler")
+    assert metrics["selectors"] == {
+        "listing": {"selector": "li[data-testid*='listing']", "hit": True},
+        "cookie": {"selector": "button#onetrust-accept-btn-handler", "hit": False},
+    }
+
+
+def test_selector_cache_key_masks_event_ids():
+    from viagoscrap.scraper import selector_cache_key
+
+    assert selector_cache_key("https://www.Viagogo.fr/fr/Billets-Concert/Rock/Coldplay/E-155123456?qty=2") == (
+        "www.viagogo.fr",
+        "/fr/*/E-*",
+    )
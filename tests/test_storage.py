@@ -0,0 +1,411 @@
+from viagoscrap.storage import get_cached_selectors, init_db, list_selector_cache, record_selector_outcomes
+
+
+def test_selector_cache_counts_hits_and_misses(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    record_selector_outcomes(db_path, "www.viagogo.fr", "/fr/*/E-*", {"listing": {"selector": "li", "hit": False}})
+    record_selector_outcomes(db_path, "www.viagogo.fr", "/fr/*/E-*", {"listing": {"selector": "li", "hit": True}})
+    record_selector_outcomes(db_path, "www.viagogo.fr", "/fr/*/E-*", {"listing": {"selector": None, "hit": False}})
+
+    assert get_cached_selectors(db_path, "www.viagogo.fr", "/fr/*/E-*") == {"listing": "li"}
+    (row,) = list_selector_cache(db_path)
+    assert (row["hits"], row["misses"]) == (1, 2)
+
+
+def test_connections_are_reused_per_thread_and_read_only_is_separate(tmp_path):
+    import sqlite3
+    import threading
+
+    import pytest
+
+    from viagoscrap.storage import _connect, close_connections
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    writer = _connect(db_path)
+    reader = _connect(db_path, readonly=True)
+    assert _connect(db_path) is writer
+    assert reader is not writer
+    with pytest.raises(sqlite3.OperationalError):
+        reader.execute("DELETE FROM tracked_events")
+
+    other: list[sqlite3.Connection] = []
+    thread = threading.Thread(target=lambda: other.append(_connect(db_path)))
+    thread.start()
+    thread.join()
+    assert other[0] is not writer
+
+    close_connections()
+    assert _connect(db_path) is not writer
+
+
+def test_insert_prices_updates_stats_incrementally(tmp_path):
+    from viagoscrap.storage import add_event, backfill_run_summaries, get_event, insert_prices, refresh_event_stats
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+
+    def row(ts, value):
+        return {"scraped_at": ts, "price_raw": f"{value} €", "price_value": value, "currency": "EUR"}
+
+    insert_prices(db_path, event_id, [row("2026-01-01T10:00:00.000+00:00", 150.0), row("2026-01-01T10:00:00.000+00:00", 120.0)])
+    insert_prices(db_path, event_id, [row("2026-01-01T11:00:00.000+00:00", 120.0), row("2026-01-01T11:00:00.000+00:00", 130.0)])
+    insert_prices(db_path, event_id, [{"scraped_at": "2026-01-01T12:00:00.000+00:00", "price_raw": "", "price_value": None}])
+
+    incremental = get_event(db_path, event_id)
+    assert incremental["last_scraped_at"] == "2026-01-01T12:00:00.000+00:00"
+    assert incremental["lowest_price_value"] == 120.0
+    assert incremental["lowest_seen_at"] == "2026-01-01T10:00:00.000+00:00"
+
+    backfill_run_summaries(db_path, event_id)
+    refresh_event_stats(db_path, event_id)
+    assert get_event(db_path, event_id) == incremental
+
+
+def test_run_summaries_feed_chart_and_backfill_matches(tmp_path):
+    from viagoscrap.storage import add_event, backfill_run_summaries, chart_points, insert_prices, record_run_summary
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    batches = {
+        "2026-01-01T10:00:00.000+00:00": [150.0, 120.0, None],
+        "2026-01-01T11:00:00.000+00:00": [130.0, 110.0, 170.0, 140.0],
+    }
+    recorded = []
+    for ts, values in batches.items():
+        insert_prices(db_path, event_id, [{"scraped_at": ts, "price_value": value} for value in values])
+        prices = [value for value in values if value is not None]
+        recorded.append(record_run_summary(db_path, event_id, ts, prices, len(values)))
+
+    assert recorded[1]["median_price"] == 135.0
+    assert recorded[1]["listing_delta"] == 1
+    assert chart_points(db_path, event_id) == [
+        {"scraped_at": "2026-01-01T10:00:00.000+00:00", "min_price": 120.0},
+        {"scraped_at": "2026-01-01T11:00:00.000+00:00", "min_price": 110.0},
+    ]
+
+    assert backfill_run_summaries(db_path) == 2
+    assert chart_points(db_path, event_id)[1]["min_price"] == 110.0
+
+
+def test_prices_and_run_summary_commit_together(tmp_path, monkeypatch):
+    import sqlite3
+
+    import pytest
+
+    from viagoscrap import storage
+    from viagoscrap.storage import add_event, event_history, insert_prices
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    rows = [{"scraped_at": "2026-01-01T10:00:00.000+00:00", "price_value": value} for value in (90.0, 110.0)]
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("crash before the summary")
+
+    monkeypatch.setattr(storage, "_write_run_summary", crash)
+    with pytest.raises(RuntimeError):
+        insert_prices(db_path, event_id, rows, summarize=True)
+    assert event_history(db_path, event_id) == []
+
+    monkeypatch.undo()
+    assert insert_prices(db_path, event_id, rows, summarize=True) == 2
+    with sqlite3.connect(db_path) as conn:
+        summaries = conn.execute("SELECT min_price, max_price, listing_count FROM run_summaries").fetchall()
+    assert summaries == [(90.0, 110.0, 2)]
+
+
+def test_downsample_minmax_keeps_dips():
+    from viagoscrap.storage import downsample_minmax
+
+    points = [(f"t{i:03d}", 100.0) for i in range(100)]
+    points[37] = ("t037", 40.0)
+    points[80] = ("t080", 180.0)
+    sampled = list(downsample_minmax(iter(points), len(points), 10))
+    assert len(sampled) <= 10
+    assert ("t037", 40.0) in sampled
+    assert ("t080", 180.0) in sampled
+    assert [ts for ts, _ in sampled] == sorted(ts for ts, _ in sampled)
+    assert list(downsample_minmax(iter(points[:5]), 5, 10)) == points[:5]
+
+
+def test_to_utc_iso_normalizes_offsets():
+    from viagoscrap.storage import to_utc_iso
+
+    assert to_utc_iso("2026-03-01T12:00:00+02:00") == "2026-03-01T10:00:00.000+00:00"
+    assert to_utc_iso("2026-03-01") == "2026-03-01T00:00:00.000+00:00"
+    assert to_utc_iso("2026-03-01T10:00:00Z") == "2026-03-01T10:00:00.000+00:00"
+
+
+def test_compact_history_rolls_up_then_deletes(tmp_path):
+    from datetime import datetime, timezone
+
+    from viagoscrap.storage import (
+        add_event,
+        chart_points,
+        compact_history,
+        event_history,
+        get_event,
+        history_cursor,
+        insert_prices,
+        record_run_summary,
+        refresh_event_stats,
+    )
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    batches = {
+        "2026-01-01T10:00:00.000+00:00": [150.0, 90.0],
+        "2026-01-01T10:30:00.000+00:00": [100.0, None],
+        "2026-01-01T14:00:00.000+00:00": [110.0],
+        "2026-03-01T10:00:00.000+00:00": [120.0],
+    }
+    for ts, values in batches.items():
+        insert_prices(db_path, event_id, [{"scraped_at": ts, "price_value": value} for value in values])
+        record_run_summary(db_path, event_id, ts, [v for v in values if v is not None], len(values))
+    before = get_event(db_path, event_id)
+
+    now = datetime(2026, 3, 2, 8, tzinfo=timezone.utc)
+    result = compact_history(db_path, 30, batch_size=2, now=now)
+    assert result["cutoff"] == "2026-01-31T00:00:00.000+00:00"
+    assert result["rows_deleted"] == 5
+    assert result["rollups_written"] == 3
+    assert compact_history(db_path, 30, batch_size=2, now=now)["rows_deleted"] == 0
+
+    history = event_history(db_path, event_id)
+    assert [(row["tier"], row["price_value"]) for row in history] == [
+        ("raw", 120.0),
+        ("hour", 110.0),
+        ("hour", 90.0),
+    ]
+    paged, cursor = [], None
+    while page := event_history(db_path, event_id, limit=1, cursor=cursor):
+        paged += page
+        cursor = history_cursor(page[-1])
+    assert paged == history
+    hour = history[2]
+    assert (hour["scraped_at"], hour["listing_count"], hour["run_count"]) == ("2026-01-01T10:00:00.000+00:00", 4, 2)
+    assert hour["median_price"] == 100.0
+    assert len(chart_points(db_path, event_id)) == 4
+
+    # Once January's hourly rollups age out, that day is reported by its daily rollup alone.
+    compact_history(db_path, 30, now=datetime(2027, 1, 5, tzinfo=timezone.utc))
+    history = event_history(db_path, event_id)
+    assert [(row["tier"], row["price_value"]) for row in history] == [("hour", 120.0), ("day", 90.0)]
+    assert event_history(db_path, event_id, cursor=history_cursor(history[0])) == history[1:]
+    assert event_history(db_path, event_id, cursor=history_cursor(history[1])) == []
+
+    refresh_event_stats(db_path, event_id)
+    after = get_event(db_path, event_id)
+    assert after["lowest_price_value"] == before["lowest_price_value"] == 90.0
+    assert after["last_scraped_at"] == before["last_scraped_at"]
+
+
+def test_delta_mode_stores_only_changes(tmp_path):
+    from viagoscrap.storage import add_event, current_listings, event_history, insert_listing_changes, listings_at
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+
+    def run(ts, listings):
+        rows = [
+            {"scraped_at": ts, "title": title, "date_label": "", "price_raw": f"{price} €", "price_value": price, "listing_url": "u"}
+            for title, price in listings
+        ]
+        return insert_listing_changes(db_path, event_id, rows)
+
+    first = run("2026-01-01T10:00:00.000+00:00", [("A", 100.0), ("B", 120.0), ("B", 130.0)])
+    assert first["appeared"] == 3 and first["rows_avoided"] == 0
+    second = run("2026-01-01T11:00:00.000+00:00", [("A", 100.0), ("B", 120.0), ("B", 125.0), ("C", 90.0)])
+    assert (second["appeared"], second["changed"], second["gone"]) == (2, 0, 1)
+    assert second["rows_avoided"] == 1
+    assert run("2026-01-01T12:00:00.000+00:00", [])["rows_written"] == 0
+
+    assert [row["price_value"] for row in current_listings(db_path, event_id)] == [90.0, 100.0, 120.0, 125.0]
+    assert [row["price_value"] for row in listings_at(db_path, event_id, "2026-01-01T10:30:00.000+00:00")] == [
+        100.0,
+        120.0,
+        130.0,
+    ]
+    assert {row["change"] for row in event_history(db_path, event_id)} == {"appeared", "gone"}
+
+
+def test_compaction_keeps_live_delta_listings_and_rolls_up_summaries(tmp_path):
+    from datetime import datetime, timezone
+
+    from viagoscrap.storage import (
+        add_event,
+        compact_history,
+        current_listings,
+        event_history,
+        insert_listing_changes,
+        listings_at,
+        record_run_summary,
+    )
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+
+    def run(ts, listings):
+        rows = [
+            {"scraped_at": ts, "title": title, "date_label": "", "price_raw": f"{price} €", "price_value": price, "listing_url": "u"}
+            for title, price in listings
+        ]
+        insert_listing_changes(db_path, event_id, rows)
+        record_run_summary(db_path, event_id, ts, [price for _, price in listings], len(listings))
+
+    run("2026-01-01T10:00:00.000+00:00", [("A", 100.0), ("B", 120.0)])
+    run("2026-01-02T10:00:00.000+00:00", [("A", 100.0), ("B", 110.0), ("C", 90.0)])
+    run("2026-01-03T10:00:00.000+00:00", [("A", 100.0), ("B", 110.0)])
+    run("2026-03-01T10:00:00.000+00:00", [("A", 100.0), ("B", 115.0)])
+    now = "2026-03-02T00:00:00.000+00:00"
+    before = [(row["title"], row["price_value"]) for row in listings_at(db_path, event_id, now)]
+
+    result = compact_history(db_path, 30, batch_size=2, now=datetime(2026, 3, 2, tzinfo=timezone.utc))
+    assert result["rows_deleted"] == 5
+    assert before == [("A", 100.0), ("B", 115.0)]
+    assert [(row["title"], row["price_value"]) for row in listings_at(db_path, event_id, now)] == before
+    assert sorted(row["title"] for row in current_listings(db_path, event_id)) == ["A", "B"]
+
+    history = event_history(db_path, event_id)
+    assert [(row["change"], row["scraped_at"][:10]) for row in history if row["tier"] == "raw"][-2:] == [
+        ("base", "2026-01-31"),
+        ("base", "2026-01-31"),
+    ]
+    rollups = [row for row in history if row["tier"] != "raw"]
+    assert [(row["tier"], row["scraped_at"][:10], row["price_value"]) for row in rollups] == [
+        ("hour", "2026-01-03", 100.0),
+        ("hour", "2026-01-02", 90.0),
+        ("hour", "2026-01-01", 100.0),
+    ]
+    assert compact_history(db_path, 30, now=datetime(2026, 3, 2, tzinfo=timezone.utc))["rows_deleted"] == 0
+
+
+def test_legacy_price_history_is_migrated_in_place(tmp_path):
+    import sqlite3
+
+    from viagoscrap.storage import SCHEMA_VERSION, event_history
+
+    db_path = str(tmp_path / "legacy.db")
+    legacy = sqlite3.connect(db_path)
+    legacy.execute(
+        """
+        CREATE TABLE price_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, event_id INTEGER NOT NULL, scraped_at TEXT NOT NULL,
+            title TEXT, date_label TEXT, price_raw TEXT, price_value REAL, currency TEXT, listing_url TEXT
+        )
+        """
+    )
+    legacy.executemany(
+        "INSERT INTO price_history(event_id, scraped_at, title, date_label, price_raw, price_value, currency, listing_url)"
+        " VALUES(1, ?, 'Fosse', 'sam. 12 juil.', ?, ?, 'EUR', 'https://www.viagogo.fr/E-1')",
+        [("2026-01-01T10:00:00.123+00:00", "189,90 €", 189.9), ("2026-01-01T10:00:00.123+00:00", "", None)],
+    )
+    legacy.commit()
+    legacy.close()
+
+    report = init_db(db_path, migration_batch_size=1)
+    assert (report["from_version"], report["to_version"], report["migrated_rows"]) == (0, SCHEMA_VERSION, 2)
+    rows = event_history(db_path, 1)
+    assert [(row["id"], row["scraped_at"], row["price_value"], row["price_raw"]) for row in rows] == [
+        (2, "2026-01-01T10:00:00.123+00:00", None, ""),
+        (1, "2026-01-01T10:00:00.123+00:00", 189.9, "189,90 €"),
+    ]
+    assert rows[1]["title"] == "Fosse" and rows[1]["listing_url"] == "https://www.viagogo.fr/E-1"
+    assert init_db(db_path)["migrated_rows"] == 0
+
+
+def test_history_cursor_pages_match_stream(tmp_path):
+    from datetime import datetime, timezone
+
+    import pytest
+
+    from viagoscrap.storage import (
+        add_event,
+        compact_history,
+        encode_cursor,
+        event_history,
+        history_cursor,
+        insert_prices,
+        list_runs,
+        stream_event_history,
+    )
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    for hour in range(30):
+        ts = f"2026-01-{1 + hour // 24:02d}T{hour % 24:02d}:00:00.000+00:00"
+        insert_prices(db_path, event_id, [{"scraped_at": ts, "price_value": 100.0 + i} for i in range(3)])
+    compact_history(db_path, 1, now=datetime(2026, 1, 3, 12, tzinfo=timezone.utc))
+
+    streamed = list(stream_event_history(db_path, event_id))
+    assert [row["tier"] for row in streamed].count("raw") == 18
+    assert [row["tier"] for row in streamed].count("hour") == 24
+
+    paged, cursor = [], None
+    while True:
+        page = event_history(db_path, event_id, limit=7, cursor=cursor)
+        paged.extend(page)
+        if len(page) < 7:
+            break
+        cursor = history_cursor(page[-1])
+    assert paged == streamed
+
+    # Well-formed cursors with wrong-typed fields must fail as ValueError too (HTTP 400).
+    bad_cursors = (
+        "not-a-cursor",
+        encode_cursor("raw", 5, "x"),
+        encode_cursor(["raw"], "2026-01-01", 1),
+        encode_cursor("raw", "x", True),
+    )
+    for bad in bad_cursors:
+        with pytest.raises(ValueError):
+            event_history(db_path, event_id, cursor=bad)
+    for bad in (encode_cursor(1, 2), encode_cursor("2026-01-01", None)):
+        with pytest.raises(ValueError):
+            list_runs(db_path, cursor=bad)
+
+
+def test_compaction_drops_only_strings_left_unreferenced(tmp_path):
+    import sqlite3
+    from datetime import datetime, timezone
+
+    from viagoscrap.storage import _delete_unreferenced_strings, add_event, compact_history, insert_prices
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    insert_prices(db_path, event_id, [{"scraped_at": "2026-01-01T10:00:00.000+00:00", "title": "Old", "price_raw": "90 €"}])
+    insert_prices(db_path, event_id, [{"scraped_at": "2026-03-01T10:00:00.000+00:00", "title": "New", "price_raw": "90 €"}])
+
+    result = compact_history(db_path, 30, batch_size=1, now=datetime(2026, 3, 2, tzinfo=timezone.utc))
+    assert result["strings_deleted"] == 1
+    with sqlite3.connect(db_path) as conn:
+        assert {value for (value,) in conn.execute("SELECT value FROM strings")} == {"New", "90 €"}
+        (new_id,) = conn.execute("SELECT id FROM strings WHERE value = 'New'").fetchone()
+
+    # A row written between the reference scan and the delete still protects its strings.
+    class InsertAfterScan:
+        conn = sqlite3.connect(db_path)
+
+        def execute(self, sql, *args):
+            cursor = self.conn.execute(sql, *args)
+            if "MAX(id)" in sql:
+                insert_prices(db_path, event_id, [{"scraped_at": "2026-03-02T10:00:00.000+00:00", "title": "New"}])
+            return cursor
+
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM price_history")
+        stray_id = conn.execute("INSERT INTO strings(value) VALUES('Stray')").lastrowid
+    assert _delete_unreferenced_strings(db_path, InsertAfterScan(), {new_id, stray_id}, 10) == 1
+    with sqlite3.connect(db_path) as conn:
+        assert {value for (value,) in conn.execute("SELECT value FROM strings")} == {"New", "90 €"}
+    InsertAfterScan.conn.close()
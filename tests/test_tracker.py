@@ -23,3 +23,98 @@ def test_price_drop_detection():
     assert is_price_drop(120.0, 99.0) is True
     assert is_price_drop(120.0, 120.0) is False
     assert is_price_drop(None, 99.0) is False
+
+
+def test_scrape_event_records_failures_as_error_runs(monkeypatch, tmp_path):
+    import asyncio
+
+    from viagoscrap import tracker
+    from viagoscrap.config import Settings
+    from viagoscrap.scraper import Ticket
+    from viagoscrap.storage import add_event, init_db, list_events, list_runs
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    add_event(db_path, "ok", "https://example.com/ok")
+    add_event(db_path, "boom", "https://example.com/boom")
+
+    async def fake_scrape(url, settings, debug=False, pool=None, metrics=None, preferred_selectors=None):
+        await asyncio.sleep(0.01)
+        if url.endswith("boom"):
+            raise RuntimeError("page crashed")
+        return [Ticket(title="Cat 1", date="", price="120 €", url=url)]
+
+    monkeypatch.setattr(tracker, "scrape_listings", fake_scrape)
+    results = [tracker.scrape_event_once(db_path, event, Settings()) for event in list_events(db_path)]
+
+    by_status = {row["status"]: row for row in results}
+    assert by_status["ok"]["items_saved"] == 1
+    assert by_status["error"]["error"] == "page crashed"
+    assert all("wall_time_s" in row for row in results)
+    assert {run["status"] for run in list_runs(db_path)} == {"ok", "error"}
+
+
+def test_alert_min_delta_and_digest_routing(monkeypatch, tmp_path):
+    from viagoscrap.config import Settings
+    from viagoscrap.storage import add_event, add_subscriber, init_db
+    from viagoscrap.tracker import _alert_notifications
+
+    monkeypatch.delenv("ALERT_TO_EMAIL", raising=False)
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event_id = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    add_subscriber(db_path, "A@example.com", None)
+    add_subscriber(db_path, "b@example.com", event_id)
+    event = {"id": event_id, "name": "Show", "url": "https://www.viagogo.fr/E-1"}
+    rows = [{"currency": "EUR"}]
+
+    notifications, result = _alert_notifications(db_path, event, 100.0, 97.0, rows, Settings(alert_min_delta_pct=5))
+    assert notifications == [] and result["reason"] == "below_min_delta"
+
+    notifications, result = _alert_notifications(db_path, event, 100.0, 90.0, rows, Settings(alert_mode="digest"))
+    assert result == {"queued": True, "mode": "digest", "recipients": 2}
+    assert [(item["kind"], item["recipient"], item["status"]) for item in notifications] == [
+        ("digest_item", "a@example.com", "held"),
+        ("digest_item", "b@example.com", "held"),
+    ]
+
+
+def test_concurrent_scrapes_of_one_event_share_a_single_run(monkeypatch, tmp_path):
+    import asyncio
+    import threading
+
+    from viagoscrap import tracker
+    from viagoscrap.config import Settings
+    from viagoscrap.scraper import Ticket
+    from viagoscrap.storage import add_event, get_event, init_db, list_runs
+
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    event = get_event(db_path, add_event(db_path, "E", "https://example.com/e"))
+    calls = []
+
+    async def fake_scrape(url, settings, debug=False, pool=None, metrics=None, preferred_selectors=None):
+        calls.append(url)
+        await asyncio.sleep(0.2)
+        return [Ticket(title="Cat 1", date="", price="120 €", url=url)]
+
+    monkeypatch.setattr(tracker, "scrape_listings", fake_scrape)
+    settings = Settings(scrape_freshness_s=60)
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(tracker.scrape_event_once(db_path, event, settings)))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1 and len(list_runs(db_path)) == 1
+    assert [result["status"] for result in results] == ["ok"] * 3
+    assert sum(bool(result.get("joined")) for result in results) == 2
+
+    cached = tracker.scrape_event_once(db_path, event, settings)
+    assert cached["cached"] is True and len(calls) == 1
+    tracker.scrape_event_once(db_path, event, Settings())
+    assert len(calls) == 2
@@ -0,0 +1,99 @@
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from viagoscrap.storage import add_event, init_db
+from viagoscrap.webapp import create_app
+
+
+def test_unchanged_polls_get_304_until_a_write(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setenv("DB_PATH", db_path)
+    init_db(db_path)
+    client = TestClient(create_app())
+
+    first = client.get("/api/events")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and first.json() == []
+    assert client.get("/api/events", headers={"If-None-Match": etag}).status_code == 304
+
+    add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    changed = client.get("/api/events", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and len(changed.json()) == 1
+    assert changed.headers["etag"] != etag
+    assert client.get("/api/events/1/chart", headers={"If-None-Match": changed.headers["etag"]}).status_code == 304
+
+    # Writes from another process (plain connection here) bypass the in-process counter.
+    etag = changed.headers["etag"]
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE tracked_events SET name = 'Renamed'")
+    renamed = client.get("/api/events", headers={"If-None-Match": etag})
+    assert renamed.status_code == 200 and renamed.json()[0]["name"] == "Renamed"
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM tracked_events")
+    assert client.get("/api/events/1/chart", headers={"If-None-Match": renamed.headers["etag"]}).status_code == 404
+
+
+def test_scrape_endpoints_return_a_job_to_poll_and_cancel(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setenv("DB_PATH", db_path)
+    # No worker in this process: jobs stay queued.
+    monkeypatch.setenv("WORKER_MODE", "external")
+    init_db(db_path)
+    first = add_event(db_path, "Show", "https://www.viagogo.fr/E-1")
+    add_event(db_path, "Other", "https://www.viagogo.fr/E-2")
+    client = TestClient(create_app())
+
+    one = client.post(f"/api/events/{first}/scrape")
+    assert one.status_code == 202 and one.headers["location"] == f"/api/jobs/{one.json()['job_id']}"
+    everything = client.post("/api/scrape-all").json()
+    assert everything["status"] == "queued" and everything["progress"]["total"] == 2
+    assert everything["total_wall_time_s"] is None
+    # The event already queued by the first request shares its scrape.
+    assert one.json()["events"][0]["scrape_job_id"] in {event["scrape_job_id"] for event in everything["events"]}
+
+    cancelled = client.post(f"/api/jobs/{everything['job_id']}/cancel").json()
+    assert cancelled["status"] == "cancelled" and cancelled["cancelled_now"] == 2
+    assert cancelled["total_wall_time_s"] >= 0
+    assert client.get(f"/api/jobs/{one.json()['job_id']}").json()["status"] == "cancelled"
+    assert client.get("/api/jobs/999").status_code == 404
+
+
+def test_config_etag_follows_stream_clients(tmp_path, monkeypatch):
+    import asyncio
+
+    from viagoscrap.bus import bus
+
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setenv("DB_PATH", db_path)
+    init_db(db_path)
+    client = TestClient(create_app())
+
+    first = client.get("/api/config")
+    etag = first.headers["etag"]
+    assert client.get("/api/config", headers={"If-None-Match": etag}).status_code == 304
+
+    async def subscribe():
+        return bus.subscribe()
+
+    queue = asyncio.run(subscribe())
+    try:
+        changed = client.get("/api/config", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()["stream_clients"] == first.json()["stream_clients"] + 1
+    finally:
+        bus.unsubscribe(queue)
+
+
+def test_app_shutdown_unregisters_write_listeners(tmp_path, monkeypatch):
+    from viagoscrap import storage
+
+    db_path = str(tmp_path / "test.db")
+    monkeypatch.setenv("DB_PATH", db_path)
+    monkeypatch.setenv("WORKER_MODE", "external")
+    before = list(storage._write_listeners)
+    for _ in range(2):
+        with TestClient(create_app()) as client:
+            assert client.get("/healthz").status_code == 200
+            assert len(storage._write_listeners) == len(before) + 2
+    assert storage._write_listeners == before
@@ -0,0 +1,75 @@
+import threading
+import time
+
+from viagoscrap.config import Settings
+from viagoscrap.storage import (
+    add_event,
+    claim_scrape_jobs,
+    enqueue_scrape_jobs,
+    finish_scrape_job,
+    get_scrape_jobs,
+    heartbeat_scrape_jobs,
+    init_db,
+    requeue_expired_scrape_jobs,
+)
+
+
+def _db(tmp_path, events=1):
+    db_path = str(tmp_path / "test.db")
+    init_db(db_path)
+    ids = [add_event(db_path, f"E{i}", f"https://www.viagogo.fr/E-{i}") for i in range(events)]
+    return db_path, ids
+
+
+def test_one_active_job_per_event_and_expired_leases_are_requeued(tmp_path):
+    db_path, (event_id,) = _db(tmp_path)
+    (job_id,) = enqueue_scrape_jobs(db_path, [event_id])
+    assert enqueue_scrape_jobs(db_path, [event_id]) == [job_id]
+
+    (job,) = claim_scrape_jobs(db_path, "w1", lease_s=0)
+    assert claim_scrape_jobs(db_path, "w2") == []
+    assert enqueue_scrape_jobs(db_path, [event_id]) == [job_id]
+    time.sleep(0.01)
+    assert requeue_expired_scrape_jobs(db_path) == 1
+
+    (job,) = claim_scrape_jobs(db_path, "w2", lease_s=60)
+    assert (job["id"], job["attempts"]) == (job_id, 2)
+    assert heartbeat_scrape_jobs(db_path, "w1", [job_id]) == set()
+    assert heartbeat_scrape_jobs(db_path, "w2", [job_id]) == {job_id}
+    assert not finish_scrape_job(db_path, job_id, "w1", status="done")
+    assert finish_scrape_job(db_path, job_id, "w2", status="done", result={"status": "ok"})
+    assert enqueue_scrape_jobs(db_path, [event_id]) != [job_id]
+
+
+def test_workers_share_the_queue_without_duplicates(monkeypatch, tmp_path):
+    import viagoscrap.worker as worker_module
+    from viagoscrap.worker import ScrapeWorker
+
+    db_path, event_ids = _db(tmp_path, events=6)
+    scraped = []
+    lock = threading.Lock()
+
+    def fake_scrape(db_path, event, settings, debug=False, pool=None):
+        time.sleep(0.02)
+        with lock:
+            scraped.append(event["id"])
+        return {"event_id": event["id"], "status": "ok", "items_found": 1, "metrics": {}}
+
+    monkeypatch.setattr(worker_module, "scrape_event_once", fake_scrape)
+    job_ids = enqueue_scrape_jobs(db_path, event_ids)
+    workers = [
+        ScrapeWorker(db_path, Settings(), worker_id=name, concurrency=2, poll_interval_s=0.01, pool=object())
+        for name in ("w1", "w2")
+    ]
+    for worker in workers:
+        worker.start()
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and any(job["status"] != "done" for job in get_scrape_jobs(db_path, job_ids)):
+        time.sleep(0.02)
+    for worker in workers:
+        worker.stop()
+
+    jobs = get_scrape_jobs(db_path, job_ids)
+    assert [job["status"] for job in jobs] == ["done"] * 6
+    assert sorted(scraped) == sorted(event_ids)
+    assert all("metrics" not in job["result"] for job in jobs)